@@ -1,2 +1,11 @@
 from .chatbase import Chatbase
+from .collector import Collector
+from .hub import ChatbaseHub
+from .utils.compression import Compressor
+from .utils.dead_letter import DeadLetterQueue, DeadLetterFile
+from .utils.metrics import Metrics
+from .utils.profiling import Profiler
+from .utils.retry import RetryPolicy, CircuitBreaker
+from .utils.spool import Spool
+from .utils.transport import Transport
 __version__ = '1.0.0'
@@ -1,18 +1,31 @@
 import asyncio
+import inspect
 import logging
-import aiohttp
-import ssl
-import certifi
+import time
+from functools import partial
+from .collector import CollectorClient
 from .utils import json
+from .utils.encoder import get_encoder
+from .utils.metrics import Metrics, item_kind
+from .utils.profiling import Stage
+from .utils.retry import is_transient
+from .utils.tasks import TaskLimiter
+from .utils.transport import Transport
 from datetime import datetime
 
-from .types import Message, Messages, MessageTypes, Click, Event, Pool
+from .types import Message, Messages, MessageTypes, Click, Event, Events, Pool, SpooledPool, BulkResult, \
+    ItemResult, ChatbaseException, PoolIsFull, TooManyTasks
 
 logger = logging.getLogger(f'chatbase')
 
 
 class Chatbase:
-    def __init__(self, api_key, platform, task_mode=False, pool_size=0, loop=None, version=None):
+    def __init__(self, api_key, platform, task_mode=False, pool_size=0, loop=None, version=None, pool_linger=None,
+                 pool_max_messages=None, pool_max_bytes=None, pool_overflow=None,
+                 bulk_chunk_size=100, bulk_chunk_bytes=1000000, bulk_concurrency=4, pool_events=False,
+                 retry=None, requeue_failed=0, json_backend=None, compression=None, transport=None, pool=None,
+                 max_tasks=None, max_pending_tasks=None, task_overflow=None, pool_spool=None, dead_letter=None,
+                 collector=None, base_url=None, metrics=None, profiler=None, event_pool=None):
         """
         :param api_key: Chatbase API token key
         :type api_key: str
@@ -31,6 +44,92 @@ class Chatbase:
         :param version: version of your product
         :type version: str
 
+        :param pool_linger: max seconds a message can wait in pool before it is sent (e.g. 0.05).
+                            If None - pool is sent only when it reaches pool_size
+        :type pool_linger: int or float
+
+        :param pool_max_messages: pool capacity in messages. If None - unlimited
+        :type pool_max_messages: int
+
+        :param pool_max_bytes: pool capacity in bytes of encoded messages. If None - unlimited
+        :type pool_max_bytes: int
+
+        :param pool_overflow: "block" (wait for free room), "drop_oldest", "drop_newest" or "sample"
+        :type pool_overflow: str
+
+        :param bulk_chunk_size: max number of messages sent in one bulk request. If None - unlimited
+        :type bulk_chunk_size: int
+
+        :param bulk_chunk_bytes: max size of one bulk request body. If None - unlimited
+        :type bulk_chunk_bytes: int
+
+        :param bulk_concurrency: max number of bulk requests sent at the same time
+        :type bulk_concurrency: int
+
+        :param pool_events: save events to separate pool with the same settings (works only if pool_size is set)
+        :type pool_events: bool
+
+        :param retry: retry policy for failed requests. If None - requests are not retried
+        :type retry: RetryPolicy
+
+        :param requeue_failed: in pool mode put messages, reported by Chatbase as failed, back to pool.
+                                Value is max number of times the same message is requeued
+        :type requeue_failed: int
+
+        :param json_backend: "orjson", "ujson" or "json". If None - the fastest installed one
+        :type json_backend: str
+
+        :param compression: compress bulk request bodies, e.g. Compressor('gzip', threshold=1024).
+                            If None - bodies are not compressed
+        :type compression: Compressor
+
+        :param transport: HTTP transport shared by many Chatbase instances, it's not closed by close().
+                            If None - own transport with default settings
+        :type transport: Transport
+
+        :param pool: existing pool to save messages to (e.g. shared by ChatbaseHub), it's not closed by close().
+                    Overrides pool_* settings
+        :type pool: Pool
+
+        :param max_tasks: max number of tasks (task mode and pool sending) running at the same time.
+                            If None - unlimited
+        :type max_tasks: int
+
+        :param max_pending_tasks: max number of tasks waiting for their turn. If None - unlimited
+        :type max_pending_tasks: int
+
+        :param task_overflow: "block" (wait for free room), "drop_oldest" or "drop_newest" waiting task
+        :type task_overflow: str
+
+        :param pool_spool: hold pooled messages in disk spool instead of memory, e.g. Spool('/var/spool/bot').
+                            Messages left in spool are sent after restart. Overrides pool capacity settings
+        :type pool_spool: Spool
+
+        :param dead_letter: save messages, events and clicks, which failed in pool or task mode,
+                            e.g. DeadLetterQueue(max_items=10000) or DeadLetterFile('dead_letters.ndjson').
+                            Saved items can be sent again by replay(). If None - failed items are lost
+        :type dead_letter: BaseDeadLetter
+
+        :param collector: Unix domain socket path of Collector. Messages and events are sent to collector process,
+                            which sends them to Chatbase for all workers. Pool settings are ignored
+        :type collector: str
+
+        :param base_url: base URL of Chatbase compatible API (e.g. relay "http://localhost:8080").
+                        If None - Chatbase API
+        :type base_url: str
+
+        :param metrics: metrics registry, can be shared by many instances. If None - own registry
+        :type metrics: Metrics
+
+        :param profiler: time stages of sending (preparing, checking, encoding, connecting, writing request,
+                        waiting and reading response). HTTP stages are timed only with own transport
+                        or transport created with profiler trace config. If None - stages are not timed
+        :type profiler: Profiler
+
+        :param event_pool: existing pool to save events to (e.g. shared by ChatbaseHub), it's not closed by close().
+                            Used only if pool_events is True and pool is set
+        :type event_pool: Pool
+
         """
 
         self.api_key = api_key
@@ -38,25 +137,75 @@ class Chatbase:
         self.task_mode = task_mode
         self.pool_size = pool_size
         self.version = version
+        self.pool_linger = pool_linger
+        self.bulk_chunk_size = bulk_chunk_size
+        self.bulk_chunk_bytes = bulk_chunk_bytes
+        self.bulk_concurrency = bulk_concurrency
+        self.pool_events = pool_events
+        self.retry = retry
+        self.requeue_failed = requeue_failed
+        self.json_backend = json.get_backend(json_backend)
+        self._encoder = get_encoder(api_key, platform, version=version, backend=self.json_backend)
+        self.compression = compression
+        self.dead_letter = dead_letter
+        self.base_url = base_url
+        self.metrics = metrics or Metrics()
+        self.profiler = profiler
+        self.task_limiter = TaskLimiter(max_tasks=max_tasks, max_pending=max_pending_tasks, overflow=task_overflow)
+
+        # items and sending coroutine of each task, which is not done
+        self._task_items = {}
+
+        # messages and events are pooled by collector process
+        self.collector = CollectorClient(collector) if collector else None
+        if self.collector is not None:
+            self.pool_size = 0
 
         # pool init
-        if bool(self.pool_size):
-            self.pool = Pool(self, size=pool_size)
+        self._own_pool = pool is None
+        if pool is not None:
+            self.pool = pool
+            self.pool_size = pool.size
+            self.pool_linger = pool_linger = pool.linger
+
+        elif bool(self.pool_size) and pool_spool is not None:
+            self.pool = SpooledPool(self, pool_spool, size=pool_size, linger=pool_linger)
+
+        elif bool(self.pool_size):
+            self.pool = Pool(self, size=pool_size, linger=pool_linger, max_messages=pool_max_messages,
+                             max_bytes=pool_max_bytes, overflow=pool_overflow)
+
+        self._own_event_pool = event_pool is None
+        if bool(self.pool_size) and self.pool_events and event_pool is not None:
+            self.event_pool = event_pool
+
+        elif bool(self.pool_size) and self.pool_events:
+            self.event_pool = Pool(self, size=self.pool_size, linger=pool_linger, max_messages=pool_max_messages,
+                                   max_bytes=pool_max_bytes, overflow=pool_overflow,
+                                   send=partial(self.register_events, partial=True))
 
         # asyncio loop instance
         if loop is None:
             loop = asyncio.get_event_loop()
         self._loop = loop
 
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl_context=ssl_context, loop=self._loop)
-        self.session = aiohttp.ClientSession(connector=connector, loop=self._loop, json_serialize=json.dumps)
+        # session is created on first request
+        self._own_transport = transport is None
+        self.transport = transport or Transport(trace_configs=[profiler.trace_config()] if profiler else None)
 
-    async def prepare_message(self, user_id, intent=None, message=None, not_handled=None, version=None,
-                              session_id=None, message_type=MessageTypes.USER,
-                              time_stamp=None):
+        self.metrics.add_collector(self._collect_metrics)
+
+    @property
+    def session(self):
+        """
+        :rtype: aiohttp.ClientSession
+        """
+        return self.transport.session
+
+    def make_message(self, user_id, intent=None, message=None, not_handled=None, version=None,
+                     session_id=None, message_type=MessageTypes.USER, time_stamp=None):
         """
-        Prepare message
+        Prepare message without awaiting
 
         :param user_id: chatbot user id
         :type user_id: str
@@ -85,23 +234,39 @@ class Chatbase:
         :return: Chatbase message
         :rtype: Message
         """
+        started = time.perf_counter()
         if not time_stamp:
             time_stamp = datetime.now().timestamp()
 
         if not version:
             version = self.version
 
-        return Message(api_key=self.api_key,
-                       message_type=message_type,
-                       user_id=user_id,
-                       time_stamp=int(time_stamp * 1000),  # milliseconds!
-                       platform=self.platform,
-                       message=message,
-                       intent=intent,
-                       not_handled=not_handled,
-                       version=version,
-                       session_id=session_id,
-                       session=self.session)
+        msg = Message(api_key=self.api_key,
+                      message_type=message_type,
+                      user_id=user_id,
+                      time_stamp=int(time_stamp * 1000),  # milliseconds!
+                      platform=self.platform,
+                      message=message,
+                      intent=intent,
+                      not_handled=not_handled,
+                      version=version,
+                      session_id=session_id)
+
+        if self.profiler is not None:
+            self.profiler.since(Stage.PREPARE, started)
+        return msg
+
+    async def prepare_message(self, user_id, intent=None, message=None, not_handled=None, version=None,
+                              session_id=None, message_type=MessageTypes.USER,
+                              time_stamp=None):
+        """
+        Prepare message. Coroutine version of make_message
+
+        :return: Chatbase message
+        :rtype: Message
+        """
+        return self.make_message(user_id, intent=intent, message=message, not_handled=not_handled, version=version,
+                                 session_id=session_id, message_type=message_type, time_stamp=time_stamp)
 
     async def register_message(self, user_id, intent=None, message=None, not_handled=None, version=None,
                                session_id=None, message_type=MessageTypes.USER, time_stamp=None, task=None):
@@ -135,39 +300,110 @@ class Chatbase:
          :param task: Returns aio.Task if True, returns result if False, default value if None
          :type task: bool
 
-         :return: Chatbase message id
-         :rtype: str
+         :return: Chatbase message id. In pool mode - asyncio.Future, which is resolved with Chatbase message id
+                    (or ChatbaseException) when pool is sent, None if pool is spooled
+         :rtype: str or asyncio.Future
          """
 
-        coroutine = self._register_message(user_id=user_id, intent=intent, message=message, not_handled=not_handled,
-                                           version=version, session_id=session_id, message_type=message_type,
-                                           time_stamp=time_stamp)
+        message = self.make_message(user_id, intent=intent, message=message, not_handled=not_handled,
+                                    version=version, session_id=session_id, message_type=message_type,
+                                    time_stamp=time_stamp)
+        coroutine = self._register_message(message)
+
         if isinstance(task, bool):
             if not task:
                 return await coroutine
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [message])
 
         if self.task_mode:
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [message])
 
         return await coroutine
 
-    async def _register_message(self, user_id, intent=None, message=None, not_handled=None, version=None,
-                                session_id=None, message_type=MessageTypes.USER, time_stamp=None):
-        message = await self.prepare_message(user_id, intent=intent, message=message, not_handled=not_handled,
-                                             version=version, session_id=session_id, message_type=message_type,
-                                             time_stamp=time_stamp)
+    async def _register_message(self, message):
+        if self.collector is not None:
+            await self.collector.send(message, self._encoder)
+            return
 
         if bool(self.pool_size):
+            if self.pool.futures:
+                message.future = self._loop.create_future()
             await self.pool.add_message(message)
-            return
+            return message.future
 
-        cb_msg_id = await message.send()
-        logger.info(f"Registered {self.platform} message from {message_type} {user_id} with intent '{intent}'. "
-                    f"Message id: {cb_msg_id}. Timestamp: {message.time_stamp} ")
+        return await self._send_message(message)
+
+    async def _send_message(self, message):
+        try:
+            cb_msg_id = await message.send(self.session, retry=self.retry, backend=self._encoder,
+                                           base_url=self.base_url, metrics=self.metrics, profiler=self.profiler)
+        except Exception:
+            self.metrics.failed.inc('message')
+            raise
+
+        self.metrics.sent.inc('message')
+        logger.info(f"Registered {self.platform} message from {message.message_type} {message.user_id} "
+                    f"with intent '{message.intent}'. Message id: {cb_msg_id}. Timestamp: {message.time_stamp} ")
         return cb_msg_id
 
-    async def register_messages(self, message_list, task=None):
+    def track_message_nowait(self, user_id, intent=None, message=None, not_handled=None, version=None,
+                             session_id=None, message_type=MessageTypes.USER, time_stamp=None):
+        """
+        Register message without awaiting. In pool mode message is put to pool directly,
+        otherwise it is sent in asyncio task
+
+        :param user_id: chatbot user id
+        :type user_id: str
+
+        :param intent: chatbot user intention
+        :type intent: str
+
+        :param message: user full message
+        :type message: str
+
+        :param not_handled: True if your bot don't understand user intention
+        :type not_handled: bool
+
+        :param version: fill to track versions of your code
+        :type version: str
+
+        :param session_id: fill to track your own custom sessions
+        :type session_id: str
+
+        :param message_type: "user" or "agent" (aka your chatbot)
+        :type message_type: str
+
+        :param time_stamp: seconds since the UNIX epoch, used to sequence messages.
+        :type time_stamp: int or float
+
+        :raises PoolIsFull: if pool is full and pool overflow policy is "block"
+        :raises TooManyTasks: if too many tasks are waiting and task overflow policy is "block"
+
+        :return: None in pool mode, asyncio.Task otherwise (None if task was dropped)
+        :rtype: asyncio.Task or None
+        """
+        message = self.make_message(user_id, intent=intent, message=message, not_handled=not_handled,
+                                    version=version, session_id=session_id, message_type=message_type,
+                                    time_stamp=time_stamp)
+
+        if self.collector is not None:
+            self.collector.send_nowait(message, self._encoder)
+            return
+
+        if bool(self.pool_size):
+            self.pool.put_nowait(message)
+            return
+
+        sending = self._send_message(message)
+        coroutine, dropped = self._task(sending, [message])
+        try:
+            task = self.task_limiter.spawn_nowait(coroutine, dropped)
+        except TooManyTasks:
+            sending.close()
+            raise
+        return self._watch(task, sending, [message])
+
+    async def register_messages(self, message_list, task=None, partial=False):
         """
         :param message_list:
         :type message_list: List[Message]
@@ -175,33 +411,148 @@ class Chatbase:
         :param task: task mode (run in asyncio task)
         :type task: bool
 
-        :return: list of Chatbase message ids
-        :rtype: List[str]
+        :param partial: return status of each message instead of raising ChatbaseException on failed ones
+        :type partial: bool
+
+        :return: list of Chatbase message ids or BulkResult if partial is True
+        :rtype: List[str] or BulkResult
         """
-        coroutine = self._register_messages(message_list=message_list)
+        coroutine = self._register_messages(message_list=message_list, partial=partial)
 
         if isinstance(task, bool):
             if not task:
                 return await coroutine
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, message_list)
 
         if self.task_mode:
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, message_list)
 
         return await coroutine
 
-    async def _register_messages(self, message_list):
+    async def _register_messages(self, message_list, partial=False):
         """
         :param message_list:
         :type message_list: List[Message]
 
-        :return: list of Chatbase message ids
-        :rtype: List[str]
+        :param partial: return BulkResult instead of raising ChatbaseException on failed messages
+        :type partial: bool
+
+        :return: list of Chatbase message ids or BulkResult. None if messages are sent to collector
+        :rtype: List[str] or BulkResult
+        """
+        if self.collector is not None:
+            for message in message_list:
+                self.collector.send_nowait(message, self._encoder)
+            await self.collector.drain()
+            return
+
+        messages = Messages(message_list)
+        try:
+            result = BulkResult.merge(await self._send_bulk(messages, partial=True))
+        except Exception as e:
+            for message in message_list:
+                ItemResult.failure(message, str(e)).resolve()
+            self.metrics.failed.inc('message', len(message_list))
+            raise
+
+        logger.info(f"Registered {self.platform} messages: {result.message_ids}")
+
+        succeeded = result.succeeded
+        for r in succeeded:
+            r.resolve()
+        self.metrics.sent.inc('message', len(succeeded))
+
+        failed = result.failed
+        if failed:
+            logger.warning(f"{len(failed)} of {len(result)} {self.platform} messages failed: {failed[0].reason}")
+            not_requeued = self._requeue_failed(failed)
+            for r in not_requeued:
+                r.resolve()
+            self.metrics.failed.inc('message', len(not_requeued))
+
+        if partial:
+            return result
+
+        if failed:
+            raise ChatbaseException(failed[0].reason)
+
+        return result.message_ids
+
+    def _requeue_failed(self, failed):
+        """
+        Put failed messages back to pool
+
+        :param failed:
+        :type failed: List[ItemResult]
+
+        :return: failed messages results, which were not requeued
+        :rtype: List[ItemResult]
+        """
+        if not (self.requeue_failed and bool(self.pool_size)):
+            return failed
+
+        not_requeued = []
+        for r in failed:
+            message = r.item
+            message.failures += 1
+            if message.failures > self.requeue_failed:
+                not_requeued.append(r)
+                continue
+
+            try:
+                self.pool.put_nowait(message)
+                r.requeued = True
+            except PoolIsFull:
+                logger.warning(f"Pool is full, failed message from {message.user_id} can't be requeued")
+                not_requeued.append(r)
+        return not_requeued
+
+    async def _send_bulk(self, bulk, partial=False):
+        """
+        Split bulk object to chunks and send them concurrently.
+        Chunk, which sending raised, is failed (BulkResult of failed items or False), while other
+        chunks are delivered. If sending of every chunk raised, the first exception is raised
+
+        :param bulk:
+        :type bulk: Messages or Events
+
+        :param partial: use send_partial method of chunks
+        :type partial: bool
+
+        :return: list of chunks send results in original order
+        :rtype: list
         """
-        messages = Messages(message_list, session=self.session)
-        msgs_id_list = await messages.send()
-        logger.info(f"Registered {self.platform} messages: {msgs_id_list}")
-        return msgs_id_list
+        chunks = await bulk.split(max_items=self.bulk_chunk_size, max_bytes=self.bulk_chunk_bytes,
+                                  backend=self._encoder, profiler=self.profiler)
+        semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+        async def send_chunk(chunk):
+            async with semaphore:
+                self.metrics.batch_size.observe(len(chunk.items), chunk._api_path)
+                if partial:
+                    return await chunk.send_partial(self.session, retry=self.retry, backend=self._encoder,
+                                                    compressor=self.compression, base_url=self.base_url,
+                                                    metrics=self.metrics, profiler=self.profiler)
+                return await chunk.send(self.session, retry=self.retry, backend=self._encoder,
+                                        compressor=self.compression, base_url=self.base_url, metrics=self.metrics,
+                                        profiler=self.profiler)
+
+        results = await asyncio.gather(*[send_chunk(chunk) for chunk in chunks], return_exceptions=True)
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for e in errors:
+            if isinstance(e, asyncio.CancelledError):
+                raise e
+        if errors and len(errors) == len(results):
+            raise errors[0]
+
+        for i, (chunk, r) in enumerate(zip(chunks, results)):
+            if isinstance(r, BaseException):
+                logger.error(f"Sending of {len(chunk.items)} {self.platform} items failed: {r!r}")
+                retryable = is_transient(r)
+                results[i] = BulkResult([ItemResult.failure(item, str(r), retryable=retryable)
+                                         for item in chunk.items]) if partial else False
+        return results
 
     async def register_click(self, url, user_id=None, version=None, task=None):
         """
@@ -223,22 +574,29 @@ class Chatbase:
         :rtype bool
         """
 
-        coroutine = self._register_click(url=url, user_id=user_id, version=version)
+        click = Click(self.api_key, url, self.platform, user_id=user_id, version=version)
+        coroutine = self._register_click(click)
 
         if isinstance(task, bool):
             if not task:
                 return await coroutine
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [click])
 
         if self.task_mode:
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [click])
 
         return await coroutine
 
-    async def _register_click(self, url, user_id=None, version=None):
-        click = Click(self.api_key, url, self.platform, user_id=user_id, version=version, session=self.session)
-        result = await click.send()
-        logger.info(f"Registered {self.platform} click from user {user_id} to url '{url}'. ")
+    async def _register_click(self, click):
+        try:
+            result = await click.send(self.session, retry=self.retry, backend=self._encoder, base_url=self.base_url,
+                                      metrics=self.metrics, profiler=self.profiler)
+        except Exception:
+            self.metrics.failed.inc('click')
+            raise
+
+        (self.metrics.sent if result else self.metrics.failed).inc('click')
+        logger.info(f"Registered {self.platform} click from user {click.user_id} to url '{click.url}'. ")
         return result
 
     async def register_event(self, user_id, intent, time_stamp=None, version=None, properties=None, task=None):
@@ -267,38 +625,327 @@ class Chatbase:
         :return: True if result is OK
         :rtype: bool
         """
-        coroutine = self._register_event(user_id=user_id, intent=intent, time_stamp=time_stamp, version=version,
-                                         properties=properties)
+        if not time_stamp:
+            time_stamp = datetime.now().timestamp()
+
+        timestamp_millis = int(time_stamp * 1000)
+        event = Event(api_key=self.api_key, user_id=user_id, intent=intent, timestamp_millis=timestamp_millis,
+                      platform=self.platform, version=version, properties=properties)
+        coroutine = self._register_event(event)
 
         if isinstance(task, bool):
             if not task:
                 return await coroutine
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [event])
 
         if self.task_mode:
-            return asyncio.ensure_future(coroutine)
+            return await self._spawn(coroutine, [event])
 
         return await coroutine
 
-    async def _register_event(self, user_id, intent, time_stamp=None, version=None, properties=None):
-        if not time_stamp:
-            time_stamp = datetime.now().timestamp()
+    async def _register_event(self, event):
+        if self.collector is not None:
+            await self.collector.send(event, self._encoder)
+            return
 
-        timestamp_millis = int(time_stamp * 1000)
-        event = Event(api_key=self.api_key, user_id=user_id, intent=intent, timestamp_millis=timestamp_millis,
-                      platform=self.platform, version=version, properties=properties, session=self.session)
-        result = await event.send()
-        logger.info(f"Registered {self.platform} event from user {user_id} with intent {intent}. ")
+        if bool(self.pool_size) and self.pool_events:
+            await self.event_pool.add_message(event)
+            return
+
+        try:
+            result = await event.send(self.session, retry=self.retry, backend=self._encoder, base_url=self.base_url,
+                                      metrics=self.metrics, profiler=self.profiler)
+        except Exception:
+            self.metrics.failed.inc('event')
+            raise
+
+        (self.metrics.sent if result else self.metrics.failed).inc('event')
+        logger.info(f"Registered {self.platform} event from user {event.user_id} with intent {event.intent}. ")
         return result
 
-    async def close(self):
-        # send last messages from pool
+    async def register_events(self, event_list, task=None, partial=False):
+        """
+        Register events in bulk
+
+        :param event_list:
+        :type event_list: List[Event]
+
+        :param task: task mode (run in asyncio task)
+        :type task: bool
+
+        :param partial: return status of each event instead of single bool
+        :type partial: bool
+
+        :return: True if result is OK or BulkResult if partial is True
+        :rtype: bool or BulkResult
+        """
+        coroutine = self._register_events(event_list=event_list, partial=partial)
+
+        if isinstance(task, bool):
+            if not task:
+                return await coroutine
+            return await self._spawn(coroutine, event_list)
+
+        if self.task_mode:
+            return await self._spawn(coroutine, event_list)
+
+        return await coroutine
+
+    async def _register_events(self, event_list, partial=False):
+        """
+        :param partial: return BulkResult instead of single bool
+        :type partial: bool
+
+        :return: True if all events are registered or BulkResult. True if events are sent to collector
+        :rtype: bool or BulkResult
+        """
+        if self.collector is not None:
+            for event in event_list:
+                self.collector.send_nowait(event, self._encoder)
+            await self.collector.drain()
+            return True
+
+        events = Events(event_list)
+        try:
+            result = BulkResult.merge(await self._send_bulk(events, partial=True))
+        except Exception:
+            self.metrics.failed.inc('event', len(event_list))
+            raise
+
+        logger.info(f"Registered {len(event_list)} {self.platform} events. ")
+        failed = result.failed
+        self.metrics.sent.inc('event', len(result) - len(failed))
+        if failed:
+            logger.warning(f"{len(failed)} of {len(result)} {self.platform} events failed: {failed[0].reason}")
+            self.metrics.failed.inc('event', len(failed))
+
+        if partial:
+            return result
+        return result.all_succeeded
+
+    async def _spawn(self, coroutine, items):
+        """
+        Run coroutine in task, failed items are saved to dead letters (if any)
+
+        :param items: items sent by coroutine
+        :type items: list
+        """
+        sending = coroutine
+        coroutine, dropped = self._task(sending, items)
+        task = await self.task_limiter.spawn(coroutine, dropped)
+        return self._watch(task, sending, items)
+
+    def _watch(self, task, sending, items):
+        """ Keep items of task until it is done, so they are known if task is cancelled on close """
+        if task is not None and not task.done():
+            self._task_items[task] = (sending, items)
+            task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._task_items.pop(task, None)
+
+    def _task(self, coroutine, items):
+        """
+        :param items: items sent by coroutine
+        :type items: list
+
+        :return: coroutine to run in task, which saves failed items to dead letters (if any),
+                and function, which fails items if the task is dropped by task overflow policy
+        :rtype: tuple
+        """
+        sending = coroutine
+        if self.dead_letter is not None:
+            coroutine = self.dead_letter.capture(coroutine, items)
+
+        def dropped():
+            sending.close()
+            self._drop_items(items, 'Dropped by task overflow policy')
+
+        return coroutine, dropped
+
+    def _drop_items(self, items, reason):
+        """ Fail items, which are not going to be sent, and save them to dead letters (if any) """
+        for item in items:
+            ItemResult.failure(item, reason).resolve()
+            self.metrics.dropped.inc(item_kind(item))
+        if self.dead_letter is not None:
+            self.dead_letter.put_many([(item, reason) for item in items])
+
+    async def replay(self, limit=None):
+        """
+        Send items saved to dead letters again. Messages and events are sent in bulk requests,
+        items failed again are saved back to dead letters
+
+        :param limit: max number of items. If None - all
+        :type limit: int
+
+        :return: status of each item
+        :rtype: BulkResult
+        """
+        if self.dead_letter is None:
+            return BulkResult([])
+
+        items = [item for item, _ in self.dead_letter.take(limit)]
+        result = await self._replay(items)
+        self.dead_letter.put_failed(result)
+        logger.info(f"Replayed {len(result)} dead letters, {len(result.failed)} failed again")
+        return result
+
+    async def _replay(self, items):
+        """
+        :param items: messages, events and clicks
+        :type items: list
+
+        :rtype: BulkResult
+        """
+        messages = [i for i in items if isinstance(i, Message)]
+        events = [i for i in items if isinstance(i, Event)]
+        clicks = [i for i in items if isinstance(i, Click)]
+        results = []
+
+        if messages:
+            try:
+                results.append(await self._register_messages(messages, partial=True))
+            except Exception as e:
+                results.append(BulkResult([ItemResult.failure(m, str(e)) for m in messages]))
+
+        if events:
+            try:
+                results.append(await self._register_events(events, partial=True))
+            except Exception as e:
+                results.append(BulkResult([ItemResult.failure(event, str(e)) for event in events]))
+
+        if clicks:
+            semaphore = asyncio.Semaphore(self.bulk_concurrency)
+
+            async def replay_click(click):
+                async with semaphore:
+                    try:
+                        if await self._register_click(click):
+                            return ItemResult(click, ItemResult.SUCCESS)
+                        return ItemResult.failure(click, 'Unknown response')
+                    except Exception as e:
+                        return ItemResult.failure(click, str(e))
+
+            results.append(BulkResult(await asyncio.gather(*[replay_click(c) for c in clicks])))
+
+        return BulkResult.merge(results)
+
+    async def flush(self, timeout=None):
+        """
+        Send messages and events held by pool and wait for all running tasks
+
+        :param timeout: max seconds to wait. If None - no limit
+        :type timeout: int or float
+
+        :return: pool messages and events which are not delivered in time or failed
+        :rtype: list
+        """
+        deadline = None if timeout is None else self._loop.time() + timeout
+        undelivered = []
+
         if bool(self.pool_size):
-            await self.pool.close()
+            undelivered += await self.pool.flush(self._remaining(deadline))
+
+        if bool(self.pool_size) and self.pool_events:
+            undelivered += await self.event_pool.flush(self._remaining(deadline))
+
+        await self._join(self._remaining(deadline))
+        return undelivered
+
+    async def _join(self, timeout=None):
+        """ Wait for collector and running tasks of this bot, not for pools, which may be shared by hub """
+        deadline = None if timeout is None else self._loop.time() + timeout
+
+        if self.collector is not None:
+            await self.collector.drain()
+
+        await self.task_limiter.join(self._remaining(deadline), cancel=False)
+
+    async def close(self, timeout=None):
+        """
+        Send messages and events held by pool, wait for all running tasks and close session
+
+        :param timeout: max seconds to wait for delivery, tasks which are not done in time are cancelled.
+                        If None - no limit
+        :type timeout: int or float
+
+        :return: pool messages and events, and items of cancelled tasks, which could not be delivered
+        :rtype: list
+        """
+        deadline = None if timeout is None else self._loop.time() + timeout
+        undelivered = []
+
+        # send last messages from pool
+        if bool(self.pool_size) and self._own_pool:
+            undelivered += await self.pool.close(self._remaining(deadline))
+
+        if bool(self.pool_size) and self.pool_events and self._own_event_pool:
+            undelivered += await self.event_pool.close(self._remaining(deadline))
+
+        # wait for running tasks
+        not_done = await self.task_limiter.join(self._remaining(deadline), cancel=False)
+        if not_done:
+            undelivered += await self._cancel_tasks(not_done)
+
+        if self.collector is not None:
+            await self.collector.close()
 
         # close session
-        if self.session and isinstance(self.session, aiohttp.ClientSession) and not self.session.closed:
-            await self.session.close()
+        if self._own_transport:
+            await self.transport.close()
+
+        self.metrics.remove_collector(self._collect_metrics)
+        return undelivered
+
+    async def _cancel_tasks(self, tasks):
+        """
+        Cancel tasks and fail their items. Items of tasks, which have not been started,
+        are saved to dead letters (if any), started ones save them on cancellation
+
+        :return: items of cancelled tasks
+        :rtype: list
+        """
+        watched = [self._task_items[task] for task in tasks if task in self._task_items]
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+        logger.warning(f'{len(tasks)} tasks are not done before Chatbase was closed and cancelled')
+
+        reason = 'Not delivered before Chatbase was closed'
+        undelivered = []
+        for sending, items in watched:
+            not_started = inspect.getcoroutinestate(sending) == inspect.CORO_CREATED
+            sending.close()
+            for item in items:
+                ItemResult.failure(item, reason).resolve()
+                self.metrics.failed.inc(item_kind(item))
+            if not_started and self.dead_letter is not None:
+                self.dead_letter.put_many([(item, reason) for item in items])
+            undelivered += items
+        return undelivered
+
+    def stats(self):
+        """
+        Snapshot of metrics: items enqueued, sent, failed and dropped by kind, pool depth, tasks,
+        bulk batch sizes, HTTP request durations, errors, bytes and retries by endpoint
+
+        :rtype: dict
+        """
+        return self.metrics.stats()
+
+    def _collect_metrics(self):
+        if bool(self.pool_size) and self._own_pool:
+            self.metrics.pool_items.inc('message', self.pool.depth)
+
+        if bool(self.pool_size) and self.pool_events and self._own_event_pool:
+            self.metrics.pool_items.inc('event', self.event_pool.depth)
+
+        self.task_limiter.collect_metrics(self.metrics)
+
+    def _remaining(self, deadline):
+        if deadline is None:
+            return None
+        return max(deadline - self._loop.time(), 0)
 
-        # graceful shutdown for aiohttp
-        await asyncio.sleep(0.25)
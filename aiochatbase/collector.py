@@ -0,0 +1,206 @@
+"""
+Multi-process collector
+
+Worker processes send messages and events as NDJSON records through Unix domain socket
+to a single collector (in master process, separate process or thread), which puts them to
+its Chatbase or ChatbaseHub pool. So batching and HTTP connections are shared by all workers.
+
+Collector side::
+
+    cb = Chatbase(API_KEY, PLATFORM, pool_size=500, pool_linger=1, pool_events=True)
+    collector = Collector(cb, '/run/chatbase.sock')
+    await collector.start()
+
+Worker side::
+
+    cb = Chatbase(API_KEY, PLATFORM, collector='/run/chatbase.sock')
+    await cb.register_message(user_id='123456', intent='start')
+
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+
+from .types import Message, Event
+from .utils import json
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+KINDS = {
+    'message': Message,
+    'event': Event,
+}
+_NAMES = {cls: kind for kind, cls in KINDS.items()}
+
+# asyncio.Task.current_task is removed in Python 3.9
+_current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+
+
+class Collector:
+    def __init__(self, target, path):
+        """
+        :param target: Chatbase or ChatbaseHub in pool mode, which sends collected items
+        :type target: Chatbase or ChatbaseHub
+
+        :param path: Unix domain socket path
+        :type path: str
+        """
+        self.target = target
+        self.path = path
+
+        # stats
+        self.received = 0
+        self.skipped = 0
+
+        self._server = None
+        self._handlers = set()
+
+    async def start(self):
+        # remove socket of previous run
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        logger.info(f'Collector is listening on {self.path}')
+
+    async def _handle(self, reader, writer):
+        task = _current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self._put(line)
+        except ConnectionError as e:
+            logger.warning(f'Collector connection is lost: {e!r}')
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _put(self, line):
+        try:
+            record = json.loads(line)
+            item = KINDS[record['kind']].from_dict(record['item'])
+        except (ValueError, KeyError, TypeError) as e:
+            self.skipped += 1
+            logger.error(f'Collected record {line[:100]!r} is skipped: {e!r}')
+            return
+
+        self.received += 1
+
+        # waiting for room in pool stops reading, so workers get backpressure
+        if isinstance(item, Message):
+            await self.target.pool.add_message(item)
+            return
+
+        # ChatbaseHub sends events by tenant
+        cb = self.target.tenant(item.api_key, item.platform) if hasattr(self.target, 'tenant') else self.target
+        if bool(cb.pool_size) and cb.pool_events:
+            await cb.event_pool.add_message(item)
+        else:
+            await cb.register_events([item], task=True)
+
+    async def close(self):
+        """ Stop accepting records. Target is not closed """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        for task in list(self._handlers):
+            task.cancel()
+        if self._handlers:
+            await asyncio.wait(list(self._handlers))
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CollectorClient:
+    def __init__(self, path, max_backlog=10000):
+        """
+        Worker side of collector. Connection is opened on first use, so client can be created before fork
+
+        :param path: Unix domain socket path of collector
+        :type path: str
+
+        :param max_backlog: max number of records kept while collector is not available,
+                            the oldest ones are dropped
+        :type max_backlog: int
+        """
+        self.path = path
+        self.max_backlog = max_backlog
+
+        # stats
+        self.dropped = 0
+
+        self._writer = None
+        self._backlog = deque()
+        self._connecting = None
+
+    def _encode(self, item, encoder):
+        return b'{"kind": "' + _NAMES[type(item)].encode() + b'", "item": ' + item.to_bytes(encoder) + b'}\n'
+
+    def send_nowait(self, item, encoder=None):
+        """
+        Write record to socket buffer, or to backlog while collector is not connected
+
+        :param item: Message or Event
+        :param encoder: JSON backend or TemplateEncoder
+        """
+        line = self._encode(item, encoder)
+        if self._writer is not None and not self._writer.transport.is_closing():
+            self._writer.write(line)
+            return
+
+        self._writer = None
+        if len(self._backlog) >= self.max_backlog:
+            self._backlog.popleft()
+            self.dropped += 1
+            logger.warning(f'Collector backlog is full, the oldest record dropped. Total dropped: {self.dropped}')
+        self._backlog.append(line)
+
+        if self._connecting is None or self._connecting.done():
+            self._connecting = asyncio.ensure_future(self._connect())
+
+    async def send(self, item, encoder=None):
+        """
+        Send record and wait until socket buffer is drained
+
+        :param item: Message or Event
+        :param encoder: JSON backend or TemplateEncoder
+        """
+        self.send_nowait(item, encoder)
+        await self.drain()
+
+    async def drain(self):
+        if self._connecting is not None:
+            await asyncio.shield(self._connecting)
+
+        if self._writer is not None:
+            try:
+                await self._writer.drain()
+            except ConnectionError as e:
+                logger.warning(f'Collector connection is lost: {e!r}')
+                self._writer = None
+
+    async def _connect(self):
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            logger.warning(f'Collector {self.path} is not available: {e!r}. Backlog: {len(self._backlog)}')
+            return
+
+        while self._backlog:
+            writer.write(self._backlog.popleft())
+        self._writer = writer
+
+    async def close(self):
+        await self.drain()
+        if self._backlog:
+            logger.warning(f'{len(self._backlog)} records are not sent to collector')
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,339 @@
+import asyncio
+import logging
+from functools import partial
+
+from .chatbase import Chatbase
+from .types import Pool, SpooledPool, BulkResult, ItemResult, ChatbaseException
+from .utils import json
+from .utils.metrics import Metrics, item_kind
+from .utils.retry import is_transient
+from .utils.tasks import TaskLimiter
+from .utils.transport import Transport
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class ChatbaseHub:
+    def __init__(self, pool_size=100, pool_linger=1, pool_max_messages=None, pool_max_bytes=None,
+                 pool_overflow=None, transport=None, json_backend=None, pool_spool=None, dead_letter=None,
+                 metrics=None, **options):
+        """
+        Hub of many chat bots (tenants). All tenants share one pool and one transport,
+        pool is sent in bulk requests grouped by api_key.
+
+        :param pool_size: send pool as soon as it holds this many messages of all tenants
+        :type pool_size: int
+
+        :param pool_linger: max seconds a message can wait in pool before it is sent
+        :type pool_linger: int or float
+
+        :param pool_max_messages: pool capacity in messages. If None - unlimited
+        :type pool_max_messages: int
+
+        :param pool_max_bytes: pool capacity in bytes of encoded messages. If None - unlimited
+        :type pool_max_bytes: int
+
+        :param pool_overflow: "block" (wait for free room), "drop_oldest", "drop_newest" or "sample"
+        :type pool_overflow: str
+
+        :param transport: If None - own transport with default settings
+        :type transport: Transport
+
+        :param json_backend: "orjson", "ujson" or "json". If None - the fastest installed one
+        :type json_backend: str
+
+        :param pool_spool: hold pooled messages in disk spool instead of memory. Overrides pool capacity settings
+        :type pool_spool: Spool
+
+        :param dead_letter: save items, which failed in pool or task mode, shared by all tenants
+        :type dead_letter: BaseDeadLetter
+
+        :param metrics: metrics registry shared by all tenants. If None - own registry
+        :type metrics: Metrics
+
+        :param options: other Chatbase options for tenants (retry, bulk_chunk_size, compression, etc.).
+                        Task limits (max_tasks, max_pending_tasks, task_overflow) are applied to hub tasks too.
+                        With pool_events events of all tenants are saved to one hub event pool
+        """
+        self.json_backend = json.get_backend(json_backend)
+        self.options = options
+        self.options['json_backend'] = json_backend
+        self.options['dead_letter'] = dead_letter
+        self.dead_letter = dead_letter
+        self.metrics = metrics or Metrics()
+        self.options['metrics'] = self.metrics
+
+        # tenants use hub transport, so HTTP stages are timed by its trace config
+        profiler = options.get('profiler')
+        self._own_transport = transport is None
+        self.transport = transport or Transport(trace_configs=[profiler.trace_config()] if profiler else None)
+
+        if pool_spool is not None:
+            self.pool = SpooledPool(self, pool_spool, size=pool_size, linger=pool_linger)
+        else:
+            self.pool = Pool(self, size=pool_size, linger=pool_linger, max_messages=pool_max_messages,
+                             max_bytes=pool_max_bytes, overflow=pool_overflow)
+
+        self.event_pool = None
+        if options.get('pool_events'):
+            self.event_pool = Pool(self, size=pool_size, linger=pool_linger, max_messages=pool_max_messages,
+                                   max_bytes=pool_max_bytes, overflow=pool_overflow,
+                                   send=partial(self.register_events, partial=True))
+            self.options['event_pool'] = self.event_pool
+
+        self.task_limiter = TaskLimiter(max_tasks=options.get('max_tasks'),
+                                        max_pending=options.get('max_pending_tasks'),
+                                        overflow=options.get('task_overflow'))
+        self.metrics.add_collector(self._collect_metrics)
+
+        self._tenants = {}
+        self._senders = {}
+
+    @property
+    def _encoder(self):
+        # used by pool to measure messages
+        return self.json_backend
+
+    def tenant(self, api_key, platform, version=None):
+        """
+        Get Chatbase instance of chat bot, which saves messages to hub pool
+
+        :param api_key: Chatbase API token key
+        :type api_key: str
+
+        :param platform: chat bot platform
+        :type platform: str
+
+        :param version: version of chat bot
+        :type version: str
+
+        :rtype: Chatbase
+        """
+        key = (api_key, platform, version)
+        if key not in self._tenants:
+            cb = Chatbase(api_key, platform, version=version, transport=self.transport, pool=self.pool,
+                          **self.options)
+            self._tenants[key] = cb
+            self._senders.setdefault(api_key, cb)
+        return self._tenants[key]
+
+    async def register_messages(self, message_list, task=None, partial=True):
+        """
+        Register messages of many tenants, grouped in bulk requests by api_key
+
+        :param message_list:
+        :type message_list: List[Message]
+
+        :param task: run in asyncio task
+        :type task: bool
+
+        :param partial: return BulkResult instead of raising ChatbaseException on failed messages
+        :type partial: bool
+
+        :return: list of Chatbase message ids (ordered by api_key) or BulkResult
+        :rtype: List[str] or BulkResult
+        """
+        coroutine = self._register_messages(message_list, partial=partial)
+        if task:
+            return await self._spawn(coroutine, message_list)
+        return await coroutine
+
+    async def _register_messages(self, message_list, partial=True):
+        groups = {}
+        for message in message_list:
+            groups.setdefault(message.api_key, []).append(message)
+
+        logger.debug(f'Sending {len(message_list)} messages of {len(groups)} api keys')
+        result = await self._gather(groups, lambda sender, group: sender.register_messages(group, task=False,
+                                                                                            partial=True))
+
+        if partial:
+            return result
+
+        failed = result.failed
+        if failed:
+            raise ChatbaseException(failed[0].reason)
+
+        return result.message_ids
+
+    async def register_events(self, event_list, task=None, partial=False):
+        """
+        Register events of many tenants, grouped in bulk requests by api_key
+
+        :param event_list:
+        :type event_list: List[Event]
+
+        :param task: run in asyncio task
+        :type task: bool
+
+        :param partial: return status of each event instead of single bool
+        :type partial: bool
+
+        :return: True if events of all tenants are registered or BulkResult (ordered by api_key)
+        :rtype: bool or BulkResult
+        """
+        coroutine = self._register_events(event_list, partial=partial)
+        if task:
+            return await self._spawn(coroutine, event_list)
+        return await coroutine
+
+    async def _register_events(self, event_list, partial=False):
+        groups = {}
+        for event in event_list:
+            groups.setdefault(event.api_key, []).append(event)
+
+        logger.debug(f'Sending {len(event_list)} events of {len(groups)} api keys')
+        result = await self._gather(groups, lambda sender, group: sender.register_events(group, task=False,
+                                                                                          partial=True))
+
+        if partial:
+            return result
+        return result.all_succeeded
+
+    async def _gather(self, groups, send):
+        """
+        Send groups of items by their tenants concurrently. Items of group, which sending raised,
+        are failed, while other groups are delivered. If sending of every group raised, the first exception is raised
+
+        :param groups: items grouped by api_key
+        :type groups: dict
+
+        :param send: function of tenant and its items, which returns coroutine with BulkResult
+        :type send: callable
+
+        :rtype: BulkResult
+        """
+        results = await asyncio.gather(*[send(self._sender(api_key, group), group)
+                                         for api_key, group in groups.items()], return_exceptions=True)
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for e in errors:
+            if isinstance(e, asyncio.CancelledError):
+                raise e
+        if errors and len(errors) == len(results):
+            raise errors[0]
+
+        for i, (group, r) in enumerate(zip(groups.values(), results)):
+            if isinstance(r, BaseException):
+                logger.error(f"Sending of {len(group)} items of api key {group[0].api_key} failed: {r!r}")
+                results[i] = BulkResult([ItemResult.failure(item, str(r), retryable=is_transient(r))
+                                         for item in group])
+        return BulkResult.merge(results)
+
+    async def _spawn(self, coroutine, items):
+        """
+        Run coroutine in hub task, failed items are saved to dead letters (if any)
+
+        :param items: items sent by coroutine
+        :type items: list
+        """
+        sending = coroutine
+        if self.dead_letter is not None:
+            coroutine = self.dead_letter.capture(coroutine, items)
+
+        def dropped():
+            sending.close()
+            reason = 'Dropped by task overflow policy'
+            for item in items:
+                ItemResult.failure(item, reason).resolve()
+                self.metrics.dropped.inc(item_kind(item))
+            if self.dead_letter is not None:
+                self.dead_letter.put_many([(item, reason) for item in items])
+
+        return await self.task_limiter.spawn(coroutine, dropped)
+
+    async def replay(self, limit=None):
+        """
+        Send items saved to dead letters again, grouped in bulk requests by api_key.
+        Items failed again are saved back to dead letters
+
+        :param limit: max number of items. If None - all
+        :type limit: int
+
+        :return: status of each item
+        :rtype: BulkResult
+        """
+        if self.dead_letter is None:
+            return BulkResult([])
+
+        groups = {}
+        for item, _ in self.dead_letter.take(limit):
+            groups.setdefault(item.api_key, []).append(item)
+
+        results = await asyncio.gather(*[self._sender(api_key, group)._replay(group)
+                                         for api_key, group in groups.items()])
+        result = BulkResult.merge(results)
+        self.dead_letter.put_failed(result)
+        return result
+
+    def _sender(self, api_key, message_list):
+        # tenant of messages restored from spool may not be created yet
+        if api_key not in self._senders:
+            self.tenant(api_key, message_list[0].platform)
+        return self._senders[api_key]
+
+    async def flush(self, timeout=None):
+        """
+        Send messages held by pool and wait until they are delivered
+
+        :param timeout: max seconds to wait. If None - no limit
+        :type timeout: int or float
+
+        :return: messages which are not delivered in time or failed
+        :rtype: list
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        undelivered = await self.pool.flush(timeout)
+        if self.event_pool is not None:
+            undelivered += await self.event_pool.flush(None if deadline is None else max(deadline - loop.time(), 0))
+
+        # shared pools are flushed once, tenants only wait for their own tasks
+        await self.task_limiter.join(None if deadline is None else max(deadline - loop.time(), 0), cancel=False)
+        for cb in list(self._tenants.values()):
+            await cb._join(None if deadline is None else max(deadline - loop.time(), 0))
+        return undelivered
+
+    async def close(self, timeout=None):
+        """
+        Send messages held by pool, close tenants and session
+
+        :param timeout: max seconds to wait for delivery. If None - no limit
+        :type timeout: int or float
+
+        :return: messages which could not be delivered
+        :rtype: list
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        # send last messages from pool
+        undelivered = await self.pool.close(timeout)
+        if self.event_pool is not None:
+            undelivered += await self.event_pool.close(None if deadline is None else max(deadline - loop.time(), 0))
+
+        remaining = None if deadline is None else max(deadline - loop.time(), 0)
+        await self.task_limiter.join(remaining)
+        for tenant_undelivered in await asyncio.gather(*[cb.close(remaining) for cb in self._tenants.values()]):
+            undelivered += tenant_undelivered
+
+        if self._own_transport:
+            await self.transport.close()
+
+        self.metrics.remove_collector(self._collect_metrics)
+        return undelivered
+
+    def stats(self):
+        """
+        Snapshot of metrics of all tenants
+
+        :rtype: dict
+        """
+        return self.metrics.stats()
+
+    def _collect_metrics(self):
+        self.metrics.pool_items.inc('message', self.pool.depth)
+        if self.event_pool is not None:
+            self.metrics.pool_items.inc('event', self.event_pool.depth)
+        self.task_limiter.collect_metrics(self.metrics)
@@ -0,0 +1,194 @@
+"""
+Local relay of Chatbase Generic API
+
+Relay accepts the same requests as Chatbase API (/api/message, /api/messages, /api/click,
+/apis/v1/events/insert and /apis/v1/events/insert_batch), acknowledges them immediately
+and sends them to Chatbase in pooled, batched and retried bulk requests.
+Bots written in any language can use it as local Chatbase API.
+Items are checked before they are acknowledged, invalid ones are rejected with 400 status.
+Metrics are served by GET /metrics in Prometheus text format.
+
+Run::
+
+    python -m aiochatbase.relay --port 8080 --pool-size 500 --pool-linger 1
+
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from .hub import ChatbaseHub
+from .types import Message, Messages, Event, Events, Click, ChatbaseException
+from .utils import json
+from .utils.retry import RetryPolicy
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class Relay:
+    def __init__(self, hub):
+        """
+        :param hub: hub, which sends relayed items to Chatbase
+        :type hub: ChatbaseHub
+        """
+        self.hub = hub
+
+        # stats
+        self.received = 0
+
+        self.app = web.Application()
+        self.app.router.add_post(Message._api_path, self.handle_message)
+        self.app.router.add_post(Messages._api_path, self.handle_messages)
+        self.app.router.add_post(Click._api_path, self.handle_click)
+        self.app.router.add_post(Event._api_path, self.handle_event)
+        self.app.router.add_post(Events._api_path, self.handle_events)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+
+        self._runner = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        logger.info(f'Relay is listening on http://{host}:{port}')
+
+    async def close(self, timeout=None):
+        """
+        Stop accepting requests and close hub
+
+        :param timeout: max seconds to wait for delivery of relayed items. If None - no limit
+        :type timeout: int or float
+
+        :return: messages which could not be delivered
+        :rtype: list
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+        return await self.hub.close(timeout)
+
+    @staticmethod
+    def _error(reason):
+        return web.json_response({'status': 400, 'reason': reason}, status=400, dumps=json.dumps)
+
+    @staticmethod
+    def _ok(**data):
+        return web.json_response({'status': 200, **data}, dumps=json.dumps)
+
+    async def _read(self, request, field=None):
+        data = json.loads(await request.read())
+        return data[field] if field else data
+
+    @staticmethod
+    async def _check(items):
+        """ Invalid items are rejected instead of being acknowledged and failed later """
+        for item in items:
+            await item.check()
+
+    async def handle_message(self, request):
+        try:
+            message = Message.from_dict(await self._read(request))
+            await message.check()
+        except (ValueError, KeyError, TypeError, ChatbaseException) as e:
+            return self._error(f'Invalid message: {e!r}')
+
+        await self.hub.pool.add_message(message)
+        self.received += 1
+        return self._ok()
+
+    async def handle_messages(self, request):
+        try:
+            messages = [Message.from_dict(m) for m in await self._read(request, 'messages')]
+            await self._check(messages)
+        except (ValueError, KeyError, TypeError, ChatbaseException) as e:
+            return self._error(f'Invalid messages: {e!r}')
+
+        for message in messages:
+            await self.hub.pool.add_message(message)
+        self.received += len(messages)
+        return self._ok(all_succeeded=True, responses=[{'status': 'success'} for _ in messages])
+
+    async def handle_click(self, request):
+        try:
+            click = Click.from_dict(await self._read(request))
+            await click.check()
+        except (ValueError, KeyError, TypeError, ChatbaseException) as e:
+            return self._error(f'Invalid click: {e!r}')
+
+        cb = self.hub.tenant(click.api_key, click.platform)
+        await cb.register_click(click.url, user_id=click.user_id, version=click.version, task=True)
+        self.received += 1
+        return self._ok()
+
+    async def handle_event(self, request):
+        try:
+            event = Event.from_dict(await self._read(request))
+            await event.check()
+        except (ValueError, KeyError, TypeError, ChatbaseException) as e:
+            return self._error(f'Invalid event: {e!r}')
+
+        await self._add_event(event)
+        self.received += 1
+        return self._ok(creation_time=datetime.now(timezone.utc).isoformat())
+
+    async def handle_events(self, request):
+        try:
+            events = [Event.from_dict(e) for e in await self._read(request, 'events')]
+            await self._check(events)
+        except (ValueError, KeyError, TypeError, ChatbaseException) as e:
+            return self._error(f'Invalid events: {e!r}')
+
+        for event in events:
+            await self._add_event(event)
+        self.received += len(events)
+        return self._ok()
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.hub.metrics.prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def _add_event(self, event):
+        cb = self.hub.tenant(event.api_key, event.platform)
+        if bool(cb.pool_size) and cb.pool_events:
+            await cb.event_pool.add_message(event)
+        else:
+            await cb.register_events([event], task=True)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m aiochatbase.relay', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--pool-size', type=int, default=500, help='send pool as soon as it holds this many items')
+    parser.add_argument('--pool-linger', type=float, default=1, help='max seconds an item waits in pool')
+    parser.add_argument('--retries', type=int, default=5, help='max attempts of each request')
+    parser.add_argument('--base-url', default=None, help='upstream Chatbase compatible API. Default - Chatbase API')
+    parser.add_argument('--close-timeout', type=float, default=10, help='max seconds to send items on shutdown')
+    options = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    loop = asyncio.get_event_loop()
+
+    async def start():
+        hub = ChatbaseHub(pool_size=options.pool_size, pool_linger=options.pool_linger, pool_events=True,
+                          retry=RetryPolicy(max_attempts=options.retries), base_url=options.base_url)
+        relay = Relay(hub)
+        await relay.start(options.host, options.port)
+        return relay
+
+    relay = loop.run_until_complete(start())
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        undelivered = loop.run_until_complete(relay.close(options.close_timeout))
+        if undelivered:
+            logger.warning(f'{len(undelivered)} items are not delivered')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""
+Local stand-in Chatbase server for load and fault testing
+
+Server implements message, messages, click and events endpoints of Chatbase API,
+simulates latency, server errors, rate limiting, slow bodies and per-item bulk failures,
+and records everything it received. Use it with Chatbase base_url::
+
+    async with ChatbaseTestServer(latency=uniform(0.01, 0.05), error_rate=0.1) as server:
+        cb = Chatbase(API_KEY, PLATFORM, base_url=server.url, retry=RetryPolicy())
+        await cb.register_message(user_id='123456', intent='start')
+        assert len(server.messages) == 1
+
+"""
+
+import asyncio
+import logging
+import random
+from datetime import datetime
+
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+from .types import Message, Messages, Click, Event, Events
+from .utils import json
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+INVALID_API_KEY_REASON = "Error fetching parameter 'api_key': Missing or invalid field(s): 'api_key'"
+
+
+def constant(seconds):
+    """ Latency distribution: always the same delay """
+    return lambda: seconds
+
+
+def uniform(low, high):
+    """ Latency distribution: uniformly distributed delay """
+    return lambda: random.uniform(low, high)
+
+
+def exponential(mean):
+    """ Latency distribution: exponentially distributed delay (many fast and a few slow responses) """
+    return lambda: random.expovariate(1 / mean)
+
+
+class ReceivedRequest:
+    def __init__(self, path, headers, data, status):
+        """
+        :param path: request path
+        :type path: str
+
+        :param headers: request headers
+        :param data: decoded request body
+        :type data: dict
+
+        :param status: response status
+        :type status: int
+        """
+        self.path = path
+        self.headers = headers
+        self.data = data
+        self.status = status
+
+    def __repr__(self):
+        return f'<ReceivedRequest {self.path} status={self.status}>'
+
+
+class ChatbaseTestServer:
+    def __init__(self, latency=None, error_rate=0, error_status=503, rate_limit_rate=0, retry_after=None,
+                 item_failure_rate=0, item_failure=None, body_delay=0, api_keys=None):
+        """
+        :param latency: delay before response, seconds or function returning seconds (see uniform(), exponential())
+        :type latency: int or float or callable
+
+        :param error_rate: probability of server error response
+        :type error_rate: float
+
+        :param error_status: status of server error response
+        :type error_status: int
+
+        :param rate_limit_rate: probability of 429 Too Many Requests response
+        :type rate_limit_rate: float
+
+        :param retry_after: Retry-After header value of 429 response
+        :type retry_after: int
+
+        :param item_failure_rate: probability of failure of each message of bulk request
+        :type item_failure_rate: float
+
+        :param item_failure: rule, which gets message dict and returns failure reason or None
+        :type item_failure: callable
+
+        :param body_delay: seconds between sending response headers and body
+        :type body_delay: int or float
+
+        :param api_keys: valid api keys, other ones are rejected. If None - any api key is valid
+        :type api_keys: set
+        """
+        self.latency = constant(latency) if isinstance(latency, (int, float)) else latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.item_failure_rate = item_failure_rate
+        self.item_failure = item_failure
+        self.body_delay = body_delay
+        self.api_keys = api_keys
+
+        # received requests
+        self.requests = []
+
+        self._failures = []
+        self._message_id = 0
+        self._runner = None
+        self.url = None
+
+        self.app = web.Application()
+        self.app.router.add_post(Message._api_path, self._handler(self._message))
+        self.app.router.add_post(Messages._api_path, self._handler(self._messages))
+        self.app.router.add_post(Click._api_path, self._handler(self._click))
+        self.app.router.add_post(Event._api_path, self._handler(self._event))
+        self.app.router.add_post(Events._api_path, self._handler(self._events))
+
+    async def start(self, host='127.0.0.1', port=None):
+        port = port or unused_port()
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        self.url = f'http://{host}:{port}'
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def fail_next(self, count, status=None):
+        """
+        Respond with error to next requests (burst of errors)
+
+        :param count: number of failed requests
+        :type count: int
+
+        :param status: response status. If None - error_status
+        :type status: int
+        """
+        self._failures += [status or self.error_status] * count
+
+    def _items(self, path, field=None):
+        items = []
+        for r in self.requests:
+            if r.path == path and r.status == 200:
+                items += r.data[field] if field else [r.data]
+        return items
+
+    @property
+    def messages(self):
+        """ Messages received by message and messages endpoints """
+        return self._items(Message._api_path) + self._items(Messages._api_path, 'messages')
+
+    @property
+    def events(self):
+        """ Events received by event and events endpoints """
+        return self._items(Event._api_path) + self._items(Events._api_path, 'events')
+
+    @property
+    def clicks(self):
+        return self._items(Click._api_path)
+
+    def _handler(self, handle):
+        async def handler(request):
+            data = json.loads(await request.read())
+            status, body, headers = self._injected_error()
+            if status is None:
+                status, body = handle(data)
+            self.requests.append(ReceivedRequest(request.path, request.headers, data, status))
+
+            if self.latency is not None:
+                await asyncio.sleep(self.latency())
+            return await self._respond(request, status, body, headers)
+        return handler
+
+    def _injected_error(self):
+        if self._failures:
+            status = self._failures.pop(0)
+        elif random.random() < self.error_rate:
+            status = self.error_status
+        elif random.random() < self.rate_limit_rate:
+            headers = {'Retry-After': str(self.retry_after)} if self.retry_after is not None else {}
+            return 429, {'status': 429, 'reason': 'Too many requests'}, headers
+        else:
+            return None, None, None
+        return status, {'status': status, 'reason': 'Injected server error'}, {}
+
+    async def _respond(self, request, status, body, headers):
+        body = json.dumpb(body)
+        if not self.body_delay:
+            return web.Response(body=body, status=status, headers=headers, content_type='application/json')
+
+        # slow body: headers are sent first
+        response = web.StreamResponse(status=status, headers=headers)
+        response.content_type = 'application/json'
+        response.content_length = len(body)
+        await response.prepare(request)
+        await asyncio.sleep(self.body_delay)
+        await response.write(body)
+        await response.write_eof()
+        return response
+
+    def _check_api_key(self, data):
+        if self.api_keys is not None and data.get('api_key') not in self.api_keys:
+            return INVALID_API_KEY_REASON
+
+    def _item_failure(self, data):
+        reason = self._check_api_key(data)
+        if reason is None and self.item_failure is not None:
+            reason = self.item_failure(data)
+        if reason is None and random.random() < self.item_failure_rate:
+            reason = 'Injected item failure'
+        return reason
+
+    def _next_message_id(self):
+        self._message_id += 1
+        return self._message_id
+
+    def _message(self, data):
+        reason = self._item_failure(data)
+        if reason is not None:
+            return 400, {'status': 400, 'reason': reason}
+        return 200, {'status': 200, 'message_id': str(self._next_message_id())}
+
+    def _messages(self, data):
+        responses = []
+        for message in data.get('messages') or []:
+            reason = self._item_failure(message)
+            if reason is None:
+                responses.append({'status': 'success', 'message_id': self._next_message_id()})
+            else:
+                responses.append({'status': 'failure', 'reason': reason})
+
+        all_succeeded = all(r['status'] == 'success' for r in responses)
+        return 200, {'status': 200, 'all_succeeded': all_succeeded, 'responses': responses}
+
+    def _click(self, data):
+        reason = self._check_api_key(data)
+        if reason is not None:
+            return 400, {'status': 400, 'reason': reason}
+        return 200, {'status': 200}
+
+    def _event(self, data):
+        reason = self._check_api_key(data)
+        if reason is not None:
+            return 400, {'status': 400, 'reason': reason}
+        return 200, {**data, 'creation_time': datetime.utcnow().isoformat()}
+
+    def _events(self, data):
+        for event in data.get('events') or []:
+            reason = self._check_api_key(event)
+            if reason is not None:
+                return 400, {'status': 400, 'reason': reason}
+        return 200, {'status': 200}
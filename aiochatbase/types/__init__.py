@@ -1,5 +1,7 @@
 from .click import Click
 from .errors import *
-from .event import Event
+from .event import Event, Events
 from .message import Message, Messages, MessageTypes
-from .pool import Pool
+from .pool import Pool, SpooledPool, OverflowPolicy
+from .property import Property
+from .result import BulkResult, ItemResult
@@ -1,33 +1,135 @@
 from ..utils import json
 import logging
+import time
+import warnings
 
-from ..types.errors import InvalidApiKey, ChatbaseException
+from ..types.errors import InvalidApiKey, ChatbaseException, ServerError
+from ..utils.profiling import Stage
+from ..utils.transport import get_default_transport
 
 logger = logging.getLogger(f'chatbase.{__name__}')
 
 
+def _warn_session(session):
+    """
+    Session is passed to send(), constructor argument is left for compatibility
+
+    :return: session used by send() called without session
+    """
+    if session is not None:
+        warnings.warn('session argument of constructor is deprecated, pass session to send()',
+                      DeprecationWarning, stacklevel=3)
+    return session
+
+
 class BasicChatbaseObject:
+    __slots__ = ()
+
     _api_url = ''
+    # path of API method, used with custom base URL
+    _api_path = ''
     _content_type = {'Content-type': 'application/json', 'Accept': 'text/plain'}
 
+    def to_dict(self):
+        return {}
+
     def to_json(self):
-        return ''
+        """ Return a JSON version for use with the Chatbase API """
+        return json.dumps(self.to_dict())
+
+    def to_bytes(self, backend=None):
+        """
+        Return an encoded JSON version for use as request body
+
+        :param backend: JSON backend or TemplateEncoder. If None - default backend
+        :type backend: JsonBackend
+        """
+        return (backend or json.get_backend()).encode(self)
+
+    async def check(self):
+        return True
+
+    def api_url(self, base_url=None):
+        """
+        :param base_url: base URL of Chatbase compatible API, e.g. "http://localhost:8080". If None - Chatbase API
+        :type base_url: str
+
+        :rtype: str
+        """
+        if base_url:
+            return base_url.rstrip('/') + self._api_path
+        return self._api_url
+
+    async def _send(self, session, retry=None, backend=None, compressor=None, base_url=None, metrics=None,
+                    profiler=None):
+        """
+        :param session: If None - session passed to constructor or session of default transport (deprecated)
+        :type session: aiohttp.ClientSession
+
+        :param retry: retry failed request according to policy. If None - single attempt
+        :type retry: RetryPolicy
+
+        :param backend: JSON backend. If None - default backend
+        :type backend: JsonBackend
+
+        :param compressor: compress request body. If None - body is not compressed
+        :type compressor: Compressor
 
-    async def _send(self, session):
+        :param base_url: base URL of Chatbase compatible API. If None - Chatbase API
+        :type base_url: str
+
+        :param metrics: record request duration, errors, size and retries
+        :type metrics: Metrics
+
+        :param profiler: time encoding, compression, reading and parsing of response
+        :type profiler: Profiler
+
+        :rtype: dict
+        """
+        if session is None:
+            session = self._session
+        if session is None:
+            warnings.warn('send() without session is deprecated, pass aiohttp session', DeprecationWarning,
+                          stacklevel=3)
+            session = get_default_transport().session
+
+        url = self.api_url(base_url)
+        backend = backend or json.get_backend()
+        started = time.perf_counter()
+        body = self.to_bytes(backend)
+        if profiler is not None:
+            profiler.since(Stage.ENCODE, started, self._api_path)
+        headers = self._content_type
+
+        if compressor is not None:
+            started = time.perf_counter()
+            body, encoding_headers = await compressor.compress(body)
+            if profiler is not None:
+                profiler.since(Stage.COMPRESS, started, self._api_path)
+            if encoding_headers:
+                headers = {**headers, **encoding_headers}
+
+        post = self._post
+        if metrics is not None:
+            post = metrics.timed_request(post, self._api_path, len(body))
+
+        if retry is None:
+            return await post(session, url, backend, body, headers, profiler)
+        return await retry.run(post, session, url, backend, body, headers, profiler)
+
+    async def _post(self, session, url, backend, body, headers, profiler=None):
         """
         :rtype: dict
         """
 
-        async with session.post(self._api_url, data=self.to_json(), headers=self._content_type) as resp:
+        async with session.post(url, data=body, headers=headers) as resp:
             if resp.status == 200:
-                response_json = await resp.text()
-                response_dict = json.loads(response_json)
+                response_json, response_dict = await self._read(resp, backend, profiler)
                 logger.debug(f'Resp status: {resp.status}, resp text: {response_json}')
                 return response_dict
 
             if resp.status == 400:
-                response_json = await resp.text()
-                response_dict = json.loads(response_json)
+                _, response_dict = await self._read(resp, backend, profiler)
                 error_text = response_dict.get('reason')
 
                 if error_text == "Error fetching parameter 'api_key': Missing or invalid field(s): 'api_key'":
@@ -35,4 +137,113 @@ class BasicChatbaseObject:
 
                 raise ChatbaseException(error_text)
 
+            if resp.status >= 500 or resp.status == 429:
+                raise ServerError(resp.status, retry_after=resp.headers.get('Retry-After'))
+
             raise ChatbaseException('Unknown response')
+
+    async def _read(self, resp, backend, profiler=None):
+        """
+        :return: response body and parsed response
+        :rtype: tuple
+        """
+        started = time.perf_counter()
+        response_json = await resp.read()
+        if profiler is not None:
+            profiler.since(Stage.RESPONSE_READ, started, self._api_path)
+
+        started = time.perf_counter()
+        response_dict = backend.loads(response_json)
+        if profiler is not None:
+            profiler.since(Stage.RESPONSE_PARSE, started, self._api_path)
+        return response_json, response_dict
+
+
+class BulkChatbaseObject(BasicChatbaseObject):
+    """ Base class for bulk API objects, body of which is a JSON list of items under _field key """
+    _field = ''
+
+    def __init__(self, items, session=None):
+        self._session = _warn_session(session)
+        self.items = items
+
+        # encoded JSON of each checked item, filled by split()
+        self._encoded = None
+
+    def to_json(self):
+        """ Return a JSON version for use with the Chatbase API """
+        return self.to_bytes().decode()
+
+    def to_bytes(self, backend=None):
+        """ Return an encoded JSON version for use as request body """
+        encoded = self._encoded or [i.to_bytes(backend) for i in self.items]
+        return self._join(encoded)
+
+    def _join(self, encoded):
+        return b'{"' + self._field.encode() + b'": [' + b', '.join(encoded) + b']}'
+
+    async def check(self):
+        # chunks made by split() are already checked
+        if self._encoded is None:
+            for i in self.items:
+                await i.check()
+        return True
+
+    async def split(self, max_items=None, max_bytes=None, backend=None, profiler=None):
+        """
+        Check items and split them to chunks
+
+        :param max_items: max number of items in chunk. If None - unlimited
+        :type max_items: int
+
+        :param max_bytes: max size of chunk JSON. If None - unlimited.
+                            Item which is bigger than max_bytes is put to separate chunk.
+        :type max_bytes: int
+
+        :param backend: JSON backend to encode items. If None - default backend
+        :type backend: JsonBackend
+
+        :param profiler: time check and encoding of items
+        :type profiler: Profiler
+
+        :return: chunks in original items order
+        :rtype: list
+        """
+        started = time.perf_counter()
+        await self.check()
+        if profiler is not None:
+            profiler.since(Stage.CHECK, started, self._api_path)
+
+        started = time.perf_counter()
+
+        empty_size = len(self._join([]))
+
+        chunks = []
+        chunk_items, chunk_encoded, chunk_bytes = [], [], empty_size
+        for i in self.items:
+            encoded = i.to_bytes(backend)
+            separator_size = 2 if chunk_items else 0  # ', '
+
+            too_long = max_items and len(chunk_items) >= max_items
+            too_big = max_bytes and chunk_bytes + separator_size + len(encoded) > max_bytes
+            if chunk_items and (too_long or too_big):
+                chunks.append(self._chunk(chunk_items, chunk_encoded))
+                chunk_items, chunk_encoded, chunk_bytes = [], [], empty_size
+                separator_size = 0
+
+            chunk_items.append(i)
+            chunk_encoded.append(encoded)
+            chunk_bytes += separator_size + len(encoded)
+
+        if chunk_items:
+            chunks.append(self._chunk(chunk_items, chunk_encoded))
+
+        if profiler is not None:
+            profiler.since(Stage.ENCODE, started, self._api_path)
+        return chunks
+
+    def _chunk(self, items, encoded):
+        chunk = type(self)(items)
+        chunk._session = self._session
+        chunk._encoded = encoded
+        return chunk
@@ -1,12 +1,16 @@
 import logging
 
-from ..utils import json
-from .basic import BasicChatbaseObject
+from .basic import BasicChatbaseObject, _warn_session
 
 logger = logging.getLogger(f'chatbase.{__name__}')
 
 
 class Click(BasicChatbaseObject):
+    __slots__ = ('api_key', 'url', 'platform', 'user_id', 'version', '_session')
+
+    _api_url = 'https://chatbase.com/api/click'
+    _api_path = '/api/click'
+
     def __init__(self, api_key, url, platform, user_id=None, version=None, session=None):
         """
 
@@ -27,9 +31,10 @@ class Click(BasicChatbaseObject):
         :param version: set for user and bot messages the version of the bot processing the message
         :type version: str
 
+        :param session: deprecated, pass session to send(). Used by send() called without session
+
         """
-        # aiohttp
-        self.session = session
+        self._session = _warn_session(session)
 
         # required
         self.api_key = api_key
@@ -40,10 +45,8 @@ class Click(BasicChatbaseObject):
         self.user_id = str(user_id) if user_id else None
         self.version = str(version) if version else None
 
-        self._api_url = f"https://chatbase.com/api/click"
-
-    def to_json(self):
-        """ Return a JSON version for use with the Chatbase API """
+    def to_dict(self):
+        """ Return a dict version for use with the Chatbase API """
 
         data = {
             'api_key': self.api_key,
@@ -52,9 +55,21 @@ class Click(BasicChatbaseObject):
             'user_id': self.user_id or '',
             'version': self.version or '',
         }
-        return json.dumps(data)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Make click from its dict version
+
+        :type data: dict
+        :rtype: Click
+        """
+        return cls(api_key=data['api_key'], url=data['url'], platform=data['platform'],
+                   user_id=data.get('user_id'), version=data.get('version'))
 
-    async def send(self):
-        result = await self._send(self.session)
+    async def send(self, session=None, retry=None, backend=None, base_url=None, metrics=None, profiler=None):
+        result = await self._send(session, retry=retry, backend=backend, base_url=base_url, metrics=metrics,
+                                  profiler=profiler)
         if result.get('status') == 200:
             return True
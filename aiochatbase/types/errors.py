@@ -40,3 +40,29 @@ class InvalidApiKey(ChatbaseException):
 class InvalidUserIdType(ChatbaseException):
     def __init__(self):
         super().__init__('User id must be string or integer.')
+
+
+class PoolIsFull(ChatbaseException):
+    def __init__(self):
+        super().__init__('Pool is full.')
+
+
+class TooManyTasks(ChatbaseException):
+    def __init__(self):
+        super().__init__('Too many tasks are waiting.')
+
+
+class ServerError(ChatbaseException):
+    """
+    Error raised when Chatbase responds with 5xx or 429 status. Such requests can be retried
+
+    """
+    def __init__(self, status, retry_after=None):
+        super().__init__('Unknown response')
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitBreakerOpen(ChatbaseException):
+    def __init__(self):
+        super().__init__('Chatbase API is failing, requests are suspended.')
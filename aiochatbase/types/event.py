@@ -1,14 +1,19 @@
 import logging
 from typing import List
 
-from .basic import BasicChatbaseObject
+from .basic import BasicChatbaseObject, BulkChatbaseObject, _warn_session
 from .property import Property
-from ..utils import json
+from .result import BulkResult, ItemResult
 
 logger = logging.getLogger(f'chatbase.{__name__}')
 
 
 class Event(BasicChatbaseObject):
+    __slots__ = ('api_key', 'user_id', 'intent', 'timestamp_millis', 'platform', 'version', 'properties', '_session')
+
+    _api_url = 'https://api.chatbase.com/apis/v1/events/insert'
+    _api_path = '/apis/v1/events/insert'
+
     def __init__(self, api_key, user_id, intent, timestamp_millis=None, platform=None, version=None, properties=None,
                  session=None):
         """
@@ -21,9 +26,10 @@ class Event(BasicChatbaseObject):
         :param version:
         :param properties: Event properties in dict format
         :type properties: dict
+
+        :param session: deprecated, pass session to send(). Used by send() called without session
         """
-        # aiohttp
-        self.session = session
+        self._session = _warn_session(session)
 
         # required
         self.api_key = api_key
@@ -34,12 +40,10 @@ class Event(BasicChatbaseObject):
         self.timestamp_millis = timestamp_millis
         self.platform = platform
         self.version = str(version) if version else None
-        self.properties: List[Property] = [Property(k, v) for k, v in properties.items()]
+        self.properties: List[Property] = [Property(k, v) for k, v in (properties or {}).items()]
 
-        self._api_url = f"https://api.chatbase.com/apis/v1/events/insert"
-
-    def to_json(self):
-        """ Return a JSON version for use with the Chatbase API """
+    def to_dict(self):
+        """ Return a dict version for use with the Chatbase API """
 
         data = {
             'api_key': self.api_key,
@@ -59,9 +63,64 @@ class Event(BasicChatbaseObject):
         if self.properties:
             data['properties'] = [p() for p in self.properties]
 
-        return json.dumps(data)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Make event from its dict version
 
-    async def send(self):
-        result = await self._send(session=self.session)
+        :type data: dict
+        :rtype: Event
+        """
+        event = cls(api_key=data['api_key'], user_id=data['user_id'], intent=data['intent'],
+                    timestamp_millis=data.get('timestamp_millis'), platform=data.get('platform'),
+                    version=data.get('version'))
+        event.properties = [Property.from_dict(p) for p in data.get('properties') or []]
+        return event
+
+    async def send(self, session=None, retry=None, backend=None, base_url=None, metrics=None, profiler=None):
+        result = await self._send(session, retry=retry, backend=backend, base_url=base_url, metrics=metrics,
+                                  profiler=profiler)
         if result.get('creation_time'):
             return True
+
+
+class Events(BulkChatbaseObject):
+    _field = 'events'
+    _api_url = 'https://api.chatbase.com/apis/v1/events/insert_batch'
+    _api_path = '/apis/v1/events/insert_batch'
+
+    def __init__(self, event_list, session=None):
+        """
+        :param event_list:
+        :type event_list: List[Event]
+
+        :param session: deprecated, pass session to send(). Used by send() called without session
+        """
+        super().__init__(event_list, session=session)
+
+    @property
+    def events(self):
+        """
+        :rtype: List[Event]
+        """
+        return self.items
+
+    async def send(self, session=None, retry=None, backend=None, compressor=None, base_url=None, metrics=None,
+                   profiler=None):
+        await self.check()
+        await self._send(session, retry=retry, backend=backend, compressor=compressor, base_url=base_url,
+                         metrics=metrics, profiler=profiler)
+        return True
+
+    async def send_partial(self, session=None, retry=None, backend=None, compressor=None, base_url=None,
+                           metrics=None, profiler=None):
+        """
+        Send events and return status of each one. Events of one request are accepted or rejected together
+
+        :rtype: BulkResult
+        """
+        await self.send(session, retry=retry, backend=backend, compressor=compressor, base_url=base_url,
+                        metrics=metrics, profiler=profiler)
+        return BulkResult([ItemResult(event, ItemResult.SUCCESS) for event in self.events])
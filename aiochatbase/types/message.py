@@ -1,14 +1,22 @@
 import logging
+import time
 from typing import List
 
-from .basic import BasicChatbaseObject
-from ..utils import json
+from .basic import BasicChatbaseObject, BulkChatbaseObject, _warn_session
+from .result import BulkResult
 from ..types.errors import ChatbaseException, InvalidUserIdType
+from ..utils.profiling import Stage
 
 logger = logging.getLogger(f'chatbase.{__name__}')
 
 
 class Message(BasicChatbaseObject):
+    __slots__ = ('api_key', 'user_id', 'message_type', 'time_stamp', 'platform', 'message', 'intent', 'not_handled',
+                 'version', 'session_id', 'failures', 'future', '_session')
+
+    _api_url = 'https://chatbase.com/api/message'
+    _api_path = '/api/message'
+
     def __init__(self, api_key, message_type, user_id, time_stamp, platform, message=None, intent=None,
                  not_handled=None, version=None, session_id=None, session=None):
         """
@@ -54,14 +62,14 @@ class Message(BasicChatbaseObject):
         :param session_id: set for user and bot messages; used to define your own custom sessions for Session Flow
                             report and daily session metrics
         :type session_id: str
+
+        :param session: deprecated, pass session to send(). Used by send() called without session
         """
+        self._session = _warn_session(session)
         # check input
         if not (isinstance(user_id, str) or isinstance(user_id, int)):
             raise InvalidUserIdType()
 
-        # aiohttp
-        self.session = session
-
         # required
         self.api_key = api_key
         self.user_id = str(user_id)
@@ -76,8 +84,11 @@ class Message(BasicChatbaseObject):
         self.version = str(version) if version else None
         self.session_id = str(session_id) if session_id else None
 
-        # settings
-        self._api_url = f"https://chatbase.com/api/message"
+        # number of times message was reported as failed by Chatbase
+        self.failures = 0
+
+        # asyncio.Future resolved with Chatbase message id when message is sent from pool
+        self.future = None
 
     def to_dict(self):
         """ Return a dict version for use with the Chatbase API """
@@ -107,10 +118,18 @@ class Message(BasicChatbaseObject):
 
         return data
 
-    def to_json(self):
-        """ Return a JSON version for use with the Chatbase API """
-        data = self.to_dict()
-        return json.dumps(data)
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Make message from its dict version (e.g. stored in spool)
+
+        :type data: dict
+        :rtype: Message
+        """
+        return cls(api_key=data['api_key'], message_type=data['type'], user_id=data['user_id'],
+                   time_stamp=data['time_stamp'], platform=data['platform'], message=data.get('message'),
+                   intent=data.get('intent'), not_handled=data.get('not_handled'), version=data.get('version'),
+                   session_id=data.get('session_id'))
 
     async def check(self):
         from ..types import MessageTypes, InvalidMessageTypeError, NotHandledAgentMessage, IntentInAgentMessage
@@ -133,45 +152,59 @@ class Message(BasicChatbaseObject):
 
         return True
 
-    async def send(self):
+    async def send(self, session=None, retry=None, backend=None, base_url=None, metrics=None, profiler=None):
+        started = time.perf_counter()
         await self.check()
-        result = await self._send(session=self.session)
+        if profiler is not None:
+            profiler.since(Stage.CHECK, started, self._api_path)
+        result = await self._send(session, retry=retry, backend=backend, base_url=base_url, metrics=metrics,
+                                  profiler=profiler)
         return result.get('message_id')
 
 
-class Messages(BasicChatbaseObject):
+class Messages(BulkChatbaseObject):
+    _field = 'messages'
+    _api_url = 'https://chatbase.com/api/messages'
+    _api_path = '/api/messages'
+
     def __init__(self, message_list, session=None):
         """
         :param message_list:
         :type message_list: List[Message]
+
+        :param session: deprecated, pass session to send(). Used by send() called without session
         """
-        # aiohttp
-        self.session = session
+        super().__init__(message_list, session=session)
 
-        self.messages = message_list
-        self._api_url = 'https://chatbase.com/api/messages'
+    @property
+    def messages(self):
+        """
+        :rtype: List[Message]
+        """
+        return self.items
 
-    def to_json(self):
-        """ Return a JSON version for use with the Chatbase API """
+    async def send(self, session=None, retry=None, backend=None, compressor=None, base_url=None, metrics=None,
+                   profiler=None):
+        result = await self.send_partial(session, retry=retry, backend=backend, compressor=compressor,
+                                         base_url=base_url, metrics=metrics, profiler=profiler)
 
-        data = {
-            'messages': [m.to_dict() for m in self.messages]
-        }
-        return json.dumps(data)
+        if not result.all_succeeded:
+            raise ChatbaseException(result.failed[0].reason)
 
-    async def send(self):
-        for m in self.messages:
-            await m.check()
+        return result.message_ids
 
-        result = await self._send(session=self.session)
-        responses = result.get('responses')
+    async def send_partial(self, session=None, retry=None, backend=None, compressor=None, base_url=None,
+                           metrics=None, profiler=None):
+        """
+        Send messages and return status of each one instead of raising on failed ones
 
-        if not result.get('all_succeeded'):
-            for r in responses:
-                if r.get('status') == 'failure':
-                    raise ChatbaseException(r.get('reason'))
+        :rtype: BulkResult
+        """
+        await self.check()
 
-        return [r.get('message_id') for r in responses]
+        response = await self._send(session, retry=retry, backend=backend, compressor=compressor, base_url=base_url,
+                                    metrics=metrics, profiler=profiler)
+        return BulkResult.from_response(self.messages, response)
 
 
 class MessageTypes:
@@ -1,40 +1,623 @@
 import asyncio
 import logging
+import random
+from collections import deque
+from functools import partial
+
+from .errors import PoolIsFull
+from .message import Message
+from .result import BulkResult, ItemResult
+from ..utils.metrics import item_kind
+from ..utils.retry import is_transient
 
 logger = logging.getLogger(f'chatbase.{__name__}')
 
 
 class Pool:
-    def __init__(self, cb, size=5):
+    # register_message returns future of pooled message
+    futures = True
+
+    def __init__(self, cb, size=5, linger=None, max_messages=None, max_bytes=None, overflow=None, send=None):
         """
         :param cb:
         :type cb: Chatbase
-        :param size:
+
+        :param size: flush pool as soon as it holds this many messages
         :type size: int
+
+        :param linger: flush pool when the oldest queued message has waited this many seconds.
+                        If None - pool is flushed only by size (or on close)
+        :type linger: int or float
+
+        :param max_messages: hard limit of messages held by pool, including messages being sent.
+                            If None - unlimited
+        :type max_messages: int
+
+        :param max_bytes: hard limit of JSON-encoded messages size held by pool, including messages being sent.
+                            If None - unlimited
+        :type max_bytes: int
+
+        :param overflow: what to do with a new message when pool is full, one of OverflowPolicy values.
+                        Default - OverflowPolicy.BLOCK
+        :type overflow: str
+
+        :param send: coroutine function, which registers list of pool items.
+                    Default - cb.register_messages in partial mode
         """
-        self.messages = []
+        if overflow is None:
+            overflow = OverflowPolicy.BLOCK
+        if overflow not in OverflowPolicy.ALL:
+            raise ValueError(f'overflow: valid values {", ".join(OverflowPolicy.ALL)}.')
+
+        self.messages = deque()
         self.size = size
+        self.linger = linger
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.overflow = overflow
         self.cb = cb
+        self.send = send or partial(cb.register_messages, partial=True)
+        self.metrics = cb.metrics
+
+        # pool stats
+        self.bytes = 0
+        self.dropped = 0
+
+        # messages and their bytes taken from pool, which are being sent
+        self.in_flight = 0
+        self.in_flight_bytes = 0
+
+        self._loop = asyncio.get_event_loop()
+        self._sizes = deque()
+        self._oldest_time = None
+        self._overflowed = False
+        self._sampled = 0
+        self._wakeup = asyncio.Event()
+        self._not_full = asyncio.Event()
+
+        # batches sent in tasks, batches which sending was interrupted
+        # and messages, which could not be delivered during flush
+        self._sending = {}
+        self._sending_bytes = {}
+        self._unsent = []
+        self._undelivered = None
         self.task: asyncio.Future = asyncio.ensure_future(self.run())
 
     async def run(self):
         while True:
-            if len(self.messages) >= self.size:
+            if not self.messages:
+                await self._wait()
+                continue
+
+            if len(self.messages) >= self.size or self._overflowed:
                 await self.send_messages()
-            await asyncio.sleep(2)
+                continue
+
+            if self.linger is None:
+                await self._wait()
+                continue
+
+            delay = self._oldest_time + self.linger - self._loop.time()
+            if delay <= 0:
+                await self.send_messages()
+                continue
+
+            try:
+                await asyncio.wait_for(self._wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _wait(self):
+        """ Sleep until add_message signals that pool state has changed """
+        await self._wakeup.wait()
+        self._wakeup.clear()
+
+    def is_full(self, msg_size=0):
+        """
+        Check whether pool has no room for one more message
+
+        :param msg_size: encoded size of the message to be added
+        :type msg_size: int
+
+        :rtype: bool
+        """
+        # a single message bigger than max_bytes is accepted
+        if not self.messages and not self.in_flight:
+            return False
+
+        if self.max_messages and len(self.messages) + self.in_flight >= self.max_messages:
+            return True
+
+        if self.max_bytes and self.bytes + self.in_flight_bytes + msg_size > self.max_bytes:
+            return True
+
+        return False
+
+    def _message_size(self, msg):
+        if not self.max_bytes:
+            return 0
+        return len(msg.to_bytes(self.cb._encoder))
 
     async def add_message(self, msg):
+        msg_size = self._message_size(msg)
+
+        if self.overflow == OverflowPolicy.BLOCK:
+            while self.is_full(msg_size):
+                self._overflow()
+                self._not_full.clear()
+                await self._not_full.wait()
+
+        self._put(msg, msg_size)
+
+    def put_nowait(self, msg):
+        """
+        Add message to pool without waiting
+
+        :raises PoolIsFull: if pool is full and overflow policy is OverflowPolicy.BLOCK
+        """
+        msg_size = self._message_size(msg)
+
+        if self.overflow == OverflowPolicy.BLOCK and self.is_full(msg_size):
+            self._overflow()
+            raise PoolIsFull()
+
+        self._put(msg, msg_size)
+
+    def _put(self, msg, msg_size):
+        if self.is_full(msg_size):
+            self._overflow()
+            if not self._drop(msg, msg_size):
+                return
+
+        self._append(msg, msg_size)
+
+    @property
+    def depth(self):
+        """ Number of held messages """
+        return len(self.messages)
+
+    def _append(self, msg, msg_size):
         self.messages.append(msg)
+        self._sizes.append(msg_size)
+        self.bytes += msg_size
+        self.metrics.enqueued.inc(item_kind(msg))
+
+        # wake up the runner only when it has something new to decide:
+        # the first message starts the linger timer, the size limit triggers a flush
+        if len(self.messages) == 1:
+            self._oldest_time = self._loop.time()
+            self._wakeup.set()
+        elif len(self.messages) >= self.size:
+            self._wakeup.set()
+
+    def _overflow(self):
+        """ Ask the runner to send pool right now, room is freed when sending is done """
+        if self.messages:
+            self._overflowed = True
+            self._wakeup.set()
+
+    def _drop(self, msg, msg_size):
+        """
+        Apply drop overflow policy
+
+        :return: True if new message should be appended to the pool
+        :rtype: bool
+        """
+        self.dropped += 1
+
+        if self.overflow == OverflowPolicy.DROP_NEWEST:
+            self._discard(msg)
+            logger.debug(f'Pool is full, new message dropped. Total dropped: {self.dropped}')
+            return False
+
+        if self.overflow == OverflowPolicy.DROP_OLDEST:
+            while self.messages and self.is_full(msg_size):
+                self._discard(self.messages.popleft())
+                self.bytes -= self._sizes.popleft()
+
+            # the whole capacity is taken by messages being sent
+            if self.is_full(msg_size):
+                self._discard(msg)
+                logger.debug(f'Pool is full while sending, new message dropped. Total dropped: {self.dropped}')
+                return False
+
+            logger.debug(f'Pool is full, oldest message dropped. Total dropped: {self.dropped}')
+            return True
+
+        # OverflowPolicy.SAMPLE: reservoir sampling keeps a uniform random sample of
+        # all messages offered since the pool has been filled
+        self._sampled += 1
+        index = random.randrange(len(self.messages) + self._sampled)
+        if index >= len(self.messages) or self.max_bytes and \
+                self.bytes + self.in_flight_bytes - self._sizes[index] + msg_size > self.max_bytes:
+            self._discard(msg)
+            logger.debug(f'Pool is full, new message skipped by sampling. Total dropped: {self.dropped}')
+            return False
+
+        self._remove(index)
+        logger.debug(f'Pool is full, sampled message replaced. Total dropped: {self.dropped}')
+        return True
+
+    def _remove(self, index):
+        self._discard(self.messages[index])
+        del self.messages[index]
+        self.bytes -= self._sizes[index]
+        del self._sizes[index]
+
+    async def send_messages(self):
+        # swap buffers, so messages added while sending go to the new one.
+        # Sent messages take pool capacity until sending is done
+        message_list, self.messages = self.messages, deque()
+        batch_bytes = self.bytes
+        self._sizes = deque()
+        self.bytes = 0
+        self._oldest_time = None
+        self._overflowed = False
+        self._sampled = 0
+
+        batch = list(message_list)
+        self._take(len(batch), batch_bytes)
+        try:
+            task = await self.send(batch, task=True)
+        except asyncio.CancelledError:
+            self._unsent += batch
+            self._release(len(batch), batch_bytes)
+            for msg in batch:
+                self.metrics.failed.inc(item_kind(msg))
+            raise
+
+        if task is None:
+            # dropped messages are failed and counted by the sender
+            logger.warning(f'Sending of {len(batch)} pool messages has been dropped')
+            for msg in batch:
+                self._fail(msg, reason='Sending has been dropped')
+            self._unsent += batch
+            self._release(len(batch), batch_bytes)
+            return
+
+        self._sending[task] = batch
+        self._sending_bytes[task] = batch_bytes
+        task.add_done_callback(self._sent)
+
+    def _take(self, count, size):
+        self.in_flight += count
+        self.in_flight_bytes += size
+
+    def _release(self, count, size):
+        """ Free capacity taken by messages, which sending is done """
+        self.in_flight -= count
+        self.in_flight_bytes -= size
+        self._not_full.set()
+
+    def _sent(self, task):
+        batch = self._sending.pop(task, None)
+        if batch is None:
+            return
+        self._release(len(batch), self._sending_bytes.pop(task))
+
+        if task.cancelled():
+            for msg in batch:
+                self._fail(msg, reason='cancelled')
+        elif task.exception() is not None:
+            logger.error(f'Sending of {len(batch)} pool messages failed: {task.exception()!r}')
+
+        if self._undelivered is not None:
+            self._collect(task, batch, self._undelivered)
+
+    async def flush(self, timeout=None):
+        """
+        Send all messages held by pool and wait until they are delivered
+
+        :param timeout: max seconds to wait. If None - no limit
+        :type timeout: int or float
+
+        :return: messages which are not delivered in time or failed
+        :rtype: list
+        """
+        deadline = None if timeout is None else self._loop.time() + timeout
+        if self._undelivered is None:
+            self._undelivered = {}
+        undelivered = self._undelivered
+
+        while self.messages or self._sending:
+            remaining = None if deadline is None else deadline - self._loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+
+            if self.messages:
+                try:
+                    await asyncio.wait_for(self.send_messages(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                continue
+
+            await asyncio.wait(set(self._sending), timeout=remaining)
+
+        # deadline is reached
+        for batch in self._sending.values():
+            self._add_items(undelivered, batch)
+        self._add_items(undelivered, self.messages)
+        self._undelivered = None
+        self._add_items(undelivered, self._unsent)
+        self._unsent = []
+
+        if undelivered:
+            logger.warning(f'{len(undelivered)} pool messages could not be delivered')
+        return list(undelivered.values())
+
+    def _collect(self, task, batch, undelivered):
+        """ Update undelivered messages by result of sending task """
+        if task.cancelled() or task.exception() is not None:
+            self._add_items(undelivered, batch)
+            return
+
+        result = task.result()
+        if isinstance(result, BulkResult):
+            for r in result:
+                if r.ok:
+                    undelivered.pop(id(r.item), None)
+                else:
+                    undelivered[id(r.item)] = r.item
+            return
+
+        if result:
+            for item in batch:
+                undelivered.pop(id(item), None)
+        else:
+            self._add_items(undelivered, batch)
+
+    @staticmethod
+    def _add_items(undelivered, items):
+        for item in items:
+            undelivered[id(item)] = item
+
+    async def close(self, timeout=None):
+        """
+        Stop pool and send all held messages
+
+        :param timeout: max seconds to wait for delivery, sending which is not done in time is cancelled.
+                        If None - no limit
+        :type timeout: int or float
+
+        :return: messages which could not be delivered
+        :rtype: list
+        """
+        if not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+        undelivered = await self.flush(timeout)
+
+        # failed sends are counted by sender, here - messages which sending is not going to be done
+        not_sent = list(self.messages) + [msg for batch in self._sending.values() for msg in batch]
+
+        sending = list(self._sending)
+        for task in sending:
+            task.cancel()
+        if sending:
+            await asyncio.wait(sending)
+
+        for msg in undelivered:
+            self._fail(msg, reason='Not delivered before pool was closed')
+        for msg in not_sent:
+            self.metrics.failed.inc(item_kind(msg))
+
+        self.messages.clear()
+        self._sizes.clear()
+        self.bytes = 0
+        return undelivered
+
+    @staticmethod
+    def _fail(msg, reason='Dropped by pool overflow policy'):
+        """ Resolve future of message, which is not going to be sent """
+        ItemResult.failure(msg, reason).resolve()
+
+    def _discard(self, msg, reason='Dropped by pool overflow policy'):
+        self._fail(msg, reason)
+        self.metrics.dropped.inc(item_kind(msg))
+
+
+class SpooledPool(Pool):
+    futures = False
+
+    def __init__(self, cb, spool, size=5, linger=None, send=None, retry_interval=1, max_retry_interval=60):
+        """
+        Pool, which holds messages in disk spool instead of memory.
+        Messages are sent one batch at a time and acknowledged in spool after delivery,
+        so sending is resumed after restart. Pooled messages are not tracked by futures.
+
+        :param cb:
+        :type cb: Chatbase
+
+        :param spool:
+        :type spool: Spool
+
+        :param size: send batch as soon as spool holds this many messages
+        :type size: int
+
+        :param linger: send batch when the oldest message has waited this many seconds.
+                        If None - batch is sent only by size (or on close)
+        :type linger: int or float
+
+        :param send: coroutine function, which registers list of messages.
+                    Default - cb.register_messages in partial mode
+
+        :param retry_interval: seconds to wait before sending batch again after failure,
+                                doubled after each next failure
+        :type retry_interval: int or float
+
+        :param max_retry_interval: max seconds to wait before sending batch again
+        :type max_retry_interval: int or float
+        """
+        self.spool = spool
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._lock = asyncio.Lock()
+        super().__init__(cb, size=size, linger=linger, send=send)
+
+        # resume sending after restart
+        if spool.pending:
+            self._oldest_time = self._loop.time()
+            self._wakeup.set()
+
+    async def run(self):
+        delay = self.retry_interval
+        while True:
+            pending = self.spool.pending
+            if not pending:
+                await self._wait()
+                continue
+
+            if pending < self.size:
+                if self.linger is None:
+                    await self._wait()
+                    continue
+
+                wait = self._oldest_time + self.linger - self._loop.time()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+            if await self.send_messages():
+                delay = self.retry_interval
+                continue
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_interval)
+
+    async def add_message(self, msg):
+        self.put_nowait(msg)
+
+    @property
+    def depth(self):
+        """ Number of spooled messages """
+        return self.spool.pending
+
+    def put_nowait(self, msg):
+        """ Write message to spool """
+        self.spool.append(msg.to_bytes(self.cb._encoder))
+        self.metrics.enqueued.inc(item_kind(msg))
+
+        if self.spool.pending == 1:
+            self._oldest_time = self._loop.time()
+            self._wakeup.set()
+        elif self.spool.pending >= self.size:
+            self._wakeup.set()
 
     async def send_messages(self):
-        message_list = self.messages.copy()
-        for msg in message_list:
-            self.messages.remove(msg)
-        await self.cb.register_messages(message_list, task=True)
+        """
+        Send the oldest batch of spooled messages
+
+        Messages failed with server, network error or open circuit breaker are sent again later.
+        Messages failed with any other error (e.g. invalid message or API key) are never going to be accepted,
+        so they are acknowledged and saved to dead letters (if any)
+
+        :return: False if batch was not sent and should be sent again later
+        :rtype: bool
+        """
+        async with self._lock:
+            records, position = self.spool.read(self.size)
+            if not records:
+                return True
+
+            retried = []
+            batch = []
+            for record in records:
+                try:
+                    batch.append(Message.from_dict(self.cb._encoder.loads(record)))
+                except (ValueError, KeyError) as e:
+                    logger.error(f'Spooled message {record[:100]!r} is skipped: {e!r}')
+
+            if batch:
+                dead_letter = self.cb.dead_letter
+                try:
+                    result = await self.send(batch, task=False)
+                except Exception as e:
+                    if is_transient(e):
+                        logger.error(f'Sending of {len(batch)} spooled messages failed, will be retried: {e!r}')
+                        return False
+
+                    logger.error(f'Sending of {len(batch)} spooled messages failed permanently: {e!r}')
+                    if dead_letter is not None:
+                        reason = str(e) or repr(e)
+                        dead_letter.put_many([(msg, reason) for msg in batch])
+                else:
+                    if isinstance(result, BulkResult):
+                        retried = [r.item for r in result.failed if r.retryable]
+                        if dead_letter is not None:
+                            dead_letter.put_failed(BulkResult([r for r in result if not r.retryable]))
 
-    async def close(self):
-        if not self.task.cancelled():
+            self.spool.ack(position, len(records))
+            self._oldest_time = self._loop.time()
+
+            # chunks of batch failed with retryable error are spooled again, others are delivered
+            if retried:
+                logger.error(f'Sending of {len(retried)} of {len(batch)} spooled messages failed, will be retried')
+                for msg in retried:
+                    self.spool.append(msg.to_bytes(self.cb._encoder))
+                return False
+            return True
+
+    async def flush(self, timeout=None):
+        """
+        Send all spooled messages
+
+        :param timeout: max seconds to wait. If None - no limit
+        :type timeout: int or float
+
+        :return: empty list, messages which are not delivered are left in spool
+        :rtype: list
+        """
+        deadline = None if timeout is None else self._loop.time() + timeout
+
+        while self.spool.pending:
+            remaining = None if deadline is None else deadline - self._loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+
+            try:
+                if not await asyncio.wait_for(self.send_messages(), remaining):
+                    break
+            except asyncio.TimeoutError:
+                break
+
+        if self.spool.pending:
+            logger.warning(f'{self.spool.pending} messages are left in spool {self.spool.path}')
+        return []
+
+    async def close(self, timeout=None):
+        """
+        Stop pool, send spooled messages and close spool
+
+        :param timeout: max seconds to wait for delivery, messages which are not delivered are left in spool
+                        and sent after restart. If None - no limit
+        :type timeout: int or float
+
+        :return: empty list
+        :rtype: list
+        """
+        if not self.task.done():
             self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
 
-        if self.messages:
-            await self.send_messages()
+        undelivered = await self.flush(timeout)
+        self.spool.close()
+        return undelivered
+
+
+class OverflowPolicy:
+    BLOCK = 'block'
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    SAMPLE = 'sample'
+
+    ALL = (BLOCK, DROP_OLDEST, DROP_NEWEST, SAMPLE)
@@ -4,6 +4,8 @@ logger = logging.getLogger(f'chatbase.{__name__}')
 
 
 class Property:
+    __slots__ = ('name', 'value')
+
     def __init__(self, name, value):
         """
 
@@ -17,8 +19,18 @@ class Property:
         self.name = name
         self.value = value
 
-        self._content_type = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        self._api_url = f"https://api.chatbase.com/apis/v1/events/insert"
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Make property from its dict version
+
+        :type data: dict
+        :rtype: Property
+        """
+        for key in ('bool_value', 'float_value', 'integer_value', 'string_value'):
+            if key in data:
+                return cls(data['property_name'], data[key])
+        return cls(data['property_name'], None)
 
     def __call__(self, *args, **kwargs):
         return self.to_dict()
@@ -0,0 +1,143 @@
+import logging
+
+from .errors import ChatbaseException
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class ItemResult:
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+
+    def __init__(self, item, status, message_id=None, reason=None):
+        """
+        :param item: sent object
+        :type item: Message
+
+        :param status: "success" or "failure"
+        :type status: str
+
+        :param message_id: Chatbase message id (for succeeded item)
+
+        :param reason: failure reason (for failed item)
+        :type reason: str
+        """
+        self.item = item
+        self.status = status
+        self.message_id = message_id
+        self.reason = reason
+
+        # failed item was put back to pool
+        self.requeued = False
+
+        # item failed with error, which can be retried (server, network error or open circuit breaker)
+        self.retryable = False
+
+    @property
+    def ok(self):
+        return self.status == self.SUCCESS
+
+    @classmethod
+    def failure(cls, item, reason, retryable=False):
+        """
+        Failure result of the item, which was not sent at all
+
+        :param retryable: item can be sent again later
+        :type retryable: bool
+
+        :rtype: ItemResult
+        """
+        result = cls(item, cls.FAILURE, reason=reason)
+        result.retryable = retryable
+        return result
+
+    def resolve(self):
+        """
+        Resolve future of the item (if any) with Chatbase message id or ChatbaseException
+        """
+        future = getattr(self.item, 'future', None)
+        if future is None or future.done():
+            return
+
+        if self.ok:
+            future.set_result(self.message_id)
+            return
+
+        future.set_exception(ChatbaseException(self.reason))
+        # mark exception as retrieved, so nobody is warned about not awaited future
+        future.exception()
+
+    def __repr__(self):
+        if self.ok:
+            return f'<ItemResult success message_id={self.message_id}>'
+        return f'<ItemResult failure reason={self.reason!r}>'
+
+
+class BulkResult:
+    def __init__(self, results):
+        """
+        :param results: result of each item in original order
+        :type results: List[ItemResult]
+        """
+        self.results = results
+
+    @classmethod
+    def from_response(cls, items, response):
+        """
+        :param items: sent objects
+        :type items: list
+
+        :param response: Chatbase bulk API response
+        :type response: dict
+
+        :rtype: BulkResult
+        """
+        responses = response.get('responses') or []
+        results = []
+        for item, r in zip(items, responses):
+            results.append(ItemResult(item, r.get('status'), message_id=r.get('message_id'), reason=r.get('reason')))
+
+        # response has less results than sent items
+        for item in items[len(results):]:
+            results.append(ItemResult.failure(item, 'missing response'))
+        return cls(results)
+
+    @classmethod
+    def merge(cls, bulk_results):
+        """
+        :type bulk_results: List[BulkResult]
+        :rtype: BulkResult
+        """
+        return cls([r for bulk_result in bulk_results for r in bulk_result.results])
+
+    @property
+    def all_succeeded(self):
+        return all(r.ok for r in self.results)
+
+    @property
+    def succeeded(self):
+        """
+        :rtype: List[ItemResult]
+        """
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        """
+        :rtype: List[ItemResult]
+        """
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def message_ids(self):
+        """
+        :return: Chatbase message ids in original order, None for failed items
+        :rtype: list
+        """
+        return [r.message_id for r in self.results]
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
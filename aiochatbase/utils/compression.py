@@ -0,0 +1,77 @@
+"""
+Request body compression
+
+"""
+
+import asyncio
+import gzip
+import logging
+import zlib
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class Compressor:
+    GZIP = 'gzip'
+    DEFLATE = 'deflate'
+
+    def __init__(self, method=GZIP, threshold=1024, level=6, executor_threshold=256 * 1024):
+        """
+        :param method: "gzip" or "deflate"
+        :type method: str
+
+        :param threshold: compress only bodies bigger than this number of bytes
+        :type threshold: int
+
+        :param level: compression level from 1 (fastest) to 9 (smallest)
+        :type level: int
+
+        :param executor_threshold: compress bodies bigger than this number of bytes in default executor,
+                                    so event loop is not blocked
+        :type executor_threshold: int
+        """
+        if method not in (self.GZIP, self.DEFLATE):
+            raise ValueError('method: valid values "gzip" or "deflate".')
+
+        self.method = method
+        self.threshold = threshold
+        self.level = level
+        self.executor_threshold = executor_threshold
+
+        # stats
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def compress_nowait(self, body):
+        """
+        :type body: bytes
+        :rtype: bytes
+        """
+        if self.method == self.GZIP:
+            return gzip.compress(body, self.level)
+        return zlib.compress(body, self.level)
+
+    async def compress(self, body):
+        """
+        Compress body if it is big enough
+
+        :type body: bytes
+
+        :return: body and headers to add to request
+        :rtype: (bytes, dict)
+        """
+        self.raw_bytes += len(body)
+
+        if len(body) <= self.threshold:
+            self.compressed_bytes += len(body)
+            return body, {}
+
+        if len(body) > self.executor_threshold:
+            loop = asyncio.get_event_loop()
+            compressed = await loop.run_in_executor(None, self.compress_nowait, body)
+        else:
+            compressed = self.compress_nowait(body)
+
+        self.compressed_bytes += len(compressed)
+        logger.debug(f'Request body compressed with {self.method}: {len(body)} -> {len(compressed)} bytes')
+        return compressed, {'Content-Encoding': self.method}
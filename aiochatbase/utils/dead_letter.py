@@ -0,0 +1,173 @@
+"""
+Dead letter sinks for permanently failed sends
+
+Items (messages, events, clicks), which could not be sent in pool or task mode,
+are saved with failure reason and can be sent again by Chatbase.replay().
+
+"""
+
+import asyncio
+import logging
+import os
+from collections import deque
+
+from . import json
+from ..types import Message, Event, Click, BulkResult
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class BaseDeadLetter:
+    def put(self, item, reason):
+        """
+        Save failed item
+
+        :param item: Message, Event or Click
+        :param reason: failure reason
+        :type reason: str
+        """
+        raise NotImplementedError
+
+    def put_many(self, records):
+        """
+        Save many failed items at once
+
+        :param records: items with failure reasons
+        :type records: List[tuple]
+        """
+        for item, reason in records:
+            self.put(item, reason)
+
+    def take(self, limit=None):
+        """
+        Remove saved items from sink and return them
+
+        :param limit: max number of items. If None - all
+        :type limit: int
+
+        :return: items with failure reasons
+        :rtype: List[tuple]
+        """
+        raise NotImplementedError
+
+    def put_failed(self, result):
+        """
+        Save items failed in bulk request, which were not requeued
+
+        :type result: BulkResult
+        """
+        records = [(r.item, r.reason) for r in result.failed if not r.requeued]
+        if records:
+            self.put_many(records)
+
+    async def capture(self, coroutine, items):
+        """
+        Await sending coroutine, save items instead of raising exception if it fails.
+        Failed items of BulkResult are saved, False result means that all items failed
+
+        :param items: items sent by coroutine
+        :type items: list
+
+        :return: coroutine result or None if it raises exception
+        """
+        try:
+            result = await coroutine
+        except asyncio.CancelledError:
+            logger.warning(f'Sending of {len(items)} items cancelled, saved to dead letters')
+            self.put_many([(item, 'cancelled') for item in items])
+            raise
+        except Exception as e:
+            reason = str(e) or repr(e)
+            logger.error(f'Sending of {len(items)} items failed, saved to dead letters: {reason}')
+            self.put_many([(item, reason) for item in items])
+            return
+
+        if isinstance(result, BulkResult):
+            self.put_failed(result)
+        elif result is False:
+            logger.error(f'Sending of {len(items)} items failed, saved to dead letters')
+            self.put_many([(item, 'Sending failed') for item in items])
+        return result
+
+
+class DeadLetterQueue(BaseDeadLetter):
+    def __init__(self, max_items=10000):
+        """
+        Dead letters in memory
+
+        :param max_items: max number of saved items, the oldest ones are dropped. If None - unlimited
+        :type max_items: int
+        """
+        self.max_items = max_items
+        self.items = deque(maxlen=max_items)
+        self.dropped = 0
+
+    def put(self, item, reason):
+        if self.max_items and len(self.items) >= self.max_items:
+            self.dropped += 1
+            logger.warning(f'Dead letter queue is full, the oldest item dropped. Total dropped: {self.dropped}')
+        self.items.append((item, reason))
+
+    def take(self, limit=None):
+        count = len(self.items) if limit is None else min(limit, len(self.items))
+        return [self.items.popleft() for _ in range(count)]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class DeadLetterFile(BaseDeadLetter):
+    KINDS = {
+        'message': Message,
+        'event': Event,
+        'click': Click,
+    }
+
+    def __init__(self, path):
+        """
+        Dead letters in NDJSON file, one {"kind": ..., "reason": ..., "item": ...} object per line
+
+        :param path: file path, created if not exists
+        :type path: str
+        """
+        self.path = path
+        self._names = {cls: kind for kind, cls in self.KINDS.items()}
+
+    def put(self, item, reason):
+        self.put_many([(item, reason)])
+
+    def put_many(self, records):
+        lines = [json.dumpb({'kind': self._names[type(item)], 'reason': reason, 'item': item.to_dict()}) + b'\n'
+                 for item, reason in records]
+        # failed batch is written by one call
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(lines))
+
+    def take(self, limit=None):
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, 'rb') as f:
+            lines = [line for line in f if line.strip()]
+
+        taken, rest = (lines, []) if limit is None else (lines[:limit], lines[limit:])
+
+        # rewrite file with not taken lines
+        with open(self.path + '.tmp', 'wb') as f:
+            f.writelines(rest)
+        os.replace(self.path + '.tmp', self.path)
+
+        result = []
+        for line in taken:
+            try:
+                record = json.loads(line)
+                result.append((self.KINDS[record['kind']].from_dict(record['item']), record['reason']))
+            except (ValueError, KeyError) as e:
+                logger.error(f'Dead letter {line[:100]!r} is skipped: {e!r}')
+        return result
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            return sum(1 for line in f if line.strip())
@@ -0,0 +1,180 @@
+"""
+Template encoder for Chatbase API objects
+
+Fields which are the same for every object of a Chatbase instance (api_key, platform, version, type)
+are encoded once, per-object fields are encoded on each call and spliced in between.
+Output is byte-identical to JSON backend output for object to_dict().
+
+Splicing pays off only for the standard json backend: orjson and ujson encode a whole
+to_dict() faster than the template joins encoded parts, so get_encoder() uses the template
+for json backend only.
+
+"""
+
+from . import json
+from ..types import Message, Event, Click
+
+
+# backends, which are slower than template encoding
+TEMPLATE_BACKENDS = ('json',)
+
+
+def get_encoder(api_key, platform, version=None, backend=None):
+    """
+    :param backend: JSON backend. If None - default backend
+    :type backend: JsonBackend
+
+    :return: TemplateEncoder if it is faster than the backend, the backend otherwise
+    :rtype: TemplateEncoder or JsonBackend
+    """
+    backend = backend or json.get_backend()
+    if backend.name in TEMPLATE_BACKENDS:
+        return TemplateEncoder(api_key, platform, version=version, backend=backend)
+    return backend
+
+
+class TemplateEncoder:
+    def __init__(self, api_key, platform, version=None, backend=None):
+        """
+        :param api_key: Chatbase API token key
+        :type api_key: str
+
+        :param platform: chat bot platform
+        :type platform: str
+
+        :param version: default version of product
+        :type version: str
+
+        :param backend: JSON backend. If None - default backend
+        :type backend: JsonBackend
+        """
+        self.api_key = api_key
+        self.platform = platform
+        self.version = str(version) if version else None
+        self.backend = backend or json.get_backend()
+        self.name = self.backend.name
+
+        # separators used by backend, e.g. ', ' and ': ' for standard json
+        probe = self.backend.dumpb({'a': 0, 'b': 0})
+        self._item_sep = probe[probe.index(b'0') + 1:probe.index(b'"b"')]
+        self._key_sep = probe[len(b'{"a"'):probe.index(b'0')]
+
+        dumpb = self.backend.dumpb
+        api_key_part = b'{' + self._key(b'api_key') + dumpb(api_key)
+
+        self._message_heads = {
+            message_type: api_key_part + self._item_sep + self._key(b'type') + dumpb(message_type) +
+            self._item_sep + self._key(b'user_id')
+            for message_type in ('user', 'agent')
+        }
+        self._event_head = api_key_part + self._item_sep + self._key(b'user_id')
+        self._click_head = api_key_part + self._item_sep + self._key(b'url')
+
+        self._platform_part = self._part(b'platform', dumpb(platform))
+        self._version_part = self._part(b'version', dumpb(self.version)) if self.version else None
+        self._parts = {key: self._item_sep + self._key(key.encode())
+                       for key in ('time_stamp', 'message', 'intent', 'not_handled', 'version', 'session_id',
+                                   'timestamp_millis', 'platform', 'properties', 'user_id')}
+
+        self._encoders = {
+            Message: self._encode_message,
+            Event: self._encode_event,
+            Click: self._encode_click,
+        }
+
+    def _key(self, key):
+        return b'"' + key + b'"' + self._key_sep
+
+    def _part(self, key, encoded_value):
+        return self._item_sep + self._key(key) + encoded_value
+
+    def dumps(self, data):
+        return self.backend.dumps(data)
+
+    def dumpb(self, data):
+        return self.backend.dumpb(data)
+
+    def loads(self, data):
+        return self.backend.loads(data)
+
+    def encode(self, obj):
+        """
+        Return an encoded JSON version of Chatbase object
+
+        :type obj: BasicChatbaseObject
+        :rtype: bytes
+        """
+        encoder = self._encoders.get(type(obj))
+        if encoder is None or obj.api_key != self.api_key:
+            return self.backend.encode(obj)
+        return encoder(obj)
+
+    def _encode_message(self, msg):
+        head = self._message_heads.get(msg.message_type)
+        if head is None or msg.platform != self.platform or type(msg.time_stamp) is not int:
+            return self.backend.encode(msg)
+
+        dumpb = self.backend.dumpb
+        parts = self._parts
+        data = [head, dumpb(msg.user_id), parts['time_stamp'], str(msg.time_stamp).encode(), self._platform_part]
+
+        if msg.message:
+            data += (parts['message'], dumpb(msg.message))
+
+        if msg.intent:
+            data += (parts['intent'], dumpb(msg.intent))
+
+        if msg.not_handled:
+            data += (parts['not_handled'], dumpb(msg.not_handled))
+
+        if msg.version:
+            data += self._encode_version(msg.version)
+
+        if msg.session_id:
+            data += (parts['session_id'], dumpb(msg.session_id))
+
+        data.append(b'}')
+        return b''.join(data)
+
+    def _encode_event(self, event):
+        if event.timestamp_millis and type(event.timestamp_millis) is not int:
+            return self.backend.encode(event)
+
+        dumpb = self.backend.dumpb
+        parts = self._parts
+        data = [self._event_head, dumpb(event.user_id), parts['intent'], dumpb(event.intent)]
+
+        if event.timestamp_millis:
+            data += (parts['timestamp_millis'], str(event.timestamp_millis).encode())
+
+        if event.platform:
+            if event.platform == self.platform:
+                data.append(self._platform_part)
+            else:
+                data += (parts['platform'], dumpb(event.platform))
+
+        if event.version:
+            data += self._encode_version(event.version)
+
+        if event.properties:
+            data += (parts['properties'], dumpb([p() for p in event.properties]))
+
+        data.append(b'}')
+        return b''.join(data)
+
+    def _encode_click(self, click):
+        if click.platform != self.platform:
+            return self.backend.encode(click)
+
+        dumpb = self.backend.dumpb
+        parts = self._parts
+        data = [self._click_head, dumpb(click.url), self._platform_part,
+                parts['user_id'], dumpb(click.user_id or '')]
+        data += self._encode_version(click.version or '')
+        data.append(b'}')
+        return b''.join(data)
+
+    def _encode_version(self, version):
+        if version == self.version:
+            return (self._version_part,)
+        return self._parts['version'], self.backend.dumpb(version)
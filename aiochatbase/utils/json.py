@@ -1,33 +1,109 @@
 """
-ujson support module
+orjson / ujson support module
+
+Backends are chosen in order: orjson, ujson, standard json.
+Every backend can dump data to str (dumps) and to bytes ready for request body (dumpb).
 
 """
 
 import json
 
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
 try:
     import ujson
 
 except ImportError:
     ujson = None
 
-_use_ujson = True if ujson else False
+
+class JsonBackend:
+    def __init__(self, name, dumps, dumpb, loads):
+        """
+        :param name: backend name
+        :type name: str
+
+        :param dumps: function, which returns JSON str
+
+        :param dumpb: function, which returns JSON bytes
+
+        :param loads: function, which parses JSON str or bytes
+        """
+        self.name = name
+        self.dumps = dumps
+        self.dumpb = dumpb
+        self.loads = loads
+
+    def encode(self, obj):
+        """
+        Return an encoded JSON version of Chatbase object
+
+        :type obj: BasicChatbaseObject
+        :rtype: bytes
+        """
+        return self.dumpb(obj.to_dict())
+
+    def __repr__(self):
+        return f'<JsonBackend {self.name}>'
+
+
+BACKENDS = {
+    'json': JsonBackend('json', dumps=json.dumps, dumpb=lambda data: json.dumps(data).encode(), loads=json.loads),
+}
+
+if ujson:
+    BACKENDS['ujson'] = JsonBackend('ujson', dumps=ujson.dumps, dumpb=lambda data: ujson.dumps(data).encode(),
+                                    loads=ujson.loads)
+
+if orjson:
+    BACKENDS['orjson'] = JsonBackend('orjson', dumps=lambda data: orjson.dumps(data).decode(), dumpb=orjson.dumps,
+                                     loads=orjson.loads)
+
+_default = BACKENDS.get('orjson') or BACKENDS.get('ujson') or BACKENDS['json']
+
+# kept for backward compatibility
+_use_ujson = _default.name == 'ujson'
+
+
+def get_backend(name=None):
+    """
+    :param name: "orjson", "ujson" or "json". If None - default backend
+
+    :raises ValueError: if backend is not installed
+
+    :rtype: JsonBackend
+    """
+    if name is None:
+        return _default
+
+    if name not in BACKENDS:
+        raise ValueError(f'JSON backend "{name}" is not available. Installed: {", ".join(BACKENDS)}.')
+    return BACKENDS[name]
+
+
+def set_backend(name):
+    """ Set default backend """
+    global _default, _use_ujson
+    _default = get_backend(name)
+    _use_ujson = _default.name == 'ujson'
 
 
 def disable_ujson():
-    global _use_ujson
-    _use_ujson = False
+    """ Use standard json module as default backend """
+    set_backend('json')
 
 
 def dumps(data):
-    global _use_ujson
-    if _use_ujson:
-        return ujson.dumps(data)
-    return json.dumps(data)
+    return _default.dumps(data)
+
+
+def dumpb(data):
+    return _default.dumpb(data)
 
 
 def loads(data):
-    global _use_ujson
-    if _use_ujson:
-        return ujson.loads(data)
-    return json.loads(data)
+    return _default.loads(data)
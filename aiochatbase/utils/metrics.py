@@ -0,0 +1,261 @@
+"""
+Metrics of Chatbase instances: counters, gauges and histograms
+
+Updating a metric is a dict operation, so metrics are always collected. Values which are
+already tracked elsewhere (pool depth, running tasks) are read only when snapshot is taken.
+Registry can be shared by many Chatbase instances (ChatbaseHub tenants share hub registry)::
+
+    cb = Chatbase(API_KEY, PLATFORM, pool_size=500)
+    ...
+    cb.stats()                  # dict snapshot
+    cb.metrics.prometheus()     # Prometheus text exposition format
+
+"""
+
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+PREFIX = 'chatbase'
+
+# seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# items per bulk request
+BATCH_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def item_kind(item):
+    """
+    :param item: Message, Event or Click
+    :return: "message", "event" or "click"
+    :rtype: str
+    """
+    return type(item).__name__.lower()
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, label=None, collected=False):
+        """
+        :param name: metric name without prefix
+        :type name: str
+
+        :param documentation: help text
+        :type documentation: str
+
+        :param label: name of label, which splits values (e.g. "kind"). If None - single value
+        :type label: str
+
+        :param collected: value is set by registry collectors on every snapshot
+        :type collected: bool
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.collected = collected
+        self.values = {}
+
+    def inc(self, label_value=None, amount=1):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def collect(self):
+        """ :return: value or dict of values by label value """
+        if self.label is None:
+            return self.values.get(None, 0)
+        return dict(self.values)
+
+    def _samples(self):
+        for label_value, value in sorted(self.values.items(), key=_label_order):
+            yield '', self._labels(label_value), value
+
+    def _labels(self, label_value, **extra):
+        labels = OrderedDict()
+        if self.label is not None:
+            labels[self.label] = label_value
+        labels.update(extra)
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, label_value=None):
+        self.values[label_value] = value
+
+
+class Histogram(Counter):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, label=None, buckets=LATENCY_BUCKETS):
+        """
+        :param buckets: upper bounds of buckets
+        :type buckets: tuple
+        """
+        super().__init__(name, documentation, label=label)
+        self.buckets = tuple(sorted(buckets))
+
+    def inc(self, label_value=None, amount=1):
+        raise TypeError('Histogram values are added by observe()')
+
+    def observe(self, value, label_value=None):
+        data = self.values.get(label_value)
+        if data is None:
+            # counts of each bucket and of +Inf bucket, sum
+            data = self.values[label_value] = [[0] * (len(self.buckets) + 1), 0]
+        data[0][bisect_left(self.buckets, value)] += 1
+        data[1] += value
+
+    def _summary(self, data):
+        counts, total = data
+        cumulative, buckets = 0, OrderedDict()
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': cumulative, 'sum': total, 'buckets': buckets}
+
+    def collect(self):
+        """ :return: count, sum and cumulative bucket counts, or dict of them by label value """
+        if self.label is None:
+            return self._summary(self.values.get(None, [[0] * (len(self.buckets) + 1), 0]))
+        return {label_value: self._summary(data) for label_value, data in self.values.items()}
+
+    def _samples(self):
+        for label_value, data in sorted(self.values.items(), key=_label_order):
+            summary = self._summary(data)
+            for bound, count in summary['buckets'].items():
+                yield '_bucket', self._labels(label_value, le=_format_value(bound)), count
+            yield '_sum', self._labels(label_value), summary['sum']
+            yield '_count', self._labels(label_value), summary['count']
+
+
+class Metrics:
+    def __init__(self):
+        """ Registry of metrics """
+        self._metrics = OrderedDict()
+        self._collectors = []
+
+        self.enqueued = self.counter('items_enqueued_total', 'Items put to pool', 'kind')
+        self.sent = self.counter('items_sent_total', 'Items delivered to Chatbase', 'kind')
+        self.failed = self.counter('items_failed_total', 'Items which could not be delivered', 'kind')
+        self.dropped = self.counter('items_dropped_total', 'Items dropped by pool overflow policy', 'kind')
+        self.pool_items = self.gauge('pool_items', 'Items held by pool', 'kind', collected=True)
+        self.tasks = self.gauge('tasks', 'Tasks running and waiting for their turn', 'state', collected=True)
+        self.tasks_dropped = self.counter('tasks_dropped_total', 'Tasks dropped by task overflow policy',
+                                          collected=True)
+        self.batch_size = self.histogram('batch_size', 'Items per bulk request', 'endpoint', buckets=BATCH_BUCKETS)
+        self.request_seconds = self.histogram('http_request_duration_seconds', 'Duration of HTTP request attempts',
+                                              'endpoint')
+        self.request_errors = self.counter('http_request_errors_total', 'Failed HTTP request attempts', 'endpoint')
+        self.request_bytes = self.counter('http_request_bytes_total', 'Request body bytes sent', 'endpoint')
+        self.retries = self.counter('http_retries_total', 'Retried HTTP requests', 'endpoint')
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric "{metric.name}" is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, label=None, collected=False):
+        """ Register counter. Values of collected metric are set by collectors on every snapshot """
+        return self._add(Counter(name, documentation, label=label, collected=collected))
+
+    def gauge(self, name, documentation, label=None, collected=False):
+        return self._add(Gauge(name, documentation, label=label, collected=collected))
+
+    def histogram(self, name, documentation, label=None, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, label=label, buckets=buckets))
+
+    def add_collector(self, collector):
+        """
+        Add function, which is called before every snapshot and adds current values to collected metrics.
+        Values of all collectors are summed
+
+        :param collector: function without arguments
+        """
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def _collect(self):
+        for metric in self._metrics.values():
+            if metric.collected:
+                metric.values = {}
+        for collector in self._collectors:
+            collector()
+        return self._metrics.values()
+
+    def stats(self):
+        """
+        :return: snapshot of all metrics by name
+        :rtype: dict
+        """
+        return {metric.name: metric.collect() for metric in self._collect()}
+
+    def prometheus(self, prefix=PREFIX):
+        """
+        :param prefix: prefix of metric names
+        :type prefix: str
+
+        :return: metrics in Prometheus text exposition format
+        :rtype: str
+        """
+        lines = []
+        for metric in self._collect():
+            name = f'{prefix}_{metric.name}' if prefix else metric.name
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for suffix, labels, value in metric._samples():
+                lines.append(f'{name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def timed_request(self, post, endpoint, size):
+        """
+        Wrap coroutine function, which makes HTTP request attempt, to record its duration, errors,
+        bytes and retries
+
+        :param endpoint: API path
+        :type endpoint: str
+
+        :param size: request body size
+        :type size: int
+        """
+        attempts = 0
+
+        async def timed_post(*args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                self.retries.inc(endpoint)
+
+            started = time.perf_counter()
+            try:
+                return await post(*args, **kwargs)
+            except Exception:
+                self.request_errors.inc(endpoint)
+                raise
+            finally:
+                self.request_seconds.observe(time.perf_counter() - started, endpoint)
+                self.request_bytes.inc(endpoint, size)
+
+        return timed_post
+
+
+def _label_order(item):
+    return str(item[0])
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
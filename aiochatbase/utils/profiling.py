@@ -0,0 +1,130 @@
+"""
+Per-stage profiling of sending
+
+Profiler times every stage of a send: message preparation, check, encoding and compression
+of request body, waiting for free connection, connection (DNS, TCP and TLS), writing request,
+waiting for response (Chatbase itself), reading and parsing response. HTTP stages are timed
+by aiohttp TraceConfig::
+
+    profiler = Profiler(callback=lambda stage, seconds, endpoint: print(stage, seconds, endpoint))
+    cb = Chatbase(API_KEY, PLATFORM, profiler=profiler)
+    ...
+    profiler.stats()    # duration histogram of each stage
+
+Shared Transport should be created with profiler trace config::
+
+    transport = Transport(trace_configs=[profiler.trace_config()])
+
+"""
+
+import time
+
+import aiohttp
+
+from .metrics import Histogram
+
+
+class Stage:
+    PREPARE = 'prepare'
+    CHECK = 'check'
+    ENCODE = 'encode'
+    COMPRESS = 'compress'
+    # waiting for free connection of connection pool
+    CONNECTION_QUEUED = 'connection_queued'
+    DNS = 'dns'
+    # DNS, TCP connection and TLS handshake of new connection
+    CONNECTION_CREATE = 'connection_create'
+    REQUEST_WRITE = 'request_write'
+    # from request is written to response headers are received
+    RESPONSE_WAIT = 'response_wait'
+    RESPONSE_READ = 'response_read'
+    RESPONSE_PARSE = 'response_parse'
+
+    ALL = (PREPARE, CHECK, ENCODE, COMPRESS, CONNECTION_QUEUED, DNS, CONNECTION_CREATE, REQUEST_WRITE,
+           RESPONSE_WAIT, RESPONSE_READ, RESPONSE_PARSE)
+
+
+class Profiler:
+    def __init__(self, callback=None):
+        """
+        :param callback: function called with stage, duration in seconds and endpoint (API path or None)
+                        after every timed stage
+        """
+        self.callback = callback
+        self.durations = Histogram('stage_duration_seconds', 'Duration of send stages', label='stage')
+
+    def record(self, stage, seconds, endpoint=None):
+        """
+        :param stage: one of Stage values
+        :type stage: str
+
+        :param seconds: stage duration
+        :type seconds: float
+
+        :param endpoint: API path
+        :type endpoint: str
+        """
+        self.durations.observe(seconds, stage)
+        if self.callback is not None:
+            self.callback(stage, seconds, endpoint)
+
+    def since(self, stage, started, endpoint=None):
+        """ Record stage started at time.perf_counter() value """
+        self.record(stage, time.perf_counter() - started, endpoint)
+
+    def stats(self):
+        """
+        :return: count, sum and cumulative bucket counts of durations by stage
+        :rtype: dict
+        """
+        return self.durations.collect()
+
+    def trace_config(self):
+        """
+        :return: trace config of HTTP stages for aiohttp.ClientSession
+        :rtype: aiohttp.TraceConfig
+        """
+        trace_config = aiohttp.TraceConfig()
+
+        def mark(name):
+            async def handler(session, ctx, params):
+                setattr(ctx, name, time.perf_counter())
+            return handler
+
+        def stage(stage_name, start_name, end_name=None):
+            async def handler(session, ctx, params):
+                now = time.perf_counter()
+                if end_name is not None:
+                    setattr(ctx, end_name, now)
+                started = getattr(ctx, start_name, None)
+                if started is not None:
+                    self.record(stage_name, now - started, getattr(ctx, 'endpoint', None))
+            return handler
+
+        async def on_request_start(session, ctx, params):
+            ctx.endpoint = params.url.path
+            ctx.connected = ctx.sent = time.perf_counter()
+
+        async def on_sent(session, ctx, params):
+            # request is written when the last of headers and body chunks is sent
+            ctx.sent = max(ctx.sent, time.perf_counter())
+
+        async def on_request_end(session, ctx, params):
+            now = time.perf_counter()
+            self.record(Stage.REQUEST_WRITE, ctx.sent - ctx.connected, ctx.endpoint)
+            self.record(Stage.RESPONSE_WAIT, now - ctx.sent, ctx.endpoint)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(mark('queued'))
+        trace_config.on_connection_queued_end.append(stage(Stage.CONNECTION_QUEUED, 'queued', 'connected'))
+        trace_config.on_connection_create_start.append(mark('creating'))
+        trace_config.on_connection_create_end.append(stage(Stage.CONNECTION_CREATE, 'creating', 'connected'))
+        trace_config.on_connection_reuseconn.append(mark('connected'))
+        trace_config.on_dns_resolvehost_start.append(mark('resolving'))
+        trace_config.on_dns_resolvehost_end.append(stage(Stage.DNS, 'resolving'))
+        trace_config.on_request_chunk_sent.append(on_sent)
+        # request headers signal is added in aiohttp 3.8
+        if hasattr(trace_config, 'on_request_headers_sent'):
+            trace_config.on_request_headers_sent.append(on_sent)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
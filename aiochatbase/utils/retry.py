@@ -0,0 +1,179 @@
+"""
+Retry policy and circuit breaker for Chatbase API requests
+
+"""
+
+import asyncio
+import logging
+import random
+
+import aiohttp
+
+from ..types.errors import ServerError, CircuitBreakerOpen
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        """
+        :param failure_threshold: open circuit after this many failures in a row
+        :type failure_threshold: int
+
+        :param reset_timeout: seconds to suspend requests before one trial request is allowed
+        :type reset_timeout: int or float
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = None
+
+    def check(self):
+        """
+        :raises CircuitBreakerOpen: if requests are suspended
+        """
+        if self.state == self.CLOSED:
+            return
+
+        if self.state == self.OPEN and asyncio.get_event_loop().time() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            logger.info('Circuit breaker is half-open, sending trial request')
+            return
+
+        raise CircuitBreakerOpen()
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info('Circuit breaker is closed')
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f'Circuit breaker is open for {self.reset_timeout} seconds '
+                               f'after {self.failures} failures')
+            self.state = self.OPEN
+            self._opened_at = asyncio.get_event_loop().time()
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.1, max_delay=10, jitter=True, budget_ratio=0.2,
+                 budget_max=10, circuit_breaker=None):
+        """
+        :param max_attempts: max number of attempts per request, including the first one
+        :type max_attempts: int
+
+        :param base_delay: delay before the first retry, doubled for every next one
+        :type base_delay: int or float
+
+        :param max_delay: max delay between attempts
+        :type max_delay: int or float
+
+        :param jitter: randomize delays ("full jitter"), so clients don't retry in sync
+        :type jitter: bool
+
+        :param budget_ratio: every request adds this share of retry to budget, every retry takes one.
+                            Retries are not made when budget is empty
+        :type budget_ratio: float
+
+        :param budget_max: max (and initial) number of retries in budget
+        :type budget_max: int or float
+
+        :param circuit_breaker: If None - default CircuitBreaker
+        :type circuit_breaker: CircuitBreaker
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        self.budget = budget_max
+        self.retries = 0
+
+    @staticmethod
+    def is_retryable(exc):
+        """ Server errors, rate limits and network errors are retryable, any other error is fatal """
+        return isinstance(exc, (ServerError, aiohttp.ClientError, asyncio.TimeoutError))
+
+    def delay(self, attempt, exc=None):
+        """
+        :param attempt: number of failed attempts
+        :type attempt: int
+
+        :param exc: the last error
+        :type exc: Exception
+
+        :return: seconds to wait before the next attempt
+        :rtype: float
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+
+        retry_after = getattr(exc, 'retry_after', None)
+        if retry_after:
+            try:
+                delay = max(delay, min(self.max_delay, float(retry_after)))
+            except ValueError:
+                pass
+
+        return delay
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Await func(*args, **kwargs) until it succeeds, fails with fatal error or retries are exhausted
+        """
+        self.budget = min(self.budget_max, self.budget + self.budget_ratio)
+
+        attempt = 0
+        while True:
+            self.circuit_breaker.check()
+            attempt += 1
+
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                if self.circuit_breaker.state == CircuitBreaker.HALF_OPEN:
+                    # trial request ended without success, suspend requests again
+                    self.circuit_breaker.record_failure()
+                raise
+            except Exception as exc:
+                if not self.is_retryable(exc):
+                    # Chatbase is alive, but request is wrong
+                    self.circuit_breaker.record_success()
+                    raise
+
+                self.circuit_breaker.record_failure()
+                if attempt >= self.max_attempts or self.budget < 1:
+                    raise
+
+                self.budget -= 1
+                self.retries += 1
+                delay = self.delay(attempt, exc)
+                logger.warning(f'Attempt {attempt} failed: {exc!r}. Retrying in {delay:.2f} s')
+                await asyncio.sleep(delay)
+                continue
+
+            self.circuit_breaker.record_success()
+            return result
+
+
+def is_transient(exc):
+    """
+    Check whether failed request can succeed later: retryable error or open circuit breaker
+
+    :type exc: Exception
+    :rtype: bool
+    """
+    return RetryPolicy.is_retryable(exc) or isinstance(exc, CircuitBreakerOpen)
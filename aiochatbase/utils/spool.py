@@ -0,0 +1,210 @@
+"""
+Disk-backed write-ahead spool
+
+Records (single line JSON) are appended to segment files in spool directory.
+Consumer reads records from the committed cursor and acknowledges them after delivery,
+fully acknowledged segments are deleted. Cursor is stored on disk, so sending is resumed after restart.
+
+"""
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class Spool:
+    ALWAYS = 'always'
+    INTERVAL = 'interval'
+    NEVER = 'never'
+
+    SEGMENT_SUFFIX = '.seg'
+    CURSOR_FILE = 'cursor'
+
+    def __init__(self, path, segment_bytes=4 * 1024 * 1024, fsync=INTERVAL, fsync_interval=1.0):
+        """
+        :param path: spool directory, created if not exists
+        :type path: str
+
+        :param segment_bytes: start new segment file when current one reaches this size
+        :type segment_bytes: int
+
+        :param fsync: "always" (fsync every record), "interval" (fsync not often than fsync_interval)
+                        or "never" (leave it to OS)
+        :type fsync: str
+
+        :param fsync_interval: seconds between fsync calls in "interval" mode
+        :type fsync_interval: int or float
+        """
+        if fsync not in (self.ALWAYS, self.INTERVAL, self.NEVER):
+            raise ValueError('fsync: valid values "always", "interval" or "never".')
+
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        # number of not acknowledged records
+        self.pending = 0
+
+        self._writer = None
+        self._segment = 0
+        self._segment_size = 0
+        self._last_fsync = 0
+        self._cursor = (0, 0)
+
+        os.makedirs(path, exist_ok=True)
+        self._open()
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f'{segment:020d}{self.SEGMENT_SUFFIX}')
+
+    def _segments(self):
+        """ Numbers of existing segments in ascending order """
+        return sorted(int(name[:-len(self.SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+                      if name.endswith(self.SEGMENT_SUFFIX))
+
+    def _open(self):
+        segments = self._segments()
+        self._cursor = self._load_cursor() or (segments[0] if segments else 0, 0)
+
+        for segment in segments:
+            if segment < self._cursor[0]:
+                os.remove(self._segment_path(segment))
+        segments = [segment for segment in segments if segment >= self._cursor[0]]
+
+        if segments:
+            self._repair(segments[-1])
+
+        for segment in segments:
+            with open(self._segment_path(segment), 'rb') as f:
+                if segment == self._cursor[0]:
+                    f.seek(self._cursor[1])
+                self.pending += sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(65536), b''))
+
+        self._segment = segments[-1] if segments else self._cursor[0]
+        self._writer = open(self._segment_path(self._segment), 'ab')
+        self._segment_size = self._writer.tell()
+
+        if self.pending:
+            logger.info(f'Spool {self.path} is opened with {self.pending} records to send')
+
+    def _repair(self, segment):
+        """ Cut off record, which was not completely written before crash """
+        path = self._segment_path(segment)
+        with open(path, 'rb+') as f:
+            data = f.read()
+            size = data.rfind(b'\n') + 1
+            if size != len(data):
+                logger.warning(f'Spool segment {path} has incomplete record, {len(data) - size} bytes cut off')
+                f.truncate(size)
+
+    def _load_cursor(self):
+        try:
+            with open(os.path.join(self.path, self.CURSOR_FILE)) as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cursor(self):
+        path = os.path.join(self.path, self.CURSOR_FILE)
+        with open(path + '.tmp', 'w') as f:
+            f.write(f'{self._cursor[0]} {self._cursor[1]}')
+            if self.fsync != self.NEVER:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def append(self, record):
+        """
+        Append record
+
+        :param record: single line of JSON
+        :type record: bytes
+        """
+        if self._segment_size >= self.segment_bytes:
+            self._rotate()
+
+        self._writer.write(record + b'\n')
+        self._segment_size += len(record) + 1
+        self.pending += 1
+
+        if self.fsync == self.ALWAYS:
+            self._sync()
+        elif self.fsync == self.INTERVAL and time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._last_fsync = time.monotonic()
+
+    def _rotate(self):
+        self._sync()
+        self._writer.close()
+        self._segment += 1
+        self._writer = open(self._segment_path(self._segment), 'ab')
+        self._segment_size = 0
+
+    def read(self, max_records):
+        """
+        Read records from the committed cursor
+
+        :param max_records: max number of records to read
+        :type max_records: int
+
+        :return: records and position to acknowledge them
+        :rtype: Tuple[List[bytes], tuple]
+        """
+        self._writer.flush()
+
+        records = []
+        segment, offset = self._cursor
+        while segment <= self._segment:
+            with open(self._segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                while len(records) < max_records:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    records.append(line[:-1])
+                    offset += len(line)
+                end = not f.read(1)
+
+            # position at the end of completed segment points to the next one
+            if not end or segment == self._segment:
+                break
+            segment, offset = segment + 1, 0
+
+        return records, (segment, offset)
+
+    def ack(self, position, count):
+        """
+        Acknowledge records read up to position, delete segments which are not needed anymore
+
+        :param position: position returned by read()
+        :type position: tuple
+
+        :param count: number of acknowledged records
+        :type count: int
+        """
+        self.pending = max(self.pending - count, 0)
+
+        # everything is acknowledged, start new segment so the current one can be deleted
+        if not self.pending and position == (self._segment, self._segment_size):
+            self._rotate()
+            position = (self._segment, 0)
+
+        for segment in range(self._cursor[0], position[0]):
+            os.remove(self._segment_path(segment))
+
+        self._cursor = position
+        self._save_cursor()
+
+    def close(self):
+        if self._writer is not None and not self._writer.closed:
+            if self.fsync != self.NEVER:
+                self._sync()
+            self._writer.close()
@@ -0,0 +1,181 @@
+"""
+Bounded asyncio tasks for task mode
+
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+
+from ..types import OverflowPolicy, TooManyTasks
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+
+class TaskLimiter:
+    POLICIES = (OverflowPolicy.BLOCK, OverflowPolicy.DROP_OLDEST, OverflowPolicy.DROP_NEWEST)
+
+    def __init__(self, max_tasks=None, max_pending=None, overflow=None):
+        """
+        Runs coroutines in asyncio tasks, not more than max_tasks at the same time.
+        Every task is tracked until it is done.
+
+        :param max_tasks: max number of running tasks, others are waiting for their turn. If None - unlimited
+        :type max_tasks: int
+
+        :param max_pending: max number of waiting tasks. If None - unlimited
+        :type max_pending: int
+
+        :param overflow: what to do with a new task when too many tasks are waiting:
+                        "block" (wait for free room), "drop_oldest" (cancel the oldest waiting task)
+                        or "drop_newest" (don't run the new one). Default - "block"
+        :type overflow: str
+        """
+        if overflow is None:
+            overflow = OverflowPolicy.BLOCK
+        if overflow not in self.POLICIES:
+            raise ValueError(f'overflow: valid values {", ".join(self.POLICIES)}.')
+
+        self.max_tasks = max_tasks
+        self.max_pending = max_pending
+        self.overflow = overflow
+
+        self.tasks = set()
+        self.dropped = 0
+
+        self._semaphore = asyncio.Semaphore(max_tasks) if max_tasks else None
+        self._pending = OrderedDict()
+        self._room = asyncio.Event()
+
+    @property
+    def pending(self):
+        """ Number of tasks waiting for their turn """
+        return len(self._pending)
+
+    def collect_metrics(self, metrics):
+        """
+        Add numbers of running, waiting and dropped tasks to metrics
+
+        :type metrics: Metrics
+        """
+        metrics.tasks.inc('running', len(self.tasks) - self.pending)
+        metrics.tasks.inc('waiting', self.pending)
+        metrics.tasks_dropped.inc(amount=self.dropped)
+
+    def is_full(self):
+        return self.max_pending is not None and len(self._pending) >= self.max_pending
+
+    async def spawn(self, coroutine, dropped=None):
+        """
+        Run coroutine in task, waiting for free room if overflow policy is "block"
+
+        :param dropped: function without arguments, called if coroutine is dropped by overflow policy
+
+        :return: task or None if coroutine was dropped
+        :rtype: asyncio.Task or None
+        """
+        if self.overflow == OverflowPolicy.BLOCK:
+            while self.is_full():
+                self._room.clear()
+                await self._room.wait()
+
+        return self.spawn_nowait(coroutine, dropped)
+
+    def spawn_nowait(self, coroutine, dropped=None):
+        """
+        Run coroutine in task without waiting
+
+        :param dropped: function without arguments, called if coroutine is dropped by overflow policy
+
+        :raises TooManyTasks: if too many tasks are waiting and overflow policy is "block"
+
+        :return: task or None if coroutine was dropped
+        :rtype: asyncio.Task or None
+        """
+        if self.is_full():
+            if self.overflow == OverflowPolicy.BLOCK:
+                coroutine.close()
+                raise TooManyTasks()
+
+            self.dropped += 1
+            if self.overflow == OverflowPolicy.DROP_NEWEST:
+                coroutine.close()
+                if dropped is not None:
+                    dropped()
+                logger.warning(f'Too many tasks, new task dropped. Total dropped: {self.dropped}')
+                return
+
+            _, (oldest, oldest_coroutine, oldest_dropped) = self._pending.popitem(last=False)
+            self._room.set()
+            # task may be cancelled before it is started, so its coroutine is closed here
+            oldest_coroutine.close()
+            oldest.cancel()
+            if oldest_dropped is not None:
+                oldest_dropped()
+            logger.warning(f'Too many tasks, oldest waiting task cancelled. Total dropped: {self.dropped}')
+
+        token = object()
+        task = asyncio.ensure_future(self._run(coroutine, token))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        if self._semaphore is not None:
+            self._pending[token] = (task, coroutine, dropped)
+            # task cancelled before its first step doesn't run _run at all
+            task.add_done_callback(lambda _: self._forget(token))
+        return task
+
+    def _forget(self, token):
+        """ Remove waiting task, which is started or cancelled, and wake up spawn() waiting for room """
+        if self._pending.pop(token, None) is not None:
+            self._room.set()
+
+    async def _run(self, coroutine, token):
+        try:
+            if self._semaphore is None:
+                return await coroutine
+
+            try:
+                await self._semaphore.acquire()
+            except asyncio.CancelledError:
+                # dropped before start
+                self._forget(token)
+                raise
+
+            try:
+                self._forget(token)
+                return await coroutine
+            finally:
+                self._semaphore.release()
+        finally:
+            # not started coroutine is closed, so it is not warned about as never awaited
+            coroutine.close()
+
+    async def join(self, timeout=None, cancel=True):
+        """
+        Wait until all tasks are done
+
+        :param timeout: max seconds to wait. If None - no limit
+        :type timeout: int or float
+
+        :param cancel: cancel tasks which are not done in time
+        :type cancel: bool
+
+        :return: tasks which are not done in time
+        :rtype: set
+        """
+        loop = asyncio.get_event_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        while self.tasks:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            _, not_done = await asyncio.wait(set(self.tasks), timeout=remaining)
+            if not_done and remaining is not None and loop.time() >= deadline:
+                if cancel:
+                    for task in not_done:
+                        task.cancel()
+                    await asyncio.wait(not_done)
+                    logger.warning(f'{len(not_done)} tasks are not done in {timeout} seconds and cancelled')
+                return not_done
+
+        return set()
@@ -0,0 +1,114 @@
+"""
+Shared HTTP transport for Chatbase instances
+
+"""
+
+import asyncio
+import logging
+import ssl
+
+import aiohttp
+import certifi
+
+logger = logging.getLogger(f'chatbase.{__name__}')
+
+_ssl_context = None
+# session of transport references its loop, so transports are removed explicitly or when loop is closed
+_default_transports = {}
+
+
+def get_ssl_context():
+    """
+    SSL context is created once per process
+
+    :rtype: ssl.SSLContext
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+def get_default_transport():
+    """
+    Transport of objects sent without session, it is created once per event loop
+
+    :rtype: Transport
+    """
+    loop = asyncio.get_event_loop()
+    transport = _default_transports.get(loop)
+    if transport is None:
+        for closed_loop in [l for l in _default_transports if l.is_closed()]:
+            del _default_transports[closed_loop]
+        transport = _default_transports[loop] = Transport()
+    return transport
+
+
+async def close_default_transport():
+    """ Close default transport of current event loop, new one is created if it is needed again """
+    transport = _default_transports.pop(asyncio.get_event_loop(), None)
+    if transport is not None:
+        await transport.close()
+
+
+class Transport:
+    def __init__(self, limit=100, limit_per_host=0, keepalive_timeout=15, ttl_dns_cache=10, timeout=None,
+                 trace_configs=None):
+        """
+        Transport can be shared by many Chatbase instances. Session is created on first request.
+
+        :param limit: max number of simultaneous connections. 0 - unlimited
+        :type limit: int
+
+        :param limit_per_host: max number of simultaneous connections to the same host. 0 - unlimited
+        :type limit_per_host: int
+
+        :param keepalive_timeout: seconds to keep idle connection open
+        :type keepalive_timeout: int or float
+
+        :param ttl_dns_cache: seconds to cache resolved host addresses. None - cache forever
+        :type ttl_dns_cache: int
+
+        :param timeout: total request timeout in seconds. If None - aiohttp default
+        :type timeout: int or float
+
+        :param trace_configs: aiohttp trace configs of session, e.g. [Profiler().trace_config()]
+        :type trace_configs: List[aiohttp.TraceConfig]
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+        self.trace_configs = trace_configs
+
+        self._session = None
+
+    @property
+    def session(self):
+        """
+        :rtype: aiohttp.ClientSession
+        """
+        if self._session is None:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        connector = aiohttp.TCPConnector(ssl=get_ssl_context(), limit=self.limit, limit_per_host=self.limit_per_host,
+                                         keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.ttl_dns_cache)
+        kwargs = {}
+        if self.timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=self.timeout)
+        if self.trace_configs:
+            kwargs['trace_configs'] = self.trace_configs
+
+        logger.debug(f'New session with {self.limit} connections limit')
+        return aiohttp.ClientSession(connector=connector, **kwargs)
+
+    @property
+    def closed(self):
+        return self._session is None or self._session.closed
+
+    async def close(self):
+        if not self.closed:
+            await self._session.close()
@@ -0,0 +1,67 @@
+"""
+Memory benchmark: bytes per message queued in pool
+
+Usage:
+    python -m benchmarks.memory [--count 100000]
+
+"""
+
+import argparse
+import asyncio
+import gc
+import tracemalloc
+
+from aiochatbase import Chatbase
+
+API_KEY = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+PLATFORM = 'Telegram'
+
+
+def measure(func, count):
+    """
+    :return: bytes allocated and kept by func per call
+    :rtype: float
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func(count)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename')) / count
+
+
+async def run(count):
+    cb = Chatbase(API_KEY, PLATFORM, pool_size=count + 1)
+
+    def make_messages(n):
+        make_messages.result = [cb.make_message(user_id='123456', intent='start', message='hello') for _ in range(n)]
+
+    def queue_messages(n):
+        for _ in range(n):
+            cb.track_message_nowait(user_id='123456', intent='start', message='hello')
+
+    results = {
+        'message': measure(make_messages, count),
+        'queued message': measure(queue_messages, count),
+    }
+
+    # drop queued messages instead of sending them
+    cb.pool.messages.clear()
+    await cb.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000, help='number of messages')
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run(args.count))
+    for name, size in results.items():
+        print(f'{name}: {size:.1f} bytes')
+
+
+if __name__ == '__main__':
+    main()
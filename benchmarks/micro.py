@@ -0,0 +1,171 @@
+"""
+Micro-benchmarks: CPU time and allocations of preparing, checking and encoding items
+
+Every case is run without network and event loop switches, so results show how long
+the event loop is blocked by analytics per call. For each case it reports:
+
+    ns/op       best time of one call
+    blocks/op   memory blocks allocated by call and still alive after it (tracemalloc)
+    bytes/op    size of these blocks
+    peak        peak traced memory during one call, including temporary objects
+
+Usage:
+    python -m benchmarks.micro [--number 10000] [--case messages] [--output results.json]
+
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import platform
+import time
+import tracemalloc
+
+from aiochatbase import Chatbase, __version__
+from aiochatbase.types import Messages, Event
+from aiochatbase.utils import json as json_backends
+from aiochatbase.utils.encoder import TemplateEncoder
+
+API_KEY = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+PLATFORM = 'Telegram'
+
+BATCH_SIZES = (1, 10, 100, 1000)
+EVENT_PROPERTIES = 50
+
+# tracemalloc.reset_peak() is added in Python 3.9
+_reset_peak = getattr(tracemalloc, 'reset_peak', lambda: None)
+_not_tracemalloc = tracemalloc.Filter(False, tracemalloc.__file__)
+
+
+def run_sync(coroutine):
+    """ Run coroutine, which never suspends, without event loop """
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError('Coroutine has been suspended')
+
+
+def measure(func, number, repeat=3):
+    """
+    :param func: benchmarked function without arguments
+    :param number: number of calls in each timing
+    :param repeat: number of timings, the best one is used
+
+    :return: ns per call, blocks and bytes kept per call, peak bytes of one call
+    :rtype: dict
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+
+    before = tracemalloc.take_snapshot().filter_traces([_not_tracemalloc])
+    current, _ = tracemalloc.get_traced_memory()
+    _reset_peak()
+    kept = [func()]
+    _, peak = tracemalloc.get_traced_memory()
+
+    # results are kept, so the snapshot shows what each call allocates for them
+    kept += [func() for _ in range(number - 1)]
+    after = tracemalloc.take_snapshot().filter_traces([_not_tracemalloc])
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    return {
+        'ns_per_op': min(timings) / number * 1e9,
+        'blocks_per_op': sum(s.count_diff for s in stats) / len(kept),
+        'bytes_per_op': sum(s.size_diff for s in stats) / len(kept),
+        'peak_bytes': peak - current,
+    }
+
+
+def cases(cb):
+    """
+    :return: benchmark name, function and number of items handled by one call
+    :rtype: List[tuple]
+    """
+    message = cb.make_message(user_id='123456', intent='start', message='hello', version='1.2.3')
+    event = Event(API_KEY, user_id='123456', intent='start', platform=PLATFORM,
+                  properties={f'property_{i}': i for i in range(EVENT_PROPERTIES)})
+
+    result = [
+        ('make_message', lambda: cb.make_message(user_id='123456', intent='start', message='hello'), 1),
+        ('prepare_message', lambda: run_sync(cb.prepare_message(user_id='123456', intent='start',
+                                                                 message='hello')), 1),
+        ('Message.check', lambda: run_sync(message.check()), 1),
+        ('Message.to_dict', message.to_dict, 1),
+        ('Message.to_json', message.to_json, 1),
+        (f'Event.to_json[{EVENT_PROPERTIES} properties]', event.to_json, 1),
+    ]
+
+    for size in BATCH_SIZES:
+        messages = Messages([message] * size)
+        result.append((f'Messages.to_json[{size}]', messages.to_json, size))
+
+    response = json_backends.dumpb({'status': 200, 'all_succeeded': True,
+                                    'responses': [{'status': 'success', 'message_id': i} for i in range(100)]})
+
+    for name, backend in json_backends.BACKENDS.items():
+        encoder = TemplateEncoder(API_KEY, PLATFORM, backend=backend)
+        messages = Messages([message] * 100)
+        result += [
+            (f'{name}: Message.to_bytes', lambda b=backend: message.to_bytes(b), 1),
+            (f'{name}: template Message.to_bytes', lambda e=encoder: message.to_bytes(e), 1),
+            (f'{name}: Messages.to_bytes[100]', lambda b=backend, m=messages: m.to_bytes(b), 100),
+            (f'{name}: loads bulk response[100]', lambda b=backend: b.loads(response), 100),
+        ]
+    return result
+
+
+async def run(options):
+    cb = Chatbase(API_KEY, PLATFORM)
+    results = []
+    for name, func, items in cases(cb):
+        if options.case and not any(c.lower() in name.lower() for c in options.case):
+            continue
+        # big batches are called less times, so every case takes similar time
+        number = max(options.number // items, 10)
+        results.append({'name': name, 'items': items, 'number': number, **measure(func, number)})
+    await cb.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=10000, help='number of handled items in each timing')
+    parser.add_argument('--case', action='append', help='run only cases containing this text. Can be repeated')
+    parser.add_argument('--output', help='write results as JSON to this file ("-" - stdout)')
+    options = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run(options))
+
+    report = {
+        'aiochatbase': __version__,
+        'python': platform.python_version(),
+        'json_backends': list(json_backends.BACKENDS),
+        'options': vars(options),
+        'results': results,
+    }
+    if options.output == '-':
+        print(json.dumps(report, indent=2))
+        return
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for r in results:
+        print(f"{r['name']:<40} {r['ns_per_op']:12.0f} ns/op  {r['ns_per_op'] / r['items']:9.0f} ns/item  "
+              f"{r['blocks_per_op']:8.1f} blocks/op  {r['bytes_per_op']:10.1f} bytes/op  peak {r['peak_bytes']} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""
+End-to-end benchmark: throughput and latency of register_* methods against local Chatbase server
+
+Every API method is driven in direct, task and pool modes (where mode is supported)
+against aiochatbase.testing.ChatbaseTestServer. For each scenario it reports items per second,
+p50/p99 enqueue-to-ack latency, event loop lag and resident memory of the process: before
+the scenario, its growth and the peak sampled while the scenario runs (Linux only). Scenarios run
+in one process, so memory is sampled per scenario instead of process-wide peak RSS.
+
+Usage:
+    python -m benchmarks.throughput [--count 10000] [--latency 0.005] [--output results.json]
+    python -m benchmarks.throughput --scenario message:pool --scenario event:pool
+
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+
+import aiohttp
+
+from aiochatbase import Chatbase, __version__
+from aiochatbase.testing import ChatbaseTestServer
+
+API_KEY = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+PLATFORM = 'Telegram'
+
+SCENARIOS = [
+    ('message', 'direct'), ('message', 'task'), ('message', 'pool'),
+    ('messages', 'direct'), ('messages', 'task'),
+    ('event', 'direct'), ('event', 'task'), ('event', 'pool'),
+    ('click', 'direct'), ('click', 'task'),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(round(p * (len(values) - 1)))]
+
+
+def current_rss():
+    """
+    :return: current resident set size of process in bytes, None if not available
+    :rtype: int
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class LoopLagMonitor:
+    def __init__(self, interval=0.005):
+        """
+        Measure how late event loop wakes up sleeping task, sample resident memory
+
+        :param interval: seconds between samples
+        :type interval: float
+        """
+        self.interval = interval
+        self.lags = []
+        self.peak_rss = current_rss()
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(loop.time() - started - self.interval)
+
+            rss = current_rss()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class Scenario:
+    def __init__(self, cb, api, mode, count, batch, concurrency):
+        self.cb = cb
+        self.api = api
+        self.mode = mode
+        self.count = count
+        self.batch = batch
+        self.concurrency = concurrency
+
+        # enqueue-to-ack seconds of each item
+        self.latencies = []
+        self.failed = 0
+
+    def _register(self, i, task):
+        """ :return: coroutine registering i-th item (batch of items for messages) """
+        cb, user_id = self.cb, str(i % 1000)
+        if self.api == 'message':
+            return cb.register_message(user_id=user_id, intent='start', message='hello', task=task)
+        if self.api == 'messages':
+            messages = [cb.make_message(user_id=user_id, intent='start', message='hello') for _ in range(self.batch)]
+            return cb.register_messages(messages, task=task)
+        if self.api == 'event':
+            return cb.register_event(user_id=user_id, intent='start', properties={'step': i}, task=task)
+        return cb.register_click(url='https://example.com', user_id=user_id, task=task)
+
+    @property
+    def calls(self):
+        return self.count // self.batch if self.api == 'messages' else self.count
+
+    @property
+    def items_per_call(self):
+        return self.batch if self.api == 'messages' else 1
+
+    def _acked(self, started, ok=True):
+        latency = time.perf_counter() - started
+        self.latencies += [latency] * self.items_per_call
+        if not ok:
+            self.failed += self.items_per_call
+
+    async def run(self):
+        await getattr(self, f'_run_{self.mode}')()
+
+    async def _run_direct(self):
+        calls = iter(range(self.calls))
+
+        async def worker():
+            for i in calls:
+                started = time.perf_counter()
+                try:
+                    await self._register(i, task=False)
+                except Exception:
+                    self._acked(started, ok=False)
+                else:
+                    self._acked(started)
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+
+    async def _run_task(self):
+        def done(started):
+            return lambda t: self._acked(started, ok=not t.cancelled() and t.exception() is None)
+
+        for i in range(self.calls):
+            started = time.perf_counter()
+            task = await self._register(i, task=True)
+            task.add_done_callback(done(started))
+        await self.cb.flush()
+
+    async def _run_pool(self):
+        pool = self.cb.pool if self.api == 'message' else self.cb.event_pool
+
+        # events have no futures, so they are acknowledged when batch request is done.
+        # Enqueue time is taken from item timestamp (wall clock, milliseconds)
+        send = pool.send
+
+        async def acked_send(batch, task=True):
+            sending = await send(batch, task=task)
+            if self.api == 'event' and sending is not None:
+                sending.add_done_callback(lambda t: self._batch_acked(batch, t))
+            return sending
+
+        pool.send = acked_send
+
+        def done(started):
+            return lambda f: self._acked(started, ok=not f.cancelled() and f.exception() is None)
+
+        for i in range(self.calls):
+            started = time.perf_counter()
+            future = await self._register(i, task=False)
+            if future is not None:
+                future.add_done_callback(done(started))
+        await self.cb.flush()
+
+    def _batch_acked(self, batch, task):
+        ok = not task.cancelled() and task.exception() is None and task.result()
+        now = time.time()
+        for event in batch:
+            self.latencies.append(now - event.timestamp_millis / 1000)
+            if not ok:
+                self.failed += 1
+
+
+async def run_scenario(server, api, mode, options):
+    cb = Chatbase(API_KEY, PLATFORM, base_url=server.url, json_backend=options.json_backend,
+                  pool_size=options.pool_size if mode == 'pool' else 0, pool_linger=options.pool_linger,
+                  pool_events=api == 'event')
+    scenario = Scenario(cb, api, mode, options.count, options.batch, options.concurrency)
+    monitor = LoopLagMonitor()
+    rss_before = current_rss()
+
+    monitor.start()
+    started = time.perf_counter()
+    await scenario.run()
+    seconds = time.perf_counter() - started
+    await monitor.stop()
+    rss_after = current_rss()
+    await cb.close()
+
+    items = scenario.calls * scenario.items_per_call
+    return {
+        'api': api,
+        'mode': mode,
+        'items': items,
+        'failed': scenario.failed,
+        'seconds': seconds,
+        'items_per_second': items / seconds,
+        'latency_p50_ms': percentile(scenario.latencies, 0.5) * 1000,
+        'latency_p99_ms': percentile(scenario.latencies, 0.99) * 1000,
+        'loop_lag_p99_ms': percentile(monitor.lags, 0.99) * 1000,
+        'loop_lag_max_ms': max(monitor.lags) * 1000,
+        'rss_before_bytes': rss_before,
+        'rss_growth_bytes': rss_after - rss_before if rss_before is not None else None,
+        'rss_peak_bytes': monitor.peak_rss,
+    }
+
+
+async def run(options):
+    scenarios = SCENARIOS
+    if options.scenario:
+        scenarios = [tuple(s.split(':')) for s in options.scenario]
+
+    results = []
+    async with ChatbaseTestServer(latency=options.latency) as server:
+        for api, mode in scenarios:
+            results.append(await run_scenario(server, api, mode, options))
+            # server keeps received requests, don't let them grow between scenarios
+            server.requests.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000, help='number of items per scenario')
+    parser.add_argument('--batch', type=int, default=100, help='messages per register_messages call')
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent callers in direct mode')
+    parser.add_argument('--pool-size', type=int, default=500)
+    parser.add_argument('--pool-linger', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.005, help='server response delay, seconds')
+    parser.add_argument('--json-backend', default=None, help='json, ujson or orjson. Default - the fastest installed')
+    parser.add_argument('--scenario', action='append', metavar='API:MODE',
+                        help='run only this scenario, e.g. message:pool. Can be repeated')
+    parser.add_argument('--output', help='write results as JSON to this file ("-" - stdout)')
+    options = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run(options))
+
+    report = {
+        'aiochatbase': __version__,
+        'aiohttp': aiohttp.__version__,
+        'python': platform.python_version(),
+        'options': vars(options),
+        'results': results,
+    }
+    if options.output == '-':
+        print(json.dumps(report, indent=2))
+        return
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for r in results:
+        peak, growth = (r[k] / 2 ** 20 if r[k] is not None else float('nan')
+                        for k in ('rss_peak_bytes', 'rss_growth_bytes'))
+        print(f"{r['api']:>8} {r['mode']:<6} {r['items_per_second']:9.0f} items/s  "
+              f"p50 {r['latency_p50_ms']:7.1f} ms  p99 {r['latency_p99_ms']:7.1f} ms  "
+              f"loop lag p99 {r['loop_lag_p99_ms']:5.1f} ms  RSS peak {peak:.0f} MB  growth {growth:+.1f} MB  "
+              f"failed {r['failed']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,16 +2,20 @@ import aresponses
 
 
 class FakeChatbaseServer(aresponses.ResponsesMockServer):
-    def __init__(self, message_dict, status=200, reason='OK', **kwargs):
+    def __init__(self, message_dict, status=200, reason='OK', repeat=1, **kwargs):
         super().__init__(**kwargs)
         self._status = status
         self._reason = reason
+        self._repeat = repeat
         self._body, self._headers = self.parse_data(message_dict)
 
     async def __aenter__(self):
         await super().__aenter__()
-        _response = self.Response(text=self._body, headers=self._headers, status=self._status, reason=self._reason)
-        self.add(self.ANY, response=_response)
+        for _ in range(self._repeat):
+            _response = self.Response(text=self._body, headers=self._headers, status=self._status,
+                                      reason=self._reason)
+            self.add(self.ANY, response=_response)
+        return self
 
     @staticmethod
     def parse_data(message_dict):
@@ -48,6 +52,14 @@ BULK_BAD_RESPONSE_DICT = {
     "status": 400
 }
 
+SINGLE_BULK_RESPONSE_DICT = {
+    "all_succeeded": True,
+    "responses": [
+        {"message_id": 5917431215, "status": "success"},
+    ],
+    "status": 200
+}
+
 CLICK_RESPONSE_DICT = {"status": 200}
 
 
@@ -77,3 +89,5 @@ EVENT_RESPONSE_DICT = {
     "timestamp": "2018-08-02T00:27:35.903000",
     "user_id": "123456"
 }
+
+BULK_EVENTS_RESPONSE_DICT = {"status": 200}
@@ -1,9 +1,11 @@
 import pytest
 import logging
 import asyncio
-from aiochatbase import Chatbase
+from aiochatbase import Chatbase, Compressor, Transport
 from aiochatbase import types
-from . import FakeChatbaseServer, CLICK_RESPONSE_DICT, BULK_RESPONSE_DICT, EVENT_RESPONSE_DICT
+from aiochatbase.testing import ChatbaseTestServer
+from . import FakeChatbaseServer, CLICK_RESPONSE_DICT, BULK_RESPONSE_DICT, EVENT_RESPONSE_DICT, \
+    SINGLE_BULK_RESPONSE_DICT, BULK_EVENTS_RESPONSE_DICT
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('TrueModerTest')
@@ -97,6 +99,57 @@ async def test_register_messages_with_task(cb, event_loop):
         assert done.pop().result() == [5917431215, 5917431216, 5917431217]
 
 
+async def test_split_messages(cb, event_loop):
+    messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(5)]
+
+    chunks = await types.Messages(messages_list).split(max_items=2)
+    assert [len(c.messages) for c in chunks] == [2, 2, 1]
+    assert [m for c in chunks for m in c.messages] == messages_list
+
+    max_bytes = len(types.Messages(messages_list[:2]).to_json())
+    chunks = await types.Messages(messages_list).split(max_bytes=max_bytes)
+    assert [len(c.messages) for c in chunks] == [2, 2, 1]
+    assert all(len(c.to_json()) <= max_bytes for c in chunks)
+    assert chunks[0].to_json() == types.Messages(messages_list[:2]).to_json()
+
+
+async def test_register_messages_chunked(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, bulk_chunk_size=1, bulk_concurrency=2)
+    messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(3)]
+
+    async with FakeChatbaseServer(message_dict=SINGLE_BULK_RESPONSE_DICT, repeat=3, loop=event_loop):
+        result = await cb.register_messages(messages_list)
+        assert result == [5917431215, 5917431215, 5917431215]
+    await cb.close()
+
+
+async def test_register_messages_chunk_failed(event_loop):
+    """ Only messages of the chunk, which sending raised, are failed """
+
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, bulk_chunk_size=1, bulk_concurrency=1,
+                      base_url=server.url)
+        messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(3)]
+
+        server.fail_next(1, status=400)
+        result = await cb.register_messages(messages_list, partial=True)
+        assert [r.ok for r in result] == [False, True, True]
+        assert [m['user_id'] for m in server.messages] == ['1', '2']
+
+        server.fail_next(3, status=400)
+        with pytest.raises(types.ChatbaseException):
+            await cb.register_messages(messages_list, partial=True)
+        await cb.close()
+
+
+async def test_bulk_result_missing_response():
+    items = ['first', 'second']
+    result = types.BulkResult.from_response(items, {'responses': [{'status': 'success', 'message_id': 1}]})
+    assert [r.ok for r in result] == [True, False]
+    assert result.results[1].item == 'second'
+    assert result.results[1].reason == 'missing response'
+
+
 async def test_register_click(cb, event_loop):
     async with FakeChatbaseServer(message_dict=CLICK_RESPONSE_DICT, loop=event_loop):
         result = await cb.register_click(url='google.com')
@@ -153,3 +206,74 @@ async def test_register_event_with_task(cb, event_loop):
         assert isinstance(result, asyncio.Task)
         done, pending = await asyncio.wait([result], return_when=asyncio.ALL_COMPLETED)
         assert done.pop().result() is True
+
+
+async def test_track_message_nowait(cb, event_loop):
+    async with FakeChatbaseServer(message_dict={'message_id': CB_MESSAGE_ID, 'status': 200}, loop=event_loop):
+        result = cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+        assert isinstance(result, asyncio.Task)
+        assert await result == CB_MESSAGE_ID
+
+
+async def test_register_events(cb, event_loop):
+    events_list = [types.Event(CHATBASE_TOKEN, USER_ID, 'test bulk', platform=CHATBOT_PLATFORM) for _ in range(3)]
+
+    chunks = await types.Events(events_list).split(max_items=2)
+    assert [len(c.events) for c in chunks] == [2, 1]
+    assert chunks[0].to_json().startswith('{"events": [')
+
+    async with FakeChatbaseServer(message_dict=BULK_EVENTS_RESPONSE_DICT, loop=event_loop):
+        result = await cb.register_events(events_list)
+    assert result is True
+
+
+async def test_json_backend(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, json_backend='json')
+    assert cb.json_backend.name == 'json'
+
+    async with FakeChatbaseServer(message_dict={'message_id': CB_MESSAGE_ID, 'status': 200}, loop=event_loop):
+        result = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert result == CB_MESSAGE_ID
+    await cb.close()
+
+
+async def test_register_messages_compressed(event_loop):
+    compressor = Compressor(threshold=100)
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, compression=compressor)
+    messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(3)]
+
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        result = await cb.register_messages(messages_list)
+        assert result == [5917431215, 5917431216, 5917431217]
+    assert 0 < compressor.compressed_bytes < compressor.raw_bytes
+    await cb.close()
+
+
+async def test_shared_transport(event_loop):
+    transport = Transport(limit=10, limit_per_host=5)
+    cb_1 = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, transport=transport)
+    cb_2 = Chatbase(CHATBASE_TOKEN, 'AnotherPlatform', loop=event_loop, transport=transport)
+    assert transport.closed
+
+    async with FakeChatbaseServer(message_dict={'message_id': CB_MESSAGE_ID, 'status': 200}, repeat=2,
+                                  loop=event_loop):
+        assert await cb_1.register_message(user_id=USER_ID, intent=INTENT) == CB_MESSAGE_ID
+        assert await cb_2.register_message(user_id=USER_ID, intent=INTENT) == CB_MESSAGE_ID
+    assert cb_1.session is cb_2.session
+
+    await cb_1.close()
+    await cb_2.close()
+    assert not transport.closed
+
+    await transport.close()
+    assert transport.closed
+
+
+async def test_own_transport_closed(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop)
+    async with FakeChatbaseServer(message_dict={'message_id': CB_MESSAGE_ID, 'status': 200}, loop=event_loop):
+        assert await cb.register_message(user_id=USER_ID, intent=INTENT) == CB_MESSAGE_ID
+    assert not cb.transport.closed
+
+    await cb.close()
+    assert cb.transport.closed
@@ -1,9 +1,12 @@
 import pytest
 import logging
 import asyncio
+import aresponses
 from aiochatbase import Chatbase
 from aiochatbase import types
-from . import FakeChatbaseServer, BULK_RESPONSE_DICT
+from aiochatbase.testing import ChatbaseTestServer
+from . import FakeChatbaseServer, BULK_RESPONSE_DICT, BULK_BAD_RESPONSE_DICT, BULK_EVENTS_RESPONSE_DICT, \
+    SINGLE_BULK_RESPONSE_DICT
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('TrueModerTest')
@@ -48,7 +51,7 @@ async def test_register_message(cb: Chatbase, event_loop):
         await cb.register_message(user_id=USER_ID, intent=INTENT)
         await cb.register_message(user_id=USER_ID, intent=INTENT)
         await cb.register_message(user_id=USER_ID, intent=INTENT)
-        await asyncio.sleep(3)
+        await cb.flush()
         assert len(cb.pool.messages) == 0
 
 
@@ -68,7 +71,7 @@ async def test_register_message_without_task(cb: Chatbase, event_loop):
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=False)
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=False)
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=False)
-        await asyncio.sleep(3)
+        await cb.flush()
         assert len(cb.pool.messages) == 0
 
 
@@ -89,5 +92,270 @@ async def test_register_message_with_task(cb: Chatbase, event_loop):
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=True)
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=True)
         await cb.register_message(user_id=USER_ID, intent=INTENT, task=True)
-        await asyncio.sleep(3)
+        # let tasks put messages to pool
+        await asyncio.sleep(0.1)
+        await cb.flush()
         assert len(cb.pool.messages) == 0
+
+
+async def test_pool_flushed_on_size(cb: Chatbase, event_loop):
+    """ Full pool is sent without waiting """
+
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for _ in range(5):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await asyncio.sleep(0.1)
+        assert len(cb.pool.messages) == 0
+
+
+async def test_pool_flushed_on_linger(event_loop):
+    """ Not full pool is sent when the oldest message has waited pool_linger seconds """
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=5, pool_linger=0.05)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert len(cb.pool.messages) == 2
+
+        await asyncio.sleep(0.2)
+        assert len(cb.pool.messages) == 0
+    await cb.close()
+
+
+async def test_pool_without_linger_waits_for_size(cb: Chatbase, event_loop):
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await asyncio.sleep(0.1)
+        assert len(cb.pool.messages) == 1
+        await cb.close()
+
+
+async def test_pool_drop_newest(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=3,
+                  pool_overflow=types.OverflowPolicy.DROP_NEWEST)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for i in range(5):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        assert [m.user_id for m in cb.pool.messages] == ['0', '1', '2']
+        assert cb.pool.dropped == 2
+        await cb.close()
+
+
+async def test_pool_drop_oldest(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=3,
+                  pool_overflow=types.OverflowPolicy.DROP_OLDEST)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for i in range(5):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        assert [m.user_id for m in cb.pool.messages] == ['2', '3', '4']
+        assert cb.pool.dropped == 2
+        await cb.close()
+
+
+async def test_pool_sample(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=3,
+                  pool_overflow=types.OverflowPolicy.SAMPLE)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for i in range(20):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        assert len(cb.pool.messages) == 3
+        assert cb.pool.dropped == 17
+        await cb.close()
+
+
+async def test_pool_max_bytes(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_bytes=500,
+                  pool_overflow=types.OverflowPolicy.DROP_NEWEST)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for i in range(10):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        assert 0 < cb.pool.bytes <= 500
+        assert cb.pool.dropped == 10 - len(cb.pool.messages)
+        await cb.close()
+
+
+async def test_pool_block(event_loop):
+    """ Blocked producer waits until pool is sent """
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=3)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+
+        await asyncio.wait_for(cb.register_message(user_id='3', intent=INTENT), 1)
+        assert [m.user_id for m in cb.pool.messages] == ['3']
+        assert cb.pool.dropped == 0
+        await cb.close()
+
+
+async def test_pool_block_counts_messages_being_sent(event_loop):
+    """ Messages being sent take pool capacity until server responds """
+
+    async with ChatbaseTestServer(latency=0.3) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=3,
+                      base_url=server.url)
+        producers = [asyncio.ensure_future(cb.register_message(user_id=str(i), intent=INTENT)) for i in range(30)]
+
+        for _ in range(5):
+            await asyncio.sleep(0.1)
+            held = len(cb.pool.messages) + sum(len(batch) for batch in cb.pool._sending.values())
+            assert held <= 3
+            assert held == len(cb.pool.messages) + cb.pool.in_flight
+
+        futures = await asyncio.gather(*producers)
+        await cb.flush()
+        assert all(f.result() for f in futures)
+        assert cb.pool.in_flight == 0
+        await cb.close()
+
+
+async def test_pool_drop_newest_counts_messages_being_sent(event_loop):
+    async with ChatbaseTestServer(latency=0.3) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3, pool_max_messages=3,
+                      pool_overflow=types.OverflowPolicy.DROP_NEWEST, base_url=server.url)
+        for i in range(3):
+            cb.track_message_nowait(user_id=str(i), intent=INTENT)
+        await asyncio.sleep(0.1)
+        assert cb.pool.in_flight == 3
+
+        for i in range(50):
+            cb.track_message_nowait(user_id=str(i), intent=INTENT)
+        assert not cb.pool.messages
+        assert cb.pool.dropped == 50
+
+        await cb.flush()
+        assert cb.pool.in_flight == 0
+        await cb.close()
+
+
+async def test_track_message_nowait(cb: Chatbase, event_loop):
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        assert cb.track_message_nowait(user_id=USER_ID, intent=INTENT) is None
+        msg: types.Message = cb.pool.messages[0]
+        assert msg.user_id == USER_ID
+        assert msg.intent == INTENT
+
+        for _ in range(4):
+            cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+        await asyncio.sleep(0.1)
+        assert len(cb.pool.messages) == 0
+
+
+async def test_track_message_nowait_full_pool(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=1)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+        with pytest.raises(types.PoolIsFull):
+            cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+        await cb.close()
+
+
+async def test_register_event_pool(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3, pool_events=True)
+    async with FakeChatbaseServer(message_dict=BULK_EVENTS_RESPONSE_DICT, loop=event_loop):
+        assert await cb.register_event(USER_ID, INTENT, properties={'property': 1}) is None
+        event: types.Event = cb.event_pool.messages[0]
+        assert event.user_id == USER_ID
+        assert event.intent == INTENT
+        assert len(cb.pool.messages) == 0
+
+        await cb.register_event(USER_ID, INTENT)
+        await cb.register_event(USER_ID, INTENT)
+        await asyncio.sleep(0.1)
+        assert len(cb.event_pool.messages) == 0
+    await cb.close()
+
+
+async def test_close_sends_last_messages(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop) as server:
+        for _ in range(3):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+
+        assert await cb.close() == []
+        assert not cb.pool.messages
+        server.assert_all_requests_matched()
+
+
+async def test_flush(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    async with FakeChatbaseServer(message_dict=BULK_BAD_RESPONSE_DICT, loop=event_loop):
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+
+        undelivered = await cb.flush()
+        assert [m.user_id for m in undelivered] == ['1']
+        assert not cb.pool.messages
+        assert await cb.close() == []
+
+
+async def test_close_timeout(event_loop):
+    async def slow_response(request):
+        await asyncio.sleep(1)
+        return aresponses.Response(text='{}', status=200)
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    async with aresponses.ResponsesMockServer(loop=event_loop) as server:
+        server.add(server.ANY, response=slow_response)
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+
+        start = event_loop.time()
+        undelivered = await cb.close(timeout=0.1)
+        assert event_loop.time() - start < 0.5
+        assert [m.user_id for m in undelivered] == ['0', '1', '2']
+        assert not cb.task_limiter.tasks
+
+
+async def test_message_futures(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3)
+    async with FakeChatbaseServer(message_dict=BULK_BAD_RESPONSE_DICT, loop=event_loop):
+        futures = [await cb.register_message(user_id=str(i), intent=INTENT) for i in range(3)]
+        assert all(isinstance(f, asyncio.Future) for f in futures)
+
+        assert await asyncio.wait_for(futures[0], 1) == 5917431215
+        assert await asyncio.wait_for(futures[2], 1) == 5917431217
+        with pytest.raises(types.ChatbaseException, match='something went wrong'):
+            await futures[1]
+        await cb.close()
+
+
+async def test_message_future_dropped(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=1,
+                  pool_overflow=types.OverflowPolicy.DROP_OLDEST)
+    async with FakeChatbaseServer(message_dict=SINGLE_BULK_RESPONSE_DICT, loop=event_loop):
+        future_1 = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        future_2 = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        with pytest.raises(types.ChatbaseException):
+            future_1.result()
+
+        await cb.close()
+        assert future_2.result() == 5917431215
+
+
+async def test_message_future_sending_cancelled(event_loop):
+    async with ChatbaseTestServer(latency=1) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=2, base_url=server.url)
+        futures = [await cb.register_message(user_id=str(i), intent=INTENT) for i in range(2)]
+        await asyncio.sleep(0.1)
+
+        for task in list(cb.pool._sending):
+            task.cancel()
+        for future in futures:
+            with pytest.raises(types.ChatbaseException, match='cancelled'):
+                await asyncio.wait_for(future, 1)
+        await cb.close()
+
+
+async def test_message_future_not_delivered(event_loop):
+    async def slow_response(request):
+        await asyncio.sleep(1)
+        return aresponses.Response(text='{}', status=200)
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    async with aresponses.ResponsesMockServer(loop=event_loop) as server:
+        server.add(server.ANY, response=slow_response)
+        future = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.close(timeout=0.1)
+        with pytest.raises(types.ChatbaseException):
+            future.result()
@@ -1,8 +1,13 @@
 import pytest
 import logging
 import asyncio
+import gc
+import warnings
 from aiochatbase import Chatbase
 from aiochatbase import types
+from aiochatbase.testing import ChatbaseTestServer
+from aiochatbase.utils.dead_letter import DeadLetterQueue
+from aiochatbase.utils.tasks import TaskLimiter
 from . import FakeChatbaseServer, BULK_RESPONSE_DICT, CLICK_RESPONSE_DICT, EVENT_RESPONSE_DICT
 
 logging.basicConfig(level=logging.INFO)
@@ -155,3 +160,144 @@ async def test_register_event_with_task(cb, event_loop):
         assert isinstance(result, asyncio.Task)
         done, pending = await asyncio.wait([result], return_when=asyncio.ALL_COMPLETED)
         assert done.pop().result() is True
+
+
+class Counter:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.done = 0
+
+    async def job(self, delay=0.01):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(delay)
+        self.running -= 1
+        self.done += 1
+        return True
+
+
+async def test_task_limiter_max_tasks(event_loop):
+    counter = Counter()
+    limiter = TaskLimiter(max_tasks=2)
+    tasks = [await limiter.spawn(counter.job()) for _ in range(5)]
+    assert limiter.pending == 5
+
+    await limiter.join()
+    assert all(t.result() for t in tasks)
+    assert counter.max_running == 2
+    assert counter.done == 5
+    assert not limiter.tasks
+
+
+async def test_task_limiter_drop_newest(event_loop):
+    counter = Counter()
+    limiter = TaskLimiter(max_tasks=1, max_pending=2, overflow=types.OverflowPolicy.DROP_NEWEST)
+    tasks = [await limiter.spawn(counter.job()) for _ in range(3)]
+    assert tasks[2] is None
+    assert limiter.dropped == 1
+
+    await limiter.join()
+    assert counter.done == 2
+
+
+async def test_task_limiter_drop_oldest(event_loop):
+    counter = Counter()
+    limiter = TaskLimiter(max_tasks=1, max_pending=2, overflow=types.OverflowPolicy.DROP_OLDEST)
+    tasks = [await limiter.spawn(counter.job()) for _ in range(3)]
+    assert limiter.dropped == 1
+
+    await limiter.join()
+    assert tasks[0].cancelled()
+    assert counter.done == 2
+
+
+async def test_task_limiter_block(event_loop):
+    counter = Counter()
+    limiter = TaskLimiter(max_tasks=1, max_pending=1)
+    await limiter.spawn(counter.job())
+    with pytest.raises(types.TooManyTasks):
+        limiter.spawn_nowait(counter.job())
+
+    # waits until the first task is started
+    await asyncio.wait_for(limiter.spawn(counter.job()), 1)
+    await limiter.join()
+    assert counter.done == 2
+
+
+async def test_task_limiter_block_cancelled(event_loop):
+    counter = Counter()
+    limiter = TaskLimiter(max_tasks=1, max_pending=1)
+    running = await limiter.spawn(counter.job(10))
+    await asyncio.sleep(0)
+    waiting = await limiter.spawn(counter.job())
+    assert limiter.pending == 1
+
+    # cancelled waiting task frees room for blocked spawn
+    spawning = asyncio.ensure_future(limiter.spawn(counter.job()))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.wait_for(spawning, 1)
+
+    running.cancel()
+    await limiter.join()
+    assert counter.done == 1
+
+
+async def test_task_limiter_drop_oldest_items(event_loop):
+    """ Items of dropped task are failed and saved to dead letters, its coroutine is closed """
+
+    dead_letter = DeadLetterQueue()
+    async with ChatbaseTestServer(latency=0.3) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=1, max_tasks=1,
+                      max_pending_tasks=1, task_overflow=types.OverflowPolicy.DROP_OLDEST, dead_letter=dead_letter,
+                      base_url=server.url)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            futures = []
+            for i in range(3):
+                futures.append(await cb.register_message(user_id=str(i), intent=INTENT))
+                await asyncio.sleep(0.05)
+
+            with pytest.raises(types.ChatbaseException, match='Dropped by task overflow policy'):
+                await futures[1]
+            await cb.close()
+            gc.collect()
+
+        assert not [w for w in caught if issubclass(w.category, RuntimeWarning)]
+        assert futures[0].result() and futures[2].result()
+        assert [(item.user_id, reason) for item, reason in dead_letter.items] == \
+            [('1', 'Dropped by task overflow policy')]
+        assert cb.stats()['items_dropped_total'] == {'message': 1}
+
+
+async def test_close_waits_for_tasks(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, task_mode=True, max_tasks=1)
+    async with FakeChatbaseServer(message_dict={'message_id': CB_MESSAGE_ID, 'status': 200}, repeat=2,
+                                  loop=event_loop):
+        task_1 = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        task_2 = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.close()
+        assert task_1.result() == task_2.result() == CB_MESSAGE_ID
+
+
+async def test_close_returns_items_of_cancelled_tasks(event_loop):
+    dead_letter = DeadLetterQueue()
+    async with ChatbaseTestServer(latency=1) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, task_mode=True, max_tasks=1,
+                      dead_letter=dead_letter, base_url=server.url)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for i in range(2):
+                await cb.register_message(user_id=str(i), intent=INTENT)
+            await asyncio.sleep(0.1)
+
+            undelivered = await cb.close(timeout=0.1)
+            gc.collect()
+
+        assert not [w for w in caught if issubclass(w.category, RuntimeWarning)]
+        assert sorted(m.user_id for m in undelivered) == ['0', '1']
+        # the second task has not been started
+        assert ('1', 'Not delivered before Chatbase was closed') in \
+            [(item.user_id, reason) for item, reason in dead_letter.items]
+        assert cb.stats()['items_failed_total'] == {'message': 2}
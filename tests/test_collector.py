@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from aiochatbase import Chatbase, ChatbaseHub, Collector
+from . import FakeChatbaseServer, BULK_RESPONSE_DICT, BULK_EVENTS_RESPONSE_DICT
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_collector(tmpdir, event_loop):
+    path = str(tmpdir.join('chatbase.sock'))
+    uploader = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_events=True)
+    collector = Collector(uploader, path)
+    await collector.start()
+
+    workers = [Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, collector=path)
+               for _ in range(2)]
+    for worker in workers:
+        assert await worker.register_message(user_id=USER_ID, intent=INTENT) is None
+        assert worker.track_message_nowait(user_id=USER_ID, intent=INTENT) is None
+        await worker.register_event(USER_ID, INTENT, properties={'property': 1})
+        await worker.close()
+    await asyncio.sleep(0.1)
+
+    assert collector.received == 6
+    assert len(uploader.pool.messages) == 4
+    assert len(uploader.event_pool.messages) == 2
+    assert uploader.pool.messages[0].intent == INTENT
+
+    await collector.close()
+    async with FakeChatbaseServer(message_dict=BULK_EVENTS_RESPONSE_DICT, repeat=2, loop=event_loop):
+        await uploader.close()
+
+
+async def test_collector_hub(tmpdir, event_loop):
+    path = str(tmpdir.join('chatbase.sock'))
+    hub = ChatbaseHub(pool_size=10)
+    collector = Collector(hub, path)
+    await collector.start()
+
+    worker = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, collector=path)
+    await worker.register_messages([worker.make_message(USER_ID, INTENT) for _ in range(3)])
+    await worker.close()
+    await asyncio.sleep(0.1)
+    assert len(hub.pool.messages) == 3
+
+    await collector.close()
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        result = await hub.flush()
+        assert result == []
+        await hub.close()
+
+
+async def test_collector_not_available(tmpdir, event_loop):
+    path = str(tmpdir.join('chatbase.sock'))
+    worker = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, collector=path)
+    await worker.register_message(user_id=USER_ID, intent=INTENT)
+    assert len(worker.collector._backlog) == 1
+
+    uploader = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    collector = Collector(uploader, path)
+    await collector.start()
+
+    # backlog is sent after reconnect
+    await worker.register_message(user_id=USER_ID, intent=INTENT)
+    await worker.close()
+    await asyncio.sleep(0.1)
+    assert len(uploader.pool.messages) == 2
+
+    await collector.close()
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        await uploader.close()
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from aiochatbase import Chatbase, DeadLetterQueue, DeadLetterFile
+from aiochatbase import types
+from . import FakeChatbaseServer, BULK_BAD_RESPONSE_DICT, SINGLE_BULK_RESPONSE_DICT, CLICK_RESPONSE_DICT
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_dead_letter_queue_max_items():
+    dead_letter = DeadLetterQueue(max_items=2)
+    for i in range(3):
+        dead_letter.put(i, 'reason')
+    assert dead_letter.dropped == 1
+    assert dead_letter.take() == [(1, 'reason'), (2, 'reason')]
+    assert len(dead_letter) == 0
+
+
+async def test_dead_letter_file(tmpdir):
+    dead_letter = DeadLetterFile(str(tmpdir.join('dead_letters.ndjson')))
+    message = types.Message(CHATBASE_TOKEN, types.MessageTypes.USER, USER_ID, 1533166056000, CHATBOT_PLATFORM,
+                            intent=INTENT)
+    event = types.Event(CHATBASE_TOKEN, USER_ID, INTENT, properties={'int': 1, 'str': 'two', 'bool': True})
+    click = types.Click(CHATBASE_TOKEN, 'google.com', CHATBOT_PLATFORM, user_id=USER_ID)
+    for item in (message, event, click):
+        dead_letter.put(item, 'reason')
+    assert len(dead_letter) == 3
+
+    taken = dead_letter.take(limit=2)
+    assert [type(item) for item, _ in taken] == [types.Message, types.Event]
+    assert taken[0][0].to_dict() == message.to_dict()
+    assert taken[1][0].to_dict() == event.to_dict()
+    assert taken[1][1] == 'reason'
+    assert len(dead_letter) == 1
+
+    assert dead_letter.take()[0][0].to_dict() == click.to_dict()
+    assert dead_letter.take() == []
+
+
+async def test_dead_letter_file_put_many(tmpdir):
+    dead_letter = DeadLetterFile(str(tmpdir.join('dead_letters.ndjson')))
+    messages = [types.Message(CHATBASE_TOKEN, types.MessageTypes.USER, str(i), 1533166056000, CHATBOT_PLATFORM,
+                              intent=INTENT) for i in range(3)]
+    dead_letter.put_many([(m, f'reason {m.user_id}') for m in messages])
+    assert [(item.user_id, reason) for item, reason in dead_letter.take()] == \
+        [('0', 'reason 0'), ('1', 'reason 1'), ('2', 'reason 2')]
+
+
+async def test_capture_cancelled(event_loop):
+    dead_letter = DeadLetterQueue()
+    task = asyncio.ensure_future(dead_letter.capture(asyncio.sleep(1), ['first', 'second']))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert dead_letter.take() == [('first', 'cancelled'), ('second', 'cancelled')]
+
+
+async def test_capture_false_result(event_loop):
+    async def send():
+        return False
+
+    dead_letter = DeadLetterQueue()
+    assert await dead_letter.capture(send(), ['first', 'second']) is False
+    assert dead_letter.take() == [('first', 'Sending failed'), ('second', 'Sending failed')]
+
+
+async def test_task_mode_dead_letter(event_loop):
+    dead_letter = DeadLetterQueue()
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, task_mode=True, dead_letter=dead_letter)
+    async with FakeChatbaseServer(message_dict={}, status=500, reason='Internal Server Error', loop=event_loop):
+        task = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert await task is None
+        assert len(dead_letter) == 1
+
+    async with FakeChatbaseServer(message_dict=SINGLE_BULK_RESPONSE_DICT, loop=event_loop):
+        result = await cb.replay()
+        assert result.all_succeeded
+        assert result.message_ids == [5917431215]
+        assert len(dead_letter) == 0
+        await cb.close()
+
+
+async def test_pool_dead_letter(event_loop):
+    dead_letter = DeadLetterQueue()
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3, dead_letter=dead_letter)
+    async with FakeChatbaseServer(message_dict=BULK_BAD_RESPONSE_DICT, loop=event_loop):
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        await cb.flush()
+
+    assert [(item.user_id, reason) for item, reason in dead_letter.items] == [('1', 'something went wrong')]
+
+    # failed again
+    async with FakeChatbaseServer(message_dict={}, status=500, reason='Internal Server Error', loop=event_loop):
+        result = await cb.replay()
+        assert len(result.failed) == 1
+        assert len(dead_letter) == 1
+
+    async with FakeChatbaseServer(message_dict=SINGLE_BULK_RESPONSE_DICT, loop=event_loop):
+        assert (await cb.replay()).all_succeeded
+        await cb.close()
+
+
+async def test_replay_click(event_loop):
+    dead_letter = DeadLetterQueue()
+    dead_letter.put(types.Click(CHATBASE_TOKEN, 'google.com', CHATBOT_PLATFORM), 'reason')
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, dead_letter=dead_letter)
+    async with FakeChatbaseServer(message_dict=CLICK_RESPONSE_DICT, loop=event_loop):
+        assert (await cb.replay()).all_succeeded
+        await cb.close()
@@ -0,0 +1,59 @@
+import pytest
+
+from aiochatbase import types
+from aiochatbase.utils import json
+from aiochatbase.utils.encoder import TemplateEncoder, get_encoder
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+VERSION = '1.0'
+
+
+def make_objects():
+    return [
+        types.Message(CHATBASE_TOKEN, 'user', '123456', 1533168455903, CHATBOT_PLATFORM),
+        types.Message(CHATBASE_TOKEN, 'user', 42, 1533168455903, CHATBOT_PLATFORM, message='Привет, "мир" / \\ \n',
+                      intent='start', not_handled=True, version=VERSION, session_id='s1'),
+        types.Message(CHATBASE_TOKEN, 'agent', '123456', 1533168455903, CHATBOT_PLATFORM, message='hi',
+                      version='2.0'),
+        types.Message(CHATBASE_TOKEN, 'user', '123456', 1533168455903.5, CHATBOT_PLATFORM),
+        types.Message(CHATBASE_TOKEN, 'agent007', '123456', 1533168455903, CHATBOT_PLATFORM),
+        types.Message('another key', 'user', '123456', 1533168455903, CHATBOT_PLATFORM),
+        types.Message(CHATBASE_TOKEN, 'user', '123456', 1533168455903, 'AnotherPlatform'),
+        types.Event(CHATBASE_TOKEN, '123456', 'test event'),
+        types.Event(CHATBASE_TOKEN, '123456', 'test event', timestamp_millis=1533168455903,
+                    platform=CHATBOT_PLATFORM, version=VERSION,
+                    properties={'int': 1, 'str': 'two', 'float': 3.0, 'bool': True}),
+        types.Event(CHATBASE_TOKEN, '123456', 'test event', platform='AnotherPlatform', version='2.0'),
+        types.Click(CHATBASE_TOKEN, 'https://google.com/?q=a&b=c', CHATBOT_PLATFORM),
+        types.Click(CHATBASE_TOKEN, 'google.com', CHATBOT_PLATFORM, user_id='123456', version=VERSION),
+        types.Click(CHATBASE_TOKEN, 'google.com', 'AnotherPlatform', user_id='123456', version='2.0'),
+    ]
+
+
+@pytest.mark.parametrize('backend_name', list(json.BACKENDS))
+@pytest.mark.parametrize('version', [None, VERSION])
+def test_encoder_output_is_identical(backend_name, version):
+    backend = json.get_backend(backend_name)
+    encoder = TemplateEncoder(CHATBASE_TOKEN, CHATBOT_PLATFORM, version=version, backend=backend)
+
+    for obj in make_objects():
+        assert encoder.encode(obj) == backend.dumpb(obj.to_dict())
+
+
+def test_encoder_output_is_identical_to_json():
+    encoder = TemplateEncoder(CHATBASE_TOKEN, CHATBOT_PLATFORM, version=VERSION)
+
+    for obj in make_objects():
+        assert encoder.encode(obj) == obj.to_json().encode()
+        assert obj.to_bytes(encoder) == obj.to_bytes()
+
+
+@pytest.mark.parametrize('backend_name', list(json.BACKENDS))
+def test_get_encoder(backend_name):
+    backend = json.get_backend(backend_name)
+    encoder = get_encoder(CHATBASE_TOKEN, CHATBOT_PLATFORM, backend=backend)
+    if backend_name == 'json':
+        assert isinstance(encoder, TemplateEncoder)
+    else:
+        assert encoder is backend
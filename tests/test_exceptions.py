@@ -1,7 +1,7 @@
 import pytest
 import logging
 import asyncio
-from aiochatbase import Chatbase
+from aiochatbase import Chatbase, RetryPolicy, CircuitBreaker
 from aiochatbase import types
 from aiochatbase.types.errors import *
 from . import FakeChatbaseServer, BULK_RESPONSE_DICT, BULK_BAD_RESPONSE_DICT
@@ -96,3 +96,101 @@ async def test_api_unknown_response(cb, event_loop):
                                   status=status, reason=reason, loop=event_loop):
         with pytest.raises(ChatbaseException, message='Unknown response'):
             await cb.register_message(user_id=USER_ID, intent=INTENT)
+
+
+async def test_retry_server_error(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, retry=RetryPolicy(base_delay=0.01))
+    server = FakeChatbaseServer(message_dict={'reason': 'Unknown response', 'status': 500}, status=500,
+                                loop=event_loop)
+    async with server:
+        body, headers = server.parse_data({'message_id': CB_MESSAGE_ID, 'status': 200})
+        server.add(server.ANY, response=server.Response(text=body, headers=headers))
+
+        result = await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert result == CB_MESSAGE_ID
+        assert cb.retry.retries == 1
+    await cb.close()
+
+
+async def test_retry_exhausted(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop,
+                  retry=RetryPolicy(max_attempts=2, base_delay=0.01))
+    async with FakeChatbaseServer(message_dict={'reason': 'Unknown response', 'status': 503}, status=503,
+                                  repeat=2, loop=event_loop):
+        with pytest.raises(ServerError):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert cb.retry.retries == 1
+    await cb.close()
+
+
+async def test_no_retry_invalid_api_token(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, retry=RetryPolicy(base_delay=0.01))
+    reason = "Error fetching parameter 'api_key': Missing or invalid field(s): 'api_key'"
+    async with FakeChatbaseServer(message_dict={'reason': reason, 'status': 400},
+                                  status=400, reason=reason, loop=event_loop):
+        with pytest.raises(InvalidApiKey):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert cb.retry.retries == 0
+    await cb.close()
+
+
+async def test_circuit_breaker(event_loop):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop,
+                  retry=RetryPolicy(max_attempts=1, circuit_breaker=breaker))
+    async with FakeChatbaseServer(message_dict={'reason': 'Unknown response', 'status': 500}, status=500,
+                                  repeat=2, loop=event_loop):
+        for _ in range(2):
+            with pytest.raises(ServerError):
+                await cb.register_message(user_id=USER_ID, intent=INTENT)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitBreakerOpen):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+    await cb.close()
+
+
+async def test_circuit_breaker_trial_cancelled(event_loop):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    retry = RetryPolicy(max_attempts=1, circuit_breaker=breaker)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    trial = asyncio.ensure_future(retry.run(asyncio.sleep, 1))
+    await asyncio.sleep(0)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # the next request is the new trial
+    assert await retry.run(asyncio.sleep, 0, 'result') == 'result'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_register_bad_messages_partial(cb, event_loop):
+    messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(3)]
+
+    async with FakeChatbaseServer(message_dict=BULK_BAD_RESPONSE_DICT, loop=event_loop):
+        result = await cb.register_messages(messages_list, partial=True)
+
+    assert isinstance(result, types.BulkResult)
+    assert not result.all_succeeded
+    assert result.message_ids == [5917431215, None, 5917431217]
+    assert [r.item for r in result.failed] == [messages_list[1]]
+    assert result.failed[0].reason == 'something went wrong'
+
+
+async def test_requeue_failed_messages(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=5, requeue_failed=1)
+    messages_list = [await cb.prepare_message(str(i), 'test bulk') for i in range(3)]
+
+    async with FakeChatbaseServer(message_dict=BULK_BAD_RESPONSE_DICT, repeat=3, loop=event_loop):
+        await cb.register_messages(messages_list, partial=True)
+        assert list(cb.pool.messages) == [messages_list[1]]
+
+        # requeued only once
+        await cb.register_messages(messages_list, partial=True)
+        assert list(cb.pool.messages) == [messages_list[1]]
+        await cb.close()
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from aiochatbase import ChatbaseHub, DeadLetterQueue
+from aiochatbase.testing import ChatbaseTestServer
+from . import FakeChatbaseServer, BULK_RESPONSE_DICT
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+ANOTHER_CHATBASE_TOKEN = '987654321:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+@pytest.yield_fixture
+def hub(event_loop: asyncio.AbstractEventLoop):
+    _hub = ChatbaseHub(pool_size=3)
+    yield _hub
+    event_loop.run_until_complete(_hub.close())
+
+
+async def test_tenant(hub: ChatbaseHub, event_loop):
+    cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+    cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+
+    assert hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM) is cb_1
+    assert cb_1.pool is cb_2.pool is hub.pool
+    assert cb_1.transport is cb_2.transport is hub.transport
+
+
+async def test_register_messages(hub: ChatbaseHub, event_loop):
+    cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+    cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+    messages_list = [cb_1.make_message(USER_ID, INTENT), cb_2.make_message(USER_ID, INTENT),
+                     cb_1.make_message(USER_ID, INTENT)]
+
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, repeat=2, loop=event_loop):
+        result = await hub.register_messages(messages_list)
+
+    # grouped by api key
+    assert [r.item for r in result] == [messages_list[0], messages_list[2], messages_list[1]]
+    assert result.all_succeeded
+
+
+async def test_pool(hub: ChatbaseHub, event_loop):
+    cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+    cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, repeat=2, loop=event_loop):
+        await cb_1.register_message(USER_ID, INTENT)
+        await cb_2.register_message(USER_ID, INTENT)
+        assert len(hub.pool.messages) == 2
+
+        await cb_1.register_message(USER_ID, INTENT)
+        await asyncio.sleep(0.1)
+        assert len(hub.pool.messages) == 0
+
+
+async def test_event_pool(event_loop):
+    async with ChatbaseTestServer() as server:
+        hub = ChatbaseHub(pool_size=3, pool_events=True, base_url=server.url)
+        cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        assert cb_1.event_pool is cb_2.event_pool is hub.event_pool
+
+        await cb_1.register_event(USER_ID, INTENT)
+        await cb_2.register_event(USER_ID, INTENT)
+        assert hub.stats()['pool_items'] == {'message': 0, 'event': 2}
+
+        await hub.flush()
+        assert sorted(e['api_key'] for e in server.events) == [CHATBASE_TOKEN, ANOTHER_CHATBASE_TOKEN]
+        await hub.close()
+
+
+async def test_tenant_failed(event_loop):
+    async with ChatbaseTestServer() as server:
+        dead_letter = DeadLetterQueue()
+        hub = ChatbaseHub(pool_size=3, dead_letter=dead_letter, base_url=server.url)
+        cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        messages_list = [cb_1.make_message(USER_ID, INTENT), cb_2.make_message(USER_ID, INTENT),
+                         cb_1.make_message(USER_ID, INTENT)]
+
+        server.fail_next(1, 400)
+        result = await (await hub.register_messages(messages_list, task=True, partial=True))
+
+        # only group of one tenant is failed
+        assert len(result.failed) in (1, 2)
+        failed_key = result.failed[0].item.api_key
+        assert [item.api_key for item, _ in dead_letter.items] == [failed_key] * len(result.failed)
+        assert [m['api_key'] for m in server.messages] == [r.item.api_key for r in result.succeeded]
+        assert failed_key not in [m['api_key'] for m in server.messages]
+        await hub.close()
+
+
+async def test_flush_timeout(event_loop):
+    async with ChatbaseTestServer(latency=0.3) as server:
+        hub = ChatbaseHub(pool_size=3, base_url=server.url)
+        cb_1 = hub.tenant(CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        cb_2 = hub.tenant(ANOTHER_CHATBASE_TOKEN, CHATBOT_PLATFORM)
+        await cb_1.register_message(USER_ID, INTENT)
+        await cb_2.register_message(USER_ID, INTENT)
+
+        undelivered = await hub.flush(timeout=0.1)
+        # shared pool is flushed once, each message is reported once
+        assert sorted(m.api_key for m in undelivered) == sorted([CHATBASE_TOKEN, ANOTHER_CHATBASE_TOKEN])
+        await hub.close()
+
+
+async def test_task_limits(event_loop):
+    hub = ChatbaseHub(pool_size=3, max_tasks=2, max_pending_tasks=10, task_overflow='drop_newest')
+    assert hub.task_limiter.max_tasks == 2
+    assert hub.task_limiter.max_pending == 10
+    assert hub.task_limiter.overflow == 'drop_newest'
+    await hub.close()
@@ -0,0 +1,131 @@
+import pytest
+
+from aiochatbase import Chatbase, ChatbaseHub, RetryPolicy
+from aiochatbase.testing import ChatbaseTestServer
+from aiochatbase.types import ServerError
+from aiochatbase.utils.metrics import Metrics
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_prometheus():
+    metrics = Metrics()
+    metrics.sent.inc('message', 2)
+    metrics.request_seconds.observe(0.02, '/api/messages')
+    metrics.request_seconds.observe(20, '/api/messages')
+
+    text = metrics.prometheus()
+    assert '# TYPE chatbase_items_sent_total counter\n' in text
+    assert 'chatbase_items_sent_total{kind="message"} 2\n' in text
+    assert 'chatbase_http_request_duration_seconds_bucket{endpoint="/api/messages",le="0.025"} 1\n' in text
+    assert 'chatbase_http_request_duration_seconds_bucket{endpoint="/api/messages",le="+Inf"} 2\n' in text
+    assert 'chatbase_http_request_duration_seconds_count{endpoint="/api/messages"} 2\n' in text
+
+
+async def test_pool_stats(event_loop):
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3, base_url=server.url)
+        for _ in range(3):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.register_click('google.com', user_id=USER_ID)
+        await cb.flush()
+
+        stats = cb.stats()
+        assert stats['items_enqueued_total'] == {'message': 3}
+        assert stats['items_sent_total'] == {'message': 3, 'click': 1}
+        assert stats['pool_items'] == {'message': 0}
+        assert stats['batch_size']['/api/messages']['count'] == 1
+        assert stats['batch_size']['/api/messages']['sum'] == 3
+        assert stats['http_request_duration_seconds']['/api/click']['count'] == 1
+        assert stats['http_request_bytes_total']['/api/messages'] > 0
+        await cb.close()
+
+
+async def test_retries_and_failures(event_loop):
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url,
+                      retry=RetryPolicy(max_attempts=2, base_delay=0))
+        server.fail_next(1)
+        assert await cb.register_message(user_id=USER_ID, intent=INTENT)
+
+        server.fail_next(2)
+        with pytest.raises(ServerError):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+
+        stats = cb.stats()
+        assert stats['items_sent_total'] == {'message': 1}
+        assert stats['items_failed_total'] == {'message': 1}
+        assert stats['http_retries_total'] == {'/api/message': 2}
+        assert stats['http_request_errors_total'] == {'/api/message': 3}
+        await cb.close()
+
+
+async def test_dropped(event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_max_messages=1,
+                  pool_overflow='drop_newest')
+    cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+    cb.track_message_nowait(user_id=USER_ID, intent=INTENT)
+
+    stats = cb.stats()
+    assert stats['items_enqueued_total'] == {'message': 1}
+    assert stats['items_dropped_total'] == {'message': 1}
+    assert stats['pool_items'] == {'message': 1}
+
+    cb.pool.messages.clear()
+    await cb.close()
+    assert 'message' not in cb.stats()['pool_items']
+
+
+async def test_pool_close_failed(event_loop):
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, base_url=server.url)
+        for _ in range(2):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+
+        server.fail_next(1, status=400)
+        assert len(await cb.close()) == 2
+        # failed messages are counted once by sender
+        assert cb.stats()['items_failed_total'] == {'message': 2}
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10)
+    await cb.register_message(user_id=USER_ID, intent=INTENT)
+    assert len(await cb.close(timeout=0)) == 1
+    # message, which has not been sent before close, is counted by pool
+    assert cb.stats()['items_failed_total'] == {'message': 1}
+
+
+async def test_hub_shares_metrics(event_loop):
+    async with ChatbaseTestServer() as server:
+        hub = ChatbaseHub(pool_size=10, pool_linger=None, base_url=server.url)
+        for api_key in ('key-1', 'key-2'):
+            await hub.tenant(api_key, CHATBOT_PLATFORM).register_message(user_id=USER_ID, intent=INTENT)
+        assert hub.stats()['pool_items'] == {'message': 2}
+
+        await hub.flush()
+        stats = hub.stats()
+        assert stats['items_sent_total'] == {'message': 2}
+        assert stats['http_request_duration_seconds']['/api/messages']['count'] == 2
+        await hub.close()
+
+
+async def test_event_chunk_failed(event_loop):
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, pool_events=True,
+                      bulk_chunk_size=2, bulk_concurrency=1, base_url=server.url)
+        for i in range(4):
+            await cb.register_event(str(i), INTENT)
+
+        server.fail_next(1, status=400)
+        undelivered = await cb.flush()
+        assert sorted(e.user_id for e in undelivered) == ['0', '1']
+        assert [e['user_id'] for e in server.events] == ['2', '3']
+
+        stats = cb.stats()
+        assert stats['items_sent_total'] == {'event': 2}
+        assert stats['items_failed_total'] == {'event': 2}
+        await cb.close()
@@ -1,7 +1,16 @@
+import pytest
+
 from aiochatbase.utils import json
 
 
-def test_disable_json():
+@pytest.fixture
+def default_backend(monkeypatch):
+    """ Restore default JSON backend changed by test """
+    monkeypatch.setattr(json, '_default', json._default)
+    monkeypatch.setattr(json, '_use_ujson', json._use_ujson)
+
+
+def test_disable_json(default_backend):
     json.disable_ujson()
     # json._use_ujson = False
     d = {}
@@ -10,3 +19,109 @@ def test_disable_json():
 
     d = json.loads(result)
     assert d == {}
+
+
+def test_backends():
+    for name in json.BACKENDS:
+        backend = json.get_backend(name)
+        assert backend.name == name
+        assert backend.dumpb({'a': 1}).replace(b' ', b'') == b'{"a":1}'
+        assert backend.loads(b'{"a": 1}') == {'a': 1}
+        assert backend.loads('{"a": 1}') == {'a': 1}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        json.get_backend('simplejson')
+
+
+def test_set_backend(default_backend):
+    json.set_backend('json')
+    assert json.get_backend().name == 'json'
+    assert isinstance(json.dumpb({}), bytes)
+
+
+def test_compact_objects():
+    from aiochatbase import types
+
+    objects = [
+        types.Message('key', 'user', '123456', 1533168455903, 'TestPlatform'),
+        types.Event('key', '123456', 'test event', properties={'property': 1}),
+        types.Click('key', 'google.com', 'TestPlatform'),
+        types.Property('property', 1),
+    ]
+    for obj in objects:
+        assert not hasattr(obj, '__dict__')
+
+
+@pytest.mark.asyncio
+async def test_deprecated_session(event_loop):
+    import aiohttp
+    from aiochatbase import types
+    from aiochatbase.testing import ChatbaseTestServer
+    from aiochatbase.utils.transport import close_default_transport
+
+    async with ChatbaseTestServer() as server, aiohttp.ClientSession() as session:
+        with pytest.warns(DeprecationWarning):
+            message = types.Message('key', 'user', '123456', 1533168455903, 'TestPlatform', session=session)
+        # session of constructor is used by send()
+        assert await message.send(base_url=server.url)
+        assert server.messages[0]['user_id'] == '123456'
+
+        message = types.Message('key', 'user', '654321', 1533168455903, 'TestPlatform')
+        with pytest.warns(DeprecationWarning):
+            assert await message.send(base_url=server.url)
+        assert server.messages[1]['user_id'] == '654321'
+    await close_default_transport()
+
+
+def test_default_transport_of_closed_loop():
+    import asyncio
+    import gc
+    import weakref
+    from aiochatbase.utils.transport import get_default_transport, close_default_transport
+
+    async def use():
+        return get_default_transport().session
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(use())
+    finally:
+        loop.close()
+    loop_ref = weakref.ref(loop)
+    del loop
+
+    # transport of closed loop is removed when default transport is taken again
+    current = asyncio.new_event_loop()
+    try:
+        current.run_until_complete(use())
+        gc.collect()
+        assert loop_ref() is None
+        current.run_until_complete(close_default_transport())
+    finally:
+        current.close()
+
+
+@pytest.mark.asyncio
+async def test_compressor():
+    import gzip
+    import zlib
+    from aiochatbase import Compressor
+
+    body = b'{"messages": [' + b', '.join([b'{"api_key": "123456789", "type": "user"}'] * 100) + b']}'
+
+    compressor = Compressor(threshold=len(body))
+    assert await compressor.compress(body) == (body, {})
+
+    compressor = Compressor(threshold=100)
+    compressed, headers = await compressor.compress(body)
+    assert headers == {'Content-Encoding': 'gzip'}
+    assert gzip.decompress(compressed) == body
+    assert compressor.raw_bytes == len(body)
+    assert compressor.compressed_bytes == len(compressed) < len(body)
+
+    compressor = Compressor(Compressor.DEFLATE, threshold=100, executor_threshold=100)
+    compressed, headers = await compressor.compress(body)
+    assert headers == {'Content-Encoding': 'deflate'}
+    assert zlib.decompress(compressed) == body
@@ -0,0 +1,52 @@
+import pytest
+
+from aiochatbase import Chatbase, Profiler, Compressor
+from aiochatbase.testing import ChatbaseTestServer
+from aiochatbase.utils.profiling import Stage
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_message_stages(event_loop):
+    records = []
+    profiler = Profiler(callback=lambda stage, seconds, endpoint: records.append((stage, seconds, endpoint)))
+
+    async with ChatbaseTestServer(latency=0.05) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url, profiler=profiler)
+        await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.close()
+
+    stages = [stage for stage, _, _ in records]
+    assert stages == [Stage.PREPARE, Stage.CHECK, Stage.ENCODE, Stage.CONNECTION_CREATE, Stage.REQUEST_WRITE,
+                      Stage.RESPONSE_WAIT, Stage.RESPONSE_READ, Stage.RESPONSE_PARSE]
+    assert all(endpoint == '/api/message' for stage, _, endpoint in records if stage != Stage.PREPARE)
+
+    seconds = {stage: s for stage, s, _ in records}
+    assert seconds[Stage.RESPONSE_WAIT] >= 0.05
+    assert seconds[Stage.REQUEST_WRITE] < 0.05
+    assert profiler.stats()[Stage.RESPONSE_WAIT]['count'] == 1
+
+
+async def test_bulk_stages(event_loop):
+    profiler = Profiler()
+
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url, profiler=profiler,
+                      pool_size=10, bulk_chunk_size=5, compression=Compressor('gzip', threshold=0))
+        for _ in range(10):
+            await cb.register_message(user_id=USER_ID, intent=INTENT)
+        await cb.flush()
+
+        stats = profiler.stats()
+        assert stats[Stage.PREPARE]['count'] == 10
+        # items are checked and encoded once, chunks are joined and compressed by every request
+        assert stats[Stage.CHECK]['count'] == 1
+        assert stats[Stage.ENCODE]['count'] == 3
+        assert stats[Stage.COMPRESS]['count'] == 2
+        assert stats[Stage.RESPONSE_WAIT]['count'] == 2
+        await cb.close()
@@ -0,0 +1,91 @@
+import aiohttp
+import pytest
+from aiohttp.test_utils import unused_port
+
+from aiochatbase import Chatbase, ChatbaseHub
+from aiochatbase import types
+from aiochatbase.relay import Relay
+from aiochatbase.testing import ChatbaseTestServer
+from aiochatbase.utils import json
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_relay(event_loop):
+    upstream = ChatbaseTestServer()
+    await upstream.start()
+
+    relay = Relay(ChatbaseHub(pool_size=10, pool_linger=None, pool_events=True, base_url=upstream.url))
+    port = unused_port()
+    await relay.start(port=port)
+
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=f'http://127.0.0.1:{port}')
+    assert await cb.register_message(USER_ID, INTENT) is None
+    messages = [cb.make_message(USER_ID, INTENT) for _ in range(2)]
+    assert (await cb.register_messages(messages, partial=True)).all_succeeded
+    assert await cb.register_click('google.com', user_id=USER_ID)
+    assert await cb.register_event(USER_ID, INTENT, properties={'property': 1})
+    assert relay.received == 5
+
+    # nothing is sent upstream before pool is full
+    assert not upstream.messages
+    await cb.close()
+
+    assert await relay.close() == []
+    await upstream.close()
+
+    assert [r.path for r in upstream.requests if r.path != '/api/click'] == ['/api/messages',
+                                                                           '/apis/v1/events/insert_batch']
+    assert len(upstream.messages) == 3
+    assert upstream.clicks[0]['url'] == 'google.com'
+    assert upstream.events[0]['properties'] == [{'property_name': 'property', 'integer_value': 1}]
+
+
+async def test_relay_invalid_request(event_loop):
+    relay = Relay(ChatbaseHub())
+    port = unused_port()
+    await relay.start(port=port)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f'http://127.0.0.1:{port}/api/message', data=b'{"user_id": 1}') as resp:
+            assert resp.status == 400
+            assert 'Invalid message' in (await resp.json())['reason']
+
+    await relay.close()
+
+
+async def test_relay_rejects_invalid_item(event_loop):
+    hub = ChatbaseHub()
+    relay = Relay(hub)
+    port = unused_port()
+    await relay.start(port=port)
+
+    message = types.Message(CHATBASE_TOKEN, types.MessageTypes.AGENT, USER_ID, 1533166056000, CHATBOT_PLATFORM,
+                            intent='agent intent')
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f'http://127.0.0.1:{port}/api/messages',
+                                data=json.dumpb({'messages': [message.to_dict()]})) as resp:
+            assert resp.status == 400
+            assert 'Cannot set intent for agent messages' in (await resp.json())['reason']
+
+    assert not hub.pool.messages
+    assert relay.received == 0
+    await relay.close()
+
+
+async def test_relay_metrics(event_loop):
+    relay = Relay(ChatbaseHub())
+    port = unused_port()
+    await relay.start(port=port)
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f'http://127.0.0.1:{port}/metrics') as resp:
+            assert resp.status == 200
+            assert 'chatbase_pool_items{kind="message"} 0' in await resp.text()
+
+    await relay.close()
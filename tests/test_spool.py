@@ -0,0 +1,137 @@
+import asyncio
+import os
+
+import pytest
+
+from aiochatbase import Chatbase, Spool
+from aiochatbase import types
+from aiochatbase.testing import ChatbaseTestServer
+from aiochatbase.utils.dead_letter import DeadLetterQueue
+from . import FakeChatbaseServer, BULK_RESPONSE_DICT
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+def segments(path):
+    return sorted(name for name in os.listdir(path) if name.endswith(Spool.SEGMENT_SUFFIX))
+
+
+async def test_spool_read_ack(tmpdir):
+    spool = Spool(str(tmpdir), segment_bytes=20)
+    for i in range(5):
+        spool.append(b'{"n": %d}' % i)
+    assert spool.pending == 5
+    assert len(segments(str(tmpdir))) == 2
+
+    records, position = spool.read(3)
+    assert records == [b'{"n": 0}', b'{"n": 1}', b'{"n": 2}']
+
+    # not acknowledged records are read again
+    assert spool.read(3)[0] == records
+
+    spool.ack(position, len(records))
+    assert spool.pending == 2
+    assert len(segments(str(tmpdir))) == 1
+
+    records, position = spool.read(3)
+    assert records == [b'{"n": 3}', b'{"n": 4}']
+    spool.ack(position, len(records))
+    assert spool.pending == 0
+    assert len(segments(str(tmpdir))) == 1
+    spool.close()
+
+
+async def test_spool_resume(tmpdir):
+    spool = Spool(str(tmpdir))
+    for i in range(3):
+        spool.append(b'{"n": %d}' % i)
+    records, position = spool.read(1)
+    spool.ack(position, len(records))
+    spool.close()
+
+    # record which was not completely written
+    with open(os.path.join(str(tmpdir), segments(str(tmpdir))[-1]), 'ab') as f:
+        f.write(b'{"n": ')
+
+    spool = Spool(str(tmpdir))
+    assert spool.pending == 2
+    spool.append(b'{"n": 3}')
+    assert spool.read(10)[0] == [b'{"n": 1}', b'{"n": 2}', b'{"n": 3}']
+    spool.close()
+
+
+async def test_spooled_pool(tmpdir, event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=3,
+                  pool_spool=Spool(str(tmpdir)))
+    assert isinstance(cb.pool, types.SpooledPool)
+
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        for _ in range(3):
+            assert await cb.register_message(user_id=USER_ID, intent=INTENT) is None
+        assert cb.pool.spool.pending == 3
+        assert not cb.pool.messages
+
+        await asyncio.sleep(0.1)
+        assert cb.pool.spool.pending == 0
+        await cb.close()
+
+
+async def test_spooled_pool_outage(tmpdir, event_loop):
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10,
+                  pool_spool=Spool(str(tmpdir)))
+    async with FakeChatbaseServer(message_dict={}, status=500, reason='Internal Server Error', loop=event_loop):
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+        assert await cb.close(timeout=1) == []
+
+    # sending is resumed after restart
+    cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10,
+                  pool_spool=Spool(str(tmpdir)))
+    assert cb.pool.spool.pending == 3
+    async with FakeChatbaseServer(message_dict=BULK_RESPONSE_DICT, loop=event_loop):
+        await cb.flush()
+        assert cb.pool.spool.pending == 0
+        await cb.close()
+
+
+async def test_spooled_pool_permanent_error(tmpdir, event_loop):
+    """ Batch rejected by Chatbase is not retried, it is saved to dead letters """
+
+    dead_letter = DeadLetterQueue()
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=10, base_url=server.url,
+                      pool_spool=Spool(str(tmpdir)), dead_letter=dead_letter)
+        for i in range(3):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+
+        server.fail_next(1, status=400)
+        await asyncio.wait_for(cb.flush(), 1)
+        assert cb.pool.spool.pending == 0
+        assert [item.user_id for item, _ in dead_letter.items] == ['0', '1', '2']
+        assert len(server.requests) == 1
+        await cb.close()
+
+
+async def test_spooled_pool_chunk_retried(tmpdir, event_loop):
+    """ Messages of chunk failed with server error stay in spool, delivered chunks are acknowledged """
+
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, pool_size=4, bulk_chunk_size=2,
+                      bulk_concurrency=1, base_url=server.url, pool_spool=Spool(str(tmpdir)))
+        for i in range(4):
+            await cb.register_message(user_id=str(i), intent=INTENT)
+
+        server.fail_next(1, status=503)
+        assert not await cb.pool.send_messages()
+        assert [m['user_id'] for m in server.messages] == ['2', '3']
+        assert cb.pool.spool.pending == 2
+
+        await cb.flush()
+        assert sorted(m['user_id'] for m in server.messages) == ['0', '1', '2', '3']
+        assert cb.pool.spool.pending == 0
+        await cb.close()
@@ -0,0 +1,80 @@
+import pytest
+
+from aiochatbase import Chatbase, RetryPolicy
+from aiochatbase import types
+from aiochatbase.testing import ChatbaseTestServer, uniform
+
+pytestmark = pytest.mark.asyncio
+
+CHATBASE_TOKEN = '123456789:AABBCCDDEEFFaabbccddeeff-1234567890'
+CHATBOT_PLATFORM = 'TestPlatform'
+USER_ID = '123456'
+INTENT = 'Another message'
+
+
+async def test_endpoints(event_loop):
+    async with ChatbaseTestServer() as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url)
+        assert await cb.register_message(USER_ID, INTENT) == '1'
+        assert await cb.register_messages([cb.make_message(USER_ID, INTENT) for _ in range(2)]) == [2, 3]
+        assert await cb.register_click('google.com', user_id=USER_ID)
+        assert await cb.register_event(USER_ID, INTENT)
+        assert await cb.register_events([types.Event(CHATBASE_TOKEN, USER_ID, INTENT)])
+        await cb.close()
+
+    assert [r.path for r in server.requests] == ['/api/message', '/api/messages', '/api/click',
+                                                 '/apis/v1/events/insert', '/apis/v1/events/insert_batch']
+    assert len(server.messages) == 3
+    assert server.messages[0]['intent'] == INTENT
+    assert len(server.events) == 2
+    assert server.clicks[0]['url'] == 'google.com'
+
+
+async def test_item_failure(event_loop):
+    async with ChatbaseTestServer(item_failure=lambda m: 'bad user' if m['user_id'] == '1' else None) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url)
+        result = await cb.register_messages([cb.make_message(str(i), INTENT) for i in range(3)], partial=True)
+        assert [r.reason for r in result.failed] == ['bad user']
+
+        with pytest.raises(types.ChatbaseException, match='bad user'):
+            await cb.register_message('1', INTENT)
+        await cb.close()
+
+
+async def test_invalid_api_key(event_loop):
+    async with ChatbaseTestServer(api_keys={'another key'}) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url)
+        with pytest.raises(types.InvalidApiKey):
+            await cb.register_message(USER_ID, INTENT)
+        await cb.close()
+
+
+async def test_error_burst_retried(event_loop):
+    async with ChatbaseTestServer(latency=uniform(0, 0.01)) as server:
+        server.fail_next(2)
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url, pool_size=10,
+                      retry=RetryPolicy(max_attempts=3, base_delay=0.01, budget_ratio=1))
+        for _ in range(10):
+            await cb.register_message(USER_ID, INTENT)
+        assert await cb.close() == []
+
+    assert [r.status for r in server.requests] == [503, 503, 200]
+    assert len(server.messages) == 10
+
+
+async def test_rate_limit(event_loop):
+    async with ChatbaseTestServer(rate_limit_rate=1, retry_after=0) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url)
+        with pytest.raises(types.ServerError) as exc_info:
+            await cb.register_message(USER_ID, INTENT)
+        assert exc_info.value.status == 429
+        await cb.close()
+
+
+async def test_slow_body(event_loop):
+    async with ChatbaseTestServer(latency=0.05, body_delay=0.05) as server:
+        cb = Chatbase(CHATBASE_TOKEN, CHATBOT_PLATFORM, loop=event_loop, base_url=server.url)
+        start = event_loop.time()
+        assert await cb.register_message(USER_ID, INTENT) == '1'
+        assert event_loop.time() - start >= 0.1
+        await cb.close()